@@ -0,0 +1,143 @@
+"""asyncio API to read Polyend Tracker .pti files without blocking the event loop."""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import weakref
+
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from inspectpti import get_audio, get_header
+from scanpti import ScanResult, scan_library
+
+# Maximum number of concurrent file reads (threads) of the default executor
+MAX_CONCURRENCY = 32
+
+# Maximum number of header reads done in one executor job
+HEADER_BATCH_SIZE = 64
+
+_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _default_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Return the executor that is used to read files (created on first use)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(MAX_CONCURRENCY, thread_name_prefix="asyncpti")
+        return _executor
+
+
+class _HeaderBatch:
+    """Header reads requested during one iteration of an event loop."""
+
+    def __init__(self, executor: concurrent.futures.Executor) -> None:
+        self.executor = executor
+        self.values: list[object] = []
+        self.futures: list[asyncio.Future[bytes]] = []
+        self.submitted = False
+
+
+# Pending header reads of each (running) event loop
+_batches: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _HeaderBatch] = weakref.WeakKeyDictionary()
+
+
+def _read_headers(values: list[object]) -> list[bytes | BaseException]:
+    """Return the header (or the error raised while reading it) of every value."""
+    headers: list[bytes | BaseException] = []
+    for value in values:
+        try:
+            headers.append(get_header(value))
+        except Exception as e:
+            headers.append(e)
+    return headers
+
+
+def _set_results(batch: _HeaderBatch, job: asyncio.Future[list[bytes | BaseException]]) -> None:
+    """Resolve the futures of a batch of header reads."""
+    try:
+        headers = job.result()
+    except Exception as e:  # e.g. the executor was shut down
+        headers = [e] * len(batch.futures)
+    for future, header in zip(batch.futures, headers):
+        if future.done():
+            continue  # Cancelled
+        if isinstance(header, BaseException):
+            future.set_exception(header)
+        else:
+            future.set_result(header)
+
+
+def _flush(loop: asyncio.AbstractEventLoop, batch: _HeaderBatch) -> None:
+    """Read a batch of headers in the executor (unless it already is)."""
+    if batch.submitted:
+        return
+    batch.submitted = True
+    if _batches.get(loop) is batch:
+        del _batches[loop]
+    job = asyncio.wrap_future(batch.executor.submit(_read_headers, batch.values), loop=loop)
+    job.add_done_callback(lambda job: _set_results(batch, job))
+
+
+async def async_get_header(value: object, *, executor: concurrent.futures.Executor | None = None) -> bytes:
+    """
+    Return .pti header, see get_header.
+
+    Header reads requested at the same time are batched, up to
+    HEADER_BATCH_SIZE headers are read by one executor job. Prefer paths
+    and file descriptors, open files are shared with the executor threads.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or _default_executor()
+    if (batch := _batches.get(loop)) is None or batch.executor is not executor:
+        if batch is not None:
+            _flush(loop, batch)
+        batch = _batches[loop] = _HeaderBatch(executor)
+        loop.call_soon(_flush, loop, batch)
+    future: asyncio.Future[bytes] = loop.create_future()
+    batch.values.append(value)
+    batch.futures.append(future)
+    if len(batch.values) >= HEADER_BATCH_SIZE:
+        _flush(loop, batch)
+    return await future
+
+
+async def async_get_audio(value: object, *, executor: concurrent.futures.Executor | None = None) -> Any:
+    """Return .pti audio, see get_audio."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or _default_executor(), get_audio, value)
+
+
+def _next_results(results: Iterator[ScanResult], size: int) -> list[ScanResult]:
+    """Return the next (at most) size results of a library scan."""
+    return [result for _, result in zip(range(size), results)]
+
+
+async def async_scan_library(
+    root: str | os.PathLike[str],
+    *,
+    workers: int | None = None,
+    chunksize: int = 64,
+    executor: concurrent.futures.Executor | None = None,
+) -> AsyncIterator[ScanResult]:
+    """Yield the decoded header of every .pti file in root, see scan_library."""
+    loop = asyncio.get_running_loop()
+    executor = executor or _default_executor()
+    results = scan_library(root, workers=workers, chunksize=chunksize)
+    job: concurrent.futures.Future[list[ScanResult]] | None = None
+    try:
+        while True:
+            job = executor.submit(_next_results, results, chunksize)
+            if not (batch := await asyncio.wrap_future(job, loop=loop)):
+                break
+            for result in batch:
+                yield result
+    finally:
+        if job is not None and not job.done():
+            # Cancelled while the executor is reading results, the scan can only be closed when it is done
+            await asyncio.wait([asyncio.wrap_future(job, loop=loop)])
+        await loop.run_in_executor(executor, results.close)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Benchmark .pti header decoding and library scanning."""
+from __future__ import annotations
+
+import argparse
+import functools
+import glob
+import importlib.util
+import io
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from typing import Any, Callable
+
+import corpuspti
+import inspectpti
+import ptifixtures
+import scanpti
+
+# Time per operation (in microseconds) of every benchmark, lower is better
+Results = dict[str, float]
+
+# A benchmark regresses when it is this much slower than the baseline (0.2 = 20%)
+DEFAULT_THRESHOLD = 0.2
+
+SAMPLE_LENGTHS = ("10ms", "250ms", "1000ms", "5000ms", "10000ms")
+
+# Functions named get_* that do not read a single value from a header
+_NOT_GETTERS = {
+    "get_header", "get_audio", "get_audio_array", "get_slice_adjust", "get_wavetable_frames", "get_wavetable_mipmaps",
+}
+
+
+def _getters() -> list[Callable[[bytes], Any]]:
+    """Return every getter that reads a single value from a .pti header."""
+    getters: list[Callable[[bytes], Any]] = [inspectpti.is_wavetable]
+    for name in dir(inspectpti):
+        if name.startswith("get_") and name not in _NOT_GETTERS:
+            getters.append(getattr(inspectpti, name))
+    getters.extend(functools.partial(inspectpti.get_slice_adjust, nslice=n) for n in range(1, 49))
+    return getters
+
+
+def _call_every_getter(header: bytes, getters: list[Callable[[bytes], Any]]) -> None:
+    """Read every known header value using the individual getters."""
+    for getter in getters:
+        getter(header)
+
+
+def _bench(
+    results: Results, name: str, func: Callable[[], Any], number: int, headers: int = 1, unit: str = "header",
+) -> float:
+    """Print, record and return the best time per header of calling func (in microseconds)."""
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number / headers * 1_000_000
+    print(f"{name:<32} {best:>10.1f} µs/{unit}")
+    results[name] = best
+    return best
+
+
+def bench_import(results: Results) -> None:
+    """Time a fresh interpreter importing inspectpti (minus the interpreter start up)."""
+    def run(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return time.perf_counter() - start
+
+    startup = min(run("pass") for _ in range(5))
+    best = max(min(run("import inspectpti") for _ in range(5)) - startup, 0.0) * 1_000_000
+    print(f"{'import inspectpti':<32} {best:>10.1f} µs")
+    results["import inspectpti"] = best
+
+
+def bench_get_header(results: Results) -> None:
+    """Time get_header and is_pti for every kind of source."""
+    path = ptifixtures.fixture_path("test.pti")
+    data = pathlib.Path(path).read_bytes()
+    _bench(results, "get_header (bytes)", lambda: inspectpti.get_header(data), number=100_000)
+
+    def from_file() -> bytes:
+        with open(path, "rb") as f:
+            return inspectpti.get_header(f)
+
+    buffer = io.BytesIO(data)
+
+    def from_buffer() -> bytes:
+        buffer.seek(0)
+        return inspectpti.get_header(buffer)
+
+    _bench(results, "get_header (file)", from_file, number=1_000)
+    _bench(results, "get_header (BytesIO)", from_buffer, number=100_000)
+    _bench(results, "get_header (path)", lambda: inspectpti.get_header(path), number=1_000)
+    _bench(results, "get_header (pathlib)", lambda: inspectpti.get_header(pathlib.Path(path)), number=1_000)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        _bench(results, "get_header (descriptor)", lambda: inspectpti.get_header(fd), number=10_000)
+    finally:
+        os.close(fd)
+    header = inspectpti.get_header(data)
+    _bench(results, "is_pti", lambda: inspectpti.is_pti(header), number=10_000)
+
+
+def bench_getters(results: Results) -> None:
+    """Time every getter individually (validated header, so only the getter itself is measured)."""
+    header = inspectpti.ValidatedHeader(ptifixtures.pti_headers["48-slices"])
+    for getter in _getters():
+        name = getattr(getter, "__name__", None) or f"get_slice_adjust({getter.keywords['nslice']})"
+        _bench(results, f"getter {name}", functools.partial(getter, header), number=1_000)
+
+
+def bench_decode(results: Results) -> None:
+    """Compare decode_header to calling every getter."""
+    header = ptifixtures.default_header()
+    getters = _getters()
+    getters_time = _bench(results, "every getter", lambda: _call_every_getter(header, getters), number=100)
+    decode_time = _bench(results, "decode_header", lambda: inspectpti.decode_header(header), number=1_000)
+    print(f"decode_header is {getters_time / decode_time:.1f}x faster")
+
+    validated = inspectpti.ValidatedHeader(header)
+    validated_time = _bench(
+        results, "every getter (validated)", lambda: _call_every_getter(validated, getters), number=1_000,
+    )
+    print(f"validating once is {getters_time / validated_time:.1f}x faster")
+    _bench(results, "decode_header (validated)", lambda: inspectpti.decode_header(validated), number=10_000)
+    record = inspectpti.decode_header(validated)
+    _bench(results, "encode_header", lambda: inspectpti.encode_header(record), number=10_000)
+
+
+def bench_decode_headers(results: Results) -> None:
+    """Compare a NumPy query over decode_headers to decode_header and getters (per header)."""
+    if importlib.util.find_spec("numpy") is None:
+        print("decode_headers requires NumPy, skipped")
+        return
+    headers = [inspectpti.ValidatedHeader(header) for header in ptifixtures.pti_headers.values()] * 100
+
+    def query_records() -> int:
+        records = [inspectpti.decode_header(header) for header in headers]
+        return sum(
+            record.sample_playback == inspectpti.SamplePlayback.GRANULAR and record.reverb_send > 50
+            for record in records
+        )
+
+    def query_array() -> int:
+        array = inspectpti.decode_headers(headers)
+        mask = (array["sample_playback"] == inspectpti.SamplePlayback.GRANULAR) & (array["reverb_send"] > 50)
+        return int(mask.sum())
+
+    records_time = _bench(results, "query decode_header", query_records, number=5, headers=len(headers))
+    array_time = _bench(results, "query decode_headers", query_array, number=5, headers=len(headers))
+    print(f"decode_headers is {records_time / array_time:.1f}x faster ({len(headers)} headers per query)")
+
+
+def bench_slices(results: Results) -> None:
+    """Time reading the 48 slice positions, one at a time and all at once."""
+    header = inspectpti.ValidatedHeader(ptifixtures.pti_headers["48-slices"])
+
+    def every_slice() -> list[int]:
+        return [inspectpti.get_slice_adjust(header, nslice=n) for n in range(1, 49)]
+
+    _bench(results, "slices (get_slice_adjust)", every_slice, number=1_000)
+    _bench(results, "slices (decode_header)", lambda: inspectpti.decode_header(header).slice_n, number=10_000)
+    _bench(results, "slices (get_slices)", lambda: inspectpti.get_slices(header), number=100_000)
+
+
+def bench_audio(results: Results) -> None:
+    """Time reading the audio of the sample-test files (per file)."""
+    for length in SAMPLE_LENGTHS:
+        path = ptifixtures.fixture_path(ptifixtures.FIXTURE_PATHS[length])
+        number = 100 if length in {"5000ms", "10000ms"} else 1_000
+        _bench(results, f"get_audio (path, {length})", lambda: inspectpti.get_audio(path), number=number, unit="file")
+        _bench(
+            results, f"get_audio_array ({length})", lambda: inspectpti.get_audio_array(path), number=number,
+            unit="file",
+        )
+        _bench(
+            results, f"iter_audio ({length})", lambda: sum(1 for _ in inspectpti.iter_audio(path)), number=number,
+            unit="file",
+        )
+
+
+def _serial_scan(root: str) -> int:
+    """Read and validate every .pti header in root, one file at a time."""
+    count = 0
+    for fname in glob.glob(os.path.join(glob.escape(root), "**", "*.pti"), recursive=True):
+        header = inspectpti.get_header(fname)
+        inspectpti.decode_header(header)
+        count += 1
+    return count
+
+
+def _bench_scan(results: Results, name: str, func: Callable[[], int]) -> float:
+    """Print, record and return the throughput of a library scan (in files per second)."""
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    throughput = count / elapsed
+    print(f"{name:<32} {throughput:>10.0f} files/s ({count} files)")
+    results[name] = elapsed / count * 1_000_000
+    return throughput
+
+
+def bench_scan(results: Results, root: str, workers: int | None, label: str = "") -> None:
+    """Compare scan_library to reading the headers in root one file at a time."""
+    serial = _bench_scan(results, f"serial get_header{label}", lambda: _serial_scan(root))
+    parallel = _bench_scan(
+        results,
+        f"scan_library{label}",
+        lambda: sum(1 for _ in scanpti.scan_library(root, workers=workers)),
+    )
+    print(f"scan_library is {parallel / serial:.1f}x faster")
+
+
+def bench_corpus(results: Results, count: int, workers: int | None) -> None:
+    """Scan a synthetic library of count files (see corpuspti.py)."""
+    with tempfile.TemporaryDirectory() as root:
+        for _ in corpuspti.generate_corpus(root, count):
+            pass
+        bench_scan(results, root, workers, label=" (corpus)")
+
+
+def compare(baseline: Results, results: Results, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a description of every benchmark that is more than threshold slower than baseline."""
+    regressions = []
+    for name, value in results.items():
+        if (expected := baseline.get(name)) and value > expected * (1 + threshold):
+            regressions.append(f"{name}: {value:.1f} µs (baseline {expected:.1f} µs, {value / expected - 1:+.0%})")
+    return regressions
+
+
+def save_results(path: str | os.PathLike[str], results: Results) -> None:
+    """Save results (and the platform they were measured on) as JSON."""
+    document = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    pathlib.Path(path).write_text(json.dumps(document, indent=2, sort_keys=True) + "\n")
+
+
+def load_results(path: str | os.PathLike[str]) -> Results:
+    """Return the results saved with save_results."""
+    results = json.loads(pathlib.Path(path).read_text())["results"]
+    assert isinstance(results, dict), f"{type(results)=}"
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--library", help="directory of .pti files to benchmark scanning")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes to scan with")
+    parser.add_argument(
+        "--corpus", type=int, default=2_000, help="number of synthetic .pti files to scan (0 to skip)",
+    )
+    parser.add_argument("--save", metavar="JSON", help="save the results to a file")
+    parser.add_argument("--baseline", metavar="JSON", help="compare the results to saved results")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="fail if a benchmark is this much slower than the baseline (0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    results: Results = {}
+    bench_import(results)
+    bench_get_header(results)
+    bench_getters(results)
+    bench_decode(results)
+    bench_decode_headers(results)
+    bench_slices(results)
+    bench_audio(results)
+    if args.corpus:
+        bench_corpus(results, args.corpus, args.workers)
+    if args.library:
+        bench_scan(results, args.library, args.workers, label=" (library)")
+
+    if args.save:
+        save_results(args.save, results)
+    if args.baseline:
+        if regressions := compare(load_results(args.baseline), results, args.threshold):
+            print(f"{len(regressions)} benchmarks regressed more than {args.threshold:.0%}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"No benchmarks regressed more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
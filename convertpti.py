@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""Convert between .wav files and Polyend Tracker .pti files."""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import functools
+import math
+import os
+import string
+import struct
+import time
+
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING, NamedTuple
+
+from inspectpti import (
+    FRAME_SIZE,
+    PTI_HEADER_LENGTH,
+    WAV_HEADER_LENGTH,
+    SamplePlayback,
+    _import_numpy,
+    decode_header,
+    encode_header,
+    get_header,
+    map_pti,
+    position_to_frame,
+    slice_bounds,
+)
+from scanpti import iter_files
+
+if TYPE_CHECKING:
+    import numpy
+
+# RIFF header, fmt chunk and data chunk header of a canonical 16-bit PCM .wav file
+WAV_HEADER = struct.Struct("<4sL4s4sLHHLLHH4sL")
+assert WAV_HEADER.size == WAV_HEADER_LENGTH
+
+# Characters that can be used in an instrument name
+_NAME_CHARACTERS = frozenset(string.ascii_letters + string.digits + string.punctuation + " ")
+
+
+class ConversionResult(NamedTuple):
+    """Result of converting a single file."""
+
+    source: str
+    destination: str
+    nbytes: int
+    seconds: float
+    error: str | None = None
+
+
+class WavInfo(NamedTuple):
+    """Format and location of the audio of a .wav file."""
+
+    audio_format: int
+    channels: int
+    rate: int
+    bits: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frames(self) -> int:
+        """Return the number of audio frames."""
+        return self.data_size // (self.channels * self.bits // 8)
+
+    @property
+    def is_pti_audio(self) -> bool:
+        """Return True if the audio can be copied to a .pti file as is (16-bit/44.1kHz mono PCM)."""
+        return (self.audio_format, self.channels, self.rate, self.bits) == (WAVE_FORMAT_PCM, 1, 44100, 16)
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_CHUNK_HEADER = struct.Struct("<4sL")
+_FMT_CHUNK = struct.Struct("<HHLLHH")
+
+
+def read_wav_info(fd: int) -> WavInfo:
+    """Walk the chunks of a .wav file (with positional reads) to find the format and audio."""
+    riff, _, wave = struct.unpack("<4sL4s", os.pread(fd, 12, 0).ljust(12, b"\x00"))
+    assert (riff, wave) == (b"RIFF", b"WAVE"), "Not a .wav file"
+    file_size = os.fstat(fd).st_size
+    fmt: tuple[int, ...] | None = None
+    offset = 12
+    while offset + _CHUNK_HEADER.size <= file_size:
+        chunk_id, chunk_size = _CHUNK_HEADER.unpack(os.pread(fd, _CHUNK_HEADER.size, offset))
+        offset += _CHUNK_HEADER.size
+        if chunk_id == b"fmt ":
+            assert chunk_size >= _FMT_CHUNK.size, f"{chunk_size=}"
+            fmt = _FMT_CHUNK.unpack(os.pread(fd, _FMT_CHUNK.size, offset))
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE:
+                # The format code is the first two bytes of the sub format GUID
+                fmt = (*struct.unpack("<H", os.pread(fd, 2, offset + 24)), *fmt[1:])
+        elif chunk_id == b"data":
+            assert fmt is not None, "Missing fmt chunk"
+            audio_format, channels, rate, _, _, bits = fmt
+            assert audio_format in {WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT}, f"{audio_format=}"
+            assert channels > 0 and rate > 0, f"{channels=} {rate=}"
+            assert (audio_format, bits) in _SAMPLE_FORMATS, f"{audio_format=} {bits=}"
+            # The data size may be missing (streamed files) or wrong (truncated files)
+            size = min(chunk_size, file_size - offset)
+            return WavInfo(audio_format, channels, rate, bits, offset, size - size % (channels * bits // 8))
+        offset += chunk_size + chunk_size % 2  # Chunks are padded to an even size
+    raise AssertionError("Missing data chunk")
+
+
+def instrument_name(path: str | os.PathLike[str]) -> str:
+    """Return an instrument name for a file (its file name, limited to 31 ASCII characters)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return "".join(c if c in _NAME_CHARACTERS else "_" for c in stem)[:31]
+
+
+def copy_range(src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int) -> None:
+    """
+    Copy count bytes between files, in the kernel if possible.
+
+    Uses os.copy_file_range, then os.sendfile, falling back to
+    positional reads and writes. File positions are not used.
+    """
+    copied = 0
+    try:
+        while copied < count:
+            size = os.copy_file_range(src_fd, dst_fd, count - copied, src_offset + copied, dst_offset + copied)
+            if not size:
+                break
+            copied += size
+    except (AttributeError, OSError):  # Not supported by the platform or file system
+        pass
+    if copied < count and hasattr(os, "sendfile"):
+        try:
+            os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+            while copied < count:
+                if not (size := os.sendfile(dst_fd, src_fd, src_offset + copied, count - copied)):
+                    break
+                copied += size
+        except OSError:
+            pass
+    while copied < count:
+        if not (data := os.pread(src_fd, min(count - copied, 1 << 20), src_offset + copied)):
+            break
+        copied += os.pwrite(dst_fd, data, dst_offset + copied)
+    assert copied == count, f"{copied=} {count=}"
+
+
+##
+# Convert any PCM/float .wav file to 16-bit/44.1kHz mono
+##
+
+# NumPy dtypes of .wav samples, 24-bit samples are converted separately
+_SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): "u1",
+    (WAVE_FORMAT_PCM, 16): "<i2",
+    (WAVE_FORMAT_PCM, 24): None,
+    (WAVE_FORMAT_PCM, 32): "<i4",
+    (WAVE_FORMAT_IEEE_FLOAT, 32): "<f4",
+    (WAVE_FORMAT_IEEE_FLOAT, 64): "<f8",
+}
+
+# Half the number of taps of the resampling filter
+RESAMPLE_HALF_TAPS = 16
+
+# Resample phase by phase when output frames repeat at most this many phases (e.g. 147 for 48kHz)
+RESAMPLE_MAX_PERIOD = 1024
+
+
+def _to_float(data: bytes, info: WavInfo) -> numpy.ndarray:
+    """Return .wav samples as a (frames, channels) array of floats (-1.0-1.0)."""
+    numpy = _import_numpy()
+    if info.bits == 24:
+        raw = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.int32)
+        samples = (raw[:, 0] << 8 | raw[:, 1] << 16 | raw[:, 2] << 24) >> 8  # Sign extend
+        scaled = samples / 2**23
+    else:
+        samples = numpy.frombuffer(data, dtype=_SAMPLE_FORMATS[info.audio_format, info.bits])
+        if info.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+            scaled = samples.astype(numpy.float64)
+        elif info.bits == 8:
+            scaled = (samples.astype(numpy.float64) - 128) / 128  # 8-bit samples are unsigned
+        else:
+            scaled = samples / 2 ** (info.bits - 1)
+    return scaled.reshape(-1, info.channels)
+
+
+class _Resampler:
+    """Polyphase windowed sinc resampler that processes audio in blocks."""
+
+    def __init__(self, rate: int, target_rate: int) -> None:
+        numpy = _import_numpy()
+        self.rate = rate
+        self.target_rate = target_rate
+        # Output frames fall on target_rate / gcd distinct fractions of an input frame
+        self.step = math.gcd(rate, target_rate)
+        fractions = numpy.arange(0, target_rate, self.step) / target_rate
+        self.taps = numpy.arange(-RESAMPLE_HALF_TAPS + 1, RESAMPLE_HALF_TAPS + 1)
+        distance = fractions[:, None] - self.taps
+        # Low-pass at the lower Nyquist frequency, to prevent aliasing when downsampling
+        cutoff = min(1.0, target_rate / rate)
+        window = 0.5 + 0.5 * numpy.cos(numpy.pi * distance / RESAMPLE_HALF_TAPS)  # Hann
+        self.weights = cutoff * numpy.sinc(cutoff * distance) * window
+        self.weights /= self.weights.sum(axis=1, keepdims=True)
+        self.buffer = numpy.zeros(RESAMPLE_HALF_TAPS)  # Silence before the first sample
+        self.start = -RESAMPLE_HALF_TAPS  # Input frame of buffer[0]
+        self.produced = 0  # Output frames
+
+    def process(self, samples: numpy.ndarray, *, last: bool = False) -> numpy.ndarray:
+        """Return the output frames that can be computed after adding samples."""
+        numpy = _import_numpy()
+        self.buffer = numpy.concatenate([self.buffer, samples])
+        end = self.start + len(self.buffer)  # Input frames available
+        if last:
+            total = -(-(end * self.target_rate) // self.rate)  # Output frames of all input (rounded up)
+            self.buffer = numpy.concatenate([self.buffer, numpy.zeros(RESAMPLE_HALF_TAPS)])
+        else:
+            # Every tap of the filter must be available
+            total = (end - RESAMPLE_HALF_TAPS - 1) * self.target_rate // self.rate + 1
+        if total <= self.produced:
+            return numpy.zeros(0)
+        position = numpy.arange(self.produced, total, dtype=numpy.int64) * self.rate
+        first, fraction = numpy.divmod(position, self.target_rate)
+        # Every row holds the taps of one output frame
+        windows = numpy.lib.stride_tricks.sliding_window_view(self.buffer, len(self.taps))
+        windows = windows[first - self.start - RESAMPLE_HALF_TAPS + 1]
+        phases = fraction // self.step
+        period = len(self.weights)  # Output frames repeat the same phases
+        if period <= RESAMPLE_MAX_PERIOD:
+            output = numpy.empty(len(windows))
+            for phase in range(min(period, len(windows))):
+                output[phase::period] = windows[phase::period] @ self.weights[phases[phase]]
+        else:
+            output = numpy.einsum("ij,ij->i", windows, self.weights[phases])
+        self.produced = total
+        # Drop input frames that are no longer needed
+        keep = total * self.rate // self.target_rate - RESAMPLE_HALF_TAPS + 1 - self.start
+        if keep > 0:
+            self.buffer = self.buffer[keep:]
+            self.start += keep
+        return output
+
+
+def _to_int16(samples: numpy.ndarray, rng: numpy.random.Generator) -> numpy.ndarray:
+    """Return float samples as 16-bit integers, with triangular (TPDF) dither."""
+    numpy = _import_numpy()
+    dither = rng.random(len(samples)) - rng.random(len(samples))
+    return numpy.clip(numpy.rint(samples * 32768 + dither), -32768, 32767).astype("<i2")
+
+
+def _pwrite_all(fd: int, data: bytes | memoryview, offset: int) -> None:
+    """Write all of data to fd at offset, without changing the file position."""
+    # Release the view when a write fails as well, data can be a view of a memory map
+    with memoryview(data) as view:
+        written = 0
+        while written < view.nbytes:
+            written += os.pwrite(fd, view[written:], offset + written)
+
+
+def _check_numpy() -> None:
+    """Raise ImportError if NumPy (needed by transcode) is not installed."""
+    if _import_numpy() is None:
+        raise ImportError("Converting .wav files that are not 16-bit/44.1kHz mono requires NumPy")
+
+
+def transcode(
+    src_fd: int,
+    info: WavInfo,
+    dst_fd: int,
+    dst_offset: int,
+    *,
+    block_frames: int = 1 << 16,
+) -> int:
+    """
+    Convert .wav audio to 16-bit/44.1kHz mono and write it to dst_fd at dst_offset.
+
+    The audio is processed in blocks of block_frames frames: channels are
+    averaged, the audio is resampled (windowed sinc) and requantized with
+    dither. Returns the number of bytes written. Requires NumPy.
+    """
+    _check_numpy()
+    numpy = _import_numpy()
+    frame_size = info.channels * info.bits // 8
+    resampler = _Resampler(info.rate, 44100) if info.rate != 44100 else None
+    rng = numpy.random.default_rng(0)  # Same input, same output
+    written = 0
+    for start in range(0, max(info.frames, 1), block_frames):
+        size = min(block_frames, info.frames - start) * frame_size
+        data = os.pread(src_fd, size, info.data_offset + start * frame_size)
+        assert len(data) == size, f"{len(data)=} {size=}"
+        samples = _to_float(data, info).mean(axis=1)
+        if resampler is not None:
+            samples = resampler.process(samples, last=start + block_frames >= info.frames)
+        output = _to_int16(samples, rng).tobytes()
+        _pwrite_all(dst_fd, output, dst_offset + written)
+        written += len(output)
+    return written
+
+
+def wav_to_pti(source: str | os.PathLike[str], destination: str | os.PathLike[str]) -> int:
+    """
+    Convert a .wav file to a .pti file, return the size of the audio.
+
+    16-bit/44.1kHz mono audio is copied as is, anything else is converted with transcode.
+    Nothing is left at destination if the conversion fails.
+    """
+    src_fd = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        info = read_wav_info(src_fd)
+        if info.is_pti_audio:
+            frames = info.frames
+        else:
+            _check_numpy()  # Before creating the destination
+            frames = info.frames if info.rate == 44100 else -(-(info.frames * 44100) // info.rate)
+        header = encode_header(name=instrument_name(destination), sample_length=frames)
+        dst_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            try:
+                os.pwrite(dst_fd, header, 0)
+                if info.is_pti_audio:
+                    copy_range(src_fd, info.data_offset, dst_fd, PTI_HEADER_LENGTH, info.data_size)
+                else:
+                    assert transcode(src_fd, info, dst_fd, PTI_HEADER_LENGTH) == frames * FRAME_SIZE
+            finally:
+                os.close(dst_fd)
+        except BaseException:
+            os.unlink(destination)  # A header without (all of) its audio is not a valid .pti file
+            raise
+    finally:
+        os.close(src_fd)
+    return frames * FRAME_SIZE
+
+
+def wav_header(nbytes: int) -> bytes:
+    """Return the header of a canonical 16-bit/44.1kHz mono .wav file with nbytes of audio."""
+    rate = 44100
+    return WAV_HEADER.pack(
+        b"RIFF", 36 + nbytes, b"WAVE", b"fmt ", 16, 1, 1, rate, rate * FRAME_SIZE, FRAME_SIZE, 16, b"data", nbytes
+    )
+
+
+def export_wav(
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    *,
+    playback_region: bool = False,
+) -> int:
+    """
+    Convert a .pti file to a .wav file, return the size of the audio.
+
+    With playback_region, only the audio from playback start to playback end is exported.
+    Nothing is left at destination if the conversion fails.
+    """
+    src_fd = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        record = decode_header(get_header(src_fd))
+        frames = (os.fstat(src_fd).st_size - PTI_HEADER_LENGTH) // FRAME_SIZE
+        # The sample length is 0 (not set) for some instruments
+        assert record.sample_length in {0, frames}, f"{record.sample_length=} {frames=}"
+        start, stop = 0, record.sample_length or frames
+        if playback_region:
+            start, stop = (position_to_frame(record.playback_start, stop), position_to_frame(record.playback_end, stop))
+        nbytes = max(0, stop - start) * FRAME_SIZE
+        dst_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            try:
+                os.pwrite(dst_fd, wav_header(nbytes), 0)
+                copy_range(src_fd, PTI_HEADER_LENGTH + start * FRAME_SIZE, dst_fd, WAV_HEADER_LENGTH, nbytes)
+            finally:
+                os.close(dst_fd)
+        except BaseException:
+            os.unlink(destination)  # A header without (all of) its audio is not a valid .wav file
+            raise
+    finally:
+        os.close(src_fd)
+    return nbytes
+
+
+def export_slices(
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    *,
+    pti: bool = False,
+) -> int:
+    """
+    Write every slice of a SLICE or BEAT_SLICE .pti file to its own file in destination, return the size of the audio.
+
+    The slices are named 01.wav, 02.wav, etc. (or .pti files with pti,
+    one-shot instruments with the settings of source). The audio is
+    written straight from a memory map of source with positional writes.
+    """
+    with map_pti(source) as data:
+        header = get_header(data)
+        record = decode_header(header)
+        assert record.sample_playback in {SamplePlayback.SLICE, SamplePlayback.BEAT_SLICE}, f"{record.sample_playback=}"
+        frames = (len(data) - PTI_HEADER_LENGTH) // FRAME_SIZE
+        # The sample length is 0 (not set) for some instruments
+        assert record.sample_length in {0, frames}, f"{record.sample_length=} {frames=}"
+        os.makedirs(destination, exist_ok=True)
+        nbytes = 0
+        # The memory map can only be closed once every view of it is released (also when a write fails)
+        with memoryview(data) as view:
+            for n, (start, stop) in enumerate(slice_bounds(header, frames), start=1):
+                path = os.path.join(destination, f"{n:02d}{'.pti' if pti else '.wav'}")
+                if pti:
+                    name = instrument_name(f"{n:02d} {os.path.basename(destination)}")
+                    prefix = bytes(encode_header(
+                        template=header,
+                        name=name,
+                        sample_length=stop - start,
+                        sample_playback=SamplePlayback.ONE_SHOT,
+                        num_slices=0,
+                        slice_n=[0] * 48,
+                    ))
+                else:
+                    prefix = wav_header((stop - start) * FRAME_SIZE)
+                dst_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+                try:
+                    with view[PTI_HEADER_LENGTH + start * FRAME_SIZE:PTI_HEADER_LENGTH + stop * FRAME_SIZE] as audio:
+                        _pwrite_all(dst_fd, prefix, 0)
+                        _pwrite_all(dst_fd, audio, len(prefix))
+                finally:
+                    os.close(dst_fd)
+                nbytes += (stop - start) * FRAME_SIZE
+    return nbytes
+
+
+def _convert(convert: Callable[[str, str], int], source: str, destination: str) -> ConversionResult:
+    """Convert a single file, and time it."""
+    start = time.perf_counter()
+    try:
+        nbytes = convert(source, destination)
+    except (OSError, AssertionError, ValueError, ImportError, struct.error) as e:
+        return ConversionResult(source, destination, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    return ConversionResult(source, destination, nbytes, time.perf_counter() - start)
+
+
+def _convert_files(
+    convert: Callable[[str, str], int],
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    extensions: tuple[str, str],
+    workers: int | None,
+) -> Iterator[ConversionResult]:
+    """
+    Convert every file with the first extension in (sub directories of) source to a file with the second extension.
+
+    The converted files are written to the same sub directories in destination.
+    """
+    os.makedirs(destination, exist_ok=True)
+    jobs = []
+    # Walk all of source first, destination can be in source
+    for path in list(iter_files(source, extensions[0])):
+        target = os.path.join(destination, os.path.splitext(os.path.relpath(path, source))[0] + extensions[1])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        jobs.append((path, target))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_convert, convert, *job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def convert_directory(
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    *,
+    workers: int | None = None,
+) -> Iterator[ConversionResult]:
+    """Convert every .wav file in source to a .pti file in destination, yield results as they finish."""
+    return _convert_files(wav_to_pti, source, destination, (".wav", ".pti"), workers)
+
+
+def export_directory(
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    *,
+    workers: int | None = None,
+    playback_region: bool = False,
+) -> Iterator[ConversionResult]:
+    """Convert every .pti file in source to a .wav file in destination, yield results as they finish."""
+    convert = functools.partial(export_wav, playback_region=playback_region)
+    return _convert_files(convert, source, destination, (".pti", ".wav"), workers)
+
+
+def export_slices_directory(
+    source: str | os.PathLike[str],
+    destination: str | os.PathLike[str],
+    *,
+    workers: int | None = None,
+    pti: bool = False,
+) -> Iterator[ConversionResult]:
+    """Export the slices of every .pti file in source to a directory (per file) in destination, see export_slices."""
+    convert = functools.partial(export_slices, pti=pti)
+    return _convert_files(convert, source, destination, (".pti", ""), workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source", help="directory of .wav files (or .pti files with --export)")
+    parser.add_argument("destination", help="directory to write .pti files (or .wav files with --export) to")
+    parser.add_argument("--export", action="store_true", help="convert .pti files to .wav files")
+    parser.add_argument("--playback-region", action="store_true", help="only export playback start to end")
+    parser.add_argument(
+        "--slices", action="store_true", help="export every slice of sliced .pti files (to a directory per file)",
+    )
+    parser.add_argument("--pti", action="store_true", help="export slices as .pti files instead of .wav files")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = 0
+    if args.slices:
+        results = export_slices_directory(args.source, args.destination, workers=args.workers, pti=args.pti)
+    elif args.export:
+        results = export_directory(
+            args.source, args.destination, workers=args.workers, playback_region=args.playback_region
+        )
+    else:
+        results = convert_directory(args.source, args.destination, workers=args.workers)
+    for result in results:
+        if result.error is not None:
+            print(f"{result.source}: {result.error}")
+            continue
+        total += result.nbytes
+        print(f"{result.destination}: {result.nbytes / max(result.seconds, 1e-9) / 1e6:.1f} MB/s")
+    elapsed = time.perf_counter() - start
+    print(f"Converted {total / 1e6:.1f} MB in {elapsed:.2f}s ({total / elapsed / 1e6:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Generate a library of synthetic (but valid) .pti files, for benchmarks and fuzzing."""
+from __future__ import annotations
+
+import argparse
+import enum
+import os
+import random
+import time
+
+from collections.abc import Iterator
+from typing import Any
+
+from genwav import Signal, gen_audio
+from inspectpti import DEFAULT_HEADER, FRAME_SIZE, PtiHeader, SamplePlayback, decode_header, encode_header, write_pti
+
+# Number of .pti files per sub directory
+FILES_PER_DIRECTORY = 1000
+
+WAVETABLE_WINDOW_SIZES = (32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _enum_fields() -> dict[str, type[enum.Enum]]:
+    """Return the enum type of every enum field, every value is used once a corpus has enough files."""
+    record = decode_header(DEFAULT_HEADER)
+    return {
+        name: type(value) for name in PtiHeader.__slots__ if isinstance(value := getattr(record, name), enum.Enum)
+    }
+
+
+_ENUM_FIELDS = _enum_fields()
+
+
+def _field_ranges() -> dict[str, tuple[Any, Any]]:
+    """Return the range of the numeric fields (the same ranges the getters validate)."""
+    ranges: dict[str, tuple[Any, Any]] = {
+        "volume": (0, 100),
+        "panning": (0, 100),
+        "tune": (-24, 24),
+        "finetune": (-100, 100),
+        "filter_cutoff": (0.0, 1.0),
+        "filter_resonance": (0.0, 4.3),
+        "overdrive": (0, 100),
+        "bit_depth": (4, 16),
+        "delay_send": (0, 100),
+        "reverb_send": (0, 100),
+        "granular_length": (44, 44100),
+        "granular_position": (0, 65535),
+    }
+    for name in PtiHeader.__slots__:
+        if name.endswith(("_envelope_attack", "_envelope_decay", "_envelope_release")):
+            ranges[name] = (0, 10000)
+        elif name.endswith(("_envelope_amount", "_envelope_sustain", "_lfo_amount")):
+            ranges[name] = (0.0, 1.0)
+    return ranges
+
+
+_FIELD_RANGES = _field_ranges()
+
+
+def random_fields(index: int, *, seed: int = 0, frames: int = 4410) -> dict[str, Any]:
+    """
+    Return random (but in range) PtiHeader values for the instrument at index.
+
+    The values only depend on seed and index. Enum values are taken in
+    turn, so every value of every enum is used in the first 29 instruments
+    (the number of AutomationLfoSteps). Wavetable instruments are rounded
+    down to a whole number of windows, so sample_length may be less than frames.
+    """
+    rng = random.Random(f"{seed}-{index}")
+    fields: dict[str, Any] = {"name": f"synthetic {seed}-{index}"[:31]}
+    for position, (name, enum_type) in enumerate(_ENUM_FIELDS.items()):
+        members = list(enum_type)
+        fields[name] = members[(index + position) % len(members)]
+    for name, (low, high) in _FIELD_RANGES.items():
+        fields[name] = rng.randint(low, high) if isinstance(low, int) else rng.uniform(low, high)
+
+    # 0 < playback_start < loop_start < loop_end < playback_end < 65535
+    fields["playback_start"], fields["loop_start"], fields["loop_end"], fields["playback_end"] = sorted(
+        rng.sample(range(1, 65535), 4)
+    )
+
+    playback = fields["sample_playback"]
+    fields["is_wavetable"] = playback == SamplePlayback.WAVETABLE
+    fields["wavetable_window_size"] = window_size = rng.choice(WAVETABLE_WINDOW_SIZES)
+    if playback == SamplePlayback.WAVETABLE:
+        fields["wavetable_total_positions"] = positions = max(frames // window_size, 1)
+        fields["wavetable_position"] = rng.randrange(positions)
+        frames = positions * window_size
+    else:
+        fields["wavetable_total_positions"] = fields["wavetable_position"] = 0
+
+    if playback in {SamplePlayback.SLICE, SamplePlayback.BEAT_SLICE}:
+        fields["num_slices"] = num_slices = rng.randint(1, 48)
+        fields["slice_n"] = sorted(rng.sample(range(65536), num_slices)) + [0] * (48 - num_slices)
+    else:
+        fields["num_slices"] = 0
+        fields["slice_n"] = [0] * 48
+
+    fields["sample_length"] = frames
+    return fields
+
+
+def generate_corpus(
+    root: str | os.PathLike[str],
+    count: int,
+    *,
+    seed: int = 0,
+    min_frames: int = 441,
+    max_frames: int = 4410,
+) -> Iterator[str]:
+    """
+    Write count synthetic .pti files to root and yield their paths.
+
+    Files are spread over sub directories of FILES_PER_DIRECTORY files. The
+    audio (noise, min_frames to max_frames frames) is sliced from a single
+    buffer, so generating is limited by the file system. The same seed
+    always creates the same files.
+    """
+    assert 0 < min_frames <= max_frames, f"{min_frames=} {max_frames=}"
+    rng = random.Random(seed)
+    # Wavetables need at least one window
+    audio = memoryview(gen_audio(Signal(max(max_frames, *WAVETABLE_WINDOW_SIZES), waveform="noise", seed=seed)))
+    for index in range(count):
+        directory = os.path.join(root, f"{index // FILES_PER_DIRECTORY:04d}")
+        if index % FILES_PER_DIRECTORY == 0:
+            os.makedirs(directory, exist_ok=True)
+        fields = random_fields(index, seed=seed, frames=rng.randint(min_frames, max_frames))
+        path = os.path.join(directory, f"{index:06d}.pti")
+        write_pti(path, encode_header(**fields), audio[:fields["sample_length"] * FRAME_SIZE])
+        yield path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", help="directory to write the files to")
+    parser.add_argument("--count", type=int, default=10_000, help="number of files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-frames", type=int, default=441, help="minimum audio length (frames)")
+    parser.add_argument("--max-frames", type=int, default=4410, help="maximum audio length (frames)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = sum(
+        1 for _ in generate_corpus(
+            args.root, args.count, seed=args.seed, min_frames=args.min_frames, max_frames=args.max_frames,
+        )
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Generated {count} files in {elapsed:.2f}s ({count / elapsed:.0f} files/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Look for relationships between the unknown header bytes and everything else we know about .pti files."""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import zlib
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from inspectpti import PTI_HEADER_LENGTH, ValidatedHeader, _import_numpy, decode_headers, is_pti
+from scanpti import iter_pti_files
+
+if TYPE_CHECKING:
+    import numpy
+
+# Offset and NumPy dtype of the header values that are not understood (yet)
+UNKNOWN_FIELDS = {
+    "BYTE_5": (5, "u1"),
+    "BYTE_14": (14, "u1"),
+    "BYTES_56_59": (56, "<u4"),
+    "BYTES_388_391": (388, "<u4"),
+}
+
+
+class Corpus(NamedTuple):
+    """The headers and file sizes of many .pti files."""
+
+    paths: list[str]
+    headers: numpy.ndarray  # (files, PTI_HEADER_LENGTH) uint8
+    sizes: numpy.ndarray  # (files,) int64
+
+
+class Candidate(NamedTuple):
+    """A possible relationship between an unknown value and a feature."""
+
+    target: str
+    kind: str  # constant, function, linear, checksum or counter
+    feature: str | None
+    score: float  # Fraction of files the relationship holds for (R² for linear fits)
+    detail: str
+
+
+def load_corpus(paths: Iterable[str | os.PathLike[str]]) -> Corpus:
+    """Read the header and size of every .pti file in paths (files or directories), skipping invalid files."""
+    if (numpy := _import_numpy()) is None:
+        raise ImportError("discoverpti requires NumPy")
+    files, sizes = [], []
+    buffer = bytearray()
+    for path in paths:
+        for fname in iter_pti_files(path) if os.path.isdir(path) else [os.fspath(path)]:
+            with open(fname, "rb", buffering=0) as f:
+                header = f.read(PTI_HEADER_LENGTH)
+                size = os.fstat(f.fileno()).st_size
+            try:
+                if not is_pti(header):
+                    continue
+            except AssertionError:
+                continue
+            files.append(fname)
+            sizes.append(size)
+            buffer += header
+    headers = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(-1, PTI_HEADER_LENGTH)
+    return Corpus(files, headers, numpy.array(sizes, dtype=numpy.int64))
+
+
+def targets(corpus: Corpus) -> dict[str, numpy.ndarray]:
+    """Return the unknown values of every file, as int64 arrays."""
+    numpy = _import_numpy()
+    values = {}
+    for name, (offset, dtype) in UNKNOWN_FIELDS.items():
+        size = numpy.dtype(dtype).itemsize
+        raw = numpy.ascontiguousarray(corpus.headers[:, offset:offset + size])
+        values[name] = raw.view(dtype).reshape(-1).astype(numpy.int64)
+    return values
+
+
+def features(corpus: Corpus) -> dict[str, numpy.ndarray]:
+    """Return every known numeric value of every file (header fields, file size, audio size and file order)."""
+    numpy = _import_numpy()
+    # load_corpus only keeps valid headers
+    headers = (ValidatedHeader(row.tobytes(), trusted=True) for row in corpus.headers)
+    records = decode_headers(headers) if len(corpus.paths) else None
+    values: dict[str, numpy.ndarray] = {}
+    if records is not None:
+        for name in records.dtype.names:
+            column = records[name]
+            if column.ndim == 1 and column.dtype.kind in "biuf":
+                values[name] = column.astype(numpy.float64)
+    values["file_size"] = corpus.sizes.astype(numpy.float64)
+    values["audio_bytes"] = (corpus.sizes - PTI_HEADER_LENGTH).astype(numpy.float64)
+    values["file_order"] = numpy.argsort(numpy.argsort(corpus.paths, kind="stable")).astype(numpy.float64)
+    return values
+
+
+def checksums(corpus: Corpus, stop: int) -> dict[str, numpy.ndarray]:
+    """Return checksums of the header bytes before stop (e.g. the offset of the unknown value)."""
+    numpy = _import_numpy()
+    data = corpus.headers[:, :stop]
+    values = {
+        f"crc32(header[:{stop}])": numpy.array([zlib.crc32(row) for row in data], dtype=numpy.int64),
+        f"adler32(header[:{stop}])": numpy.array([zlib.adler32(row) for row in data], dtype=numpy.int64),
+        f"sum(header[:{stop}])": data.sum(axis=1, dtype=numpy.int64),
+        f"xor(header[:{stop}])": numpy.bitwise_xor.reduce(data, axis=1).astype(numpy.int64),
+    }
+    values[f"sum(header[:{stop}]) & 0xFF"] = values[f"sum(header[:{stop}])"] & 0xFF
+    values[f"sum(header[:{stop}]) & 0xFFFF"] = values[f"sum(header[:{stop}])"] & 0xFFFF
+    return values
+
+
+def _linear_fits(target: numpy.ndarray, columns: numpy.ndarray) -> tuple[numpy.ndarray, ...]:
+    """Return the slope, intercept, R² and largest residual of target ~ column for every column at once."""
+    numpy = _import_numpy()
+    x = columns - columns.mean(axis=1, keepdims=True)
+    y = target - target.mean()
+    variance = (x * x).sum(axis=1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        slope = (x @ y) / variance
+        intercept = target.mean() - slope * columns.mean(axis=1)
+        residuals = target - (slope[:, None] * columns + intercept[:, None])
+        r_squared = 1 - (residuals ** 2).sum(axis=1) / (y * y).sum()
+    return slope, intercept, r_squared, numpy.abs(residuals).max(axis=1)
+
+
+def _counter(target: numpy.ndarray, feature: numpy.ndarray) -> float:
+    """
+    Return the fraction of files for which target + feature is the target of another file.
+
+    This finds values that count up by the size of each file, like an
+    address of the next instrument in memory (the last file never matches).
+    """
+    numpy = _import_numpy()
+    steps = feature != 0
+    # Only whole steps, taken by most files, can be a counter
+    if steps.mean() < 0.5 or (feature % 1).any():
+        return 0.0
+    return float(numpy.mean(numpy.isin(target[steps] + feature[steps].astype(numpy.int64), target)))
+
+
+def discover(corpus: Corpus, *, min_score: float = 0.95) -> list[Candidate]:
+    """Return candidate relationships for every unknown value, best first."""
+    numpy = _import_numpy()
+    known = features(corpus)
+    names = list(known)
+    columns = numpy.array([known[name] for name in names]) if names else numpy.zeros((0, len(corpus.paths)))
+    # Features that take more than one value can explain something
+    varying = [i for i, column in enumerate(columns) if (column != column[0]).any()]
+    candidates = []
+    for target_name, target in targets(corpus).items():
+        unique = numpy.unique(target)
+        if len(unique) == 1:
+            candidates.append(Candidate(target_name, "constant", None, 1.0, f"always {int(unique[0])}"))
+            continue
+
+        offset = UNKNOWN_FIELDS[target_name][0]
+        for name, checksum in checksums(corpus, offset).items():
+            if (score := float(numpy.mean(checksum == target))) >= min_score:
+                candidates.append(Candidate(target_name, "checksum", name, score, f"{target_name} == {name}"))
+
+        slope, intercept, r_squared, error = _linear_fits(target.astype(numpy.float64), columns[varying])
+        # A high R² alone means little for clustered values (e.g. 0 or ~1.9e9), only report exact (integer) fits
+        for i, a, b, r2, e in zip(varying, slope, intercept, r_squared, error):
+            if r2 >= min_score and e < 0.5:
+                detail = f"{target_name} ≈ {a:.6g} * {names[i]} + {b:.6g} (R²={r2:.4f}, max error {e:.3g})"
+                candidates.append(Candidate(target_name, "linear", names[i], float(r2), detail))
+
+        for i in varying:
+            # target is a function of the feature if every feature value maps to a single target value
+            order = numpy.lexsort((target, columns[i]))
+            feature, values = columns[i][order], target[order]
+            same = feature[1:] == feature[:-1]
+            groups = len(target) - int(same.sum())
+            if not (same & (values[1:] != values[:-1])).any() and groups < len(target):
+                score = 1 - groups / len(target)
+                detail = f"{target_name} is determined by {names[i]} ({groups} distinct values)"
+                candidates.append(Candidate(target_name, "function", names[i], score, detail))
+
+        for i, name in enumerate(names):
+            if (score := _counter(target, columns[i])) >= min_score:
+                detail = f"{target_name} + {name} is the {target_name} of another file"
+                candidates.append(Candidate(target_name, "counter", name, score, detail))
+    order = {"constant": 0, "checksum": 1, "counter": 2, "linear": 3, "function": 4}
+    return sorted(candidates, key=lambda candidate: (candidate.target, order[candidate.kind], -candidate.score))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help=".pti files or directories")
+    parser.add_argument("--min-score", type=float, default=0.95, help="only report relationships this strong (0-1)")
+    parser.add_argument("--json", action="store_true", help="print the candidates as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.paths)
+    candidates = discover(corpus, min_score=args.min_score)
+    if args.json:
+        document: list[dict[str, Any]] = [candidate._asdict() for candidate in candidates]
+        print(json.dumps({"files": len(corpus.paths), "candidates": document}, indent=2))
+        return
+    print(f"{len(corpus.paths)} files")
+    for candidate in candidates:
+        print(f"{candidate.target:<14} {candidate.kind:<9} {candidate.score:6.1%}  {candidate.detail}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,156 @@
 #!/usr/bin/env python3
 """Create .wav files."""
+from __future__ import annotations
+
+import argparse
 import array
 import math
+import os
+import random
+import sys
 import wave
 
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from inspectpti import _import_numpy
+
+SAMPLE_RATE = 44100
+
+# Number of frames synthesized (and written) at once
+CHUNK_FRAMES = 1 << 16
+
+WAVEFORMS = ("sine", "square", "saw", "triangle", "noise")
+
+# Lengths (in milliseconds) of the files in sample-test/
+DEFAULT_LENGTHS = (10, 250, 1_000, 5_000, 10_000)
+
+
+class Signal(NamedTuple):
+    """A test signal, 16-bit mono at 44.1kHz."""
+
+    frames: int
+    frequency: float = 440.0
+    waveform: str = "sine"
+    amplitude: int = 32765
+    sweep_to: float | None = None  # Linear sweep from frequency to sweep_to (Hz)
+    seed: int = 0  # Noise only
+
+
+def frames_for(len_ms: float) -> int:
+    """Return the number of frames of len_ms milliseconds of audio."""
+    return int(len_ms * SAMPLE_RATE / 1000)
+
+
+def _shape(waveform: str, cycles: float) -> float:
+    """Return the value (-1.0-1.0) of a waveform after a number of cycles."""
+    if waveform == "sine":
+        return math.sin(2 * math.pi * cycles)
+    phase = cycles % 1.0
+    if waveform == "square":
+        return 1.0 if phase < 0.5 else -1.0
+    if waveform == "saw":
+        return 2 * phase - 1
+    return 1 - 4 * abs(phase - 0.5)  # Triangle
+
+
+def _chunks_array(signal: Signal, chunk_frames: int) -> Iterator[bytes]:
+    """Yield the audio of signal in chunks, one sample at a time (without NumPy)."""
+    rng = random.Random(signal.seed)
+    duration = signal.frames / SAMPLE_RATE
+    for start in range(0, signal.frames, chunk_frames):
+        times = (n / SAMPLE_RATE for n in range(start, min(start + chunk_frames, signal.frames)))
+        if signal.waveform == "noise":
+            values = (rng.uniform(-1.0, 1.0) for _ in times)
+        elif signal.sweep_to is None:
+            values = (_shape(signal.waveform, signal.frequency * t) for t in times)
+        else:
+            slope = (signal.sweep_to - signal.frequency) / (2 * duration)
+            values = (_shape(signal.waveform, (signal.frequency + slope * t) * t) for t in times)
+        audio = array.array("h", (int(signal.amplitude * value) for value in values))
+        if sys.byteorder == "big":
+            audio.byteswap()
+        yield audio.tobytes()
+
 
-def _gen_audio(len_ms: int) -> bytes:
-    """Return a byte string representing an audio waveform of the requested length (in milliseconds)."""
-    audio = array.array('h')
+def _chunks_numpy(signal: Signal, chunk_frames: int) -> Iterator[bytes]:
+    """Yield the audio of signal in chunks, synthesized a chunk at a time."""
+    numpy = _import_numpy()
+    rng = numpy.random.default_rng(signal.seed)
+    duration = signal.frames / SAMPLE_RATE
+    for start in range(0, signal.frames, chunk_frames):
+        times = numpy.arange(start, min(start + chunk_frames, signal.frames)) / SAMPLE_RATE
+        if signal.waveform == "noise":
+            values = rng.uniform(-1.0, 1.0, len(times))
+        else:
+            if signal.sweep_to is None:
+                cycles = signal.frequency * times
+            else:
+                cycles = (signal.frequency + (signal.sweep_to - signal.frequency) / (2 * duration) * times) * times
+            if signal.waveform == "sine":
+                values = numpy.sin(2 * numpy.pi * cycles)
+            else:
+                phase = cycles % 1.0
+                if signal.waveform == "square":
+                    values = numpy.where(phase < 0.5, 1.0, -1.0)
+                elif signal.waveform == "saw":
+                    values = 2 * phase - 1
+                else:
+                    values = 1 - 4 * numpy.abs(phase - 0.5)
+        # Truncate (like int()), so both implementations agree
+        yield (signal.amplitude * values).astype("<i2").tobytes()
 
-    for n in range(int(len_ms * 44.1)):
-        audio.append(int(32765 * math.sin(2 * math.pi * 440 * (n / 44100))))
 
-    return audio.tobytes()
+def iter_chunks(signal: Signal, *, chunk_frames: int = CHUNK_FRAMES) -> Iterator[bytes]:
+    """
+    Yield the 16-bit audio of signal in chunks of (at most) chunk_frames frames.
 
+    Uses NumPy if available. Both implementations return the same audio,
+    apart from noise (each uses its own random number generator).
+    """
+    assert signal.waveform in WAVEFORMS, f"{signal.waveform=}"
+    assert 0 <= signal.amplitude <= 32767, f"{signal.amplitude=}"
+    assert chunk_frames > 0, f"{chunk_frames=}"
+    if _import_numpy() is None:
+        return _chunks_array(signal, chunk_frames)
+    return _chunks_numpy(signal, chunk_frames)
 
-with wave.open('test-10ms.wav', 'wb') as f:
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(44100)
-    f.writeframes(_gen_audio(10))
 
+def gen_audio(signal: Signal) -> bytes:
+    """Return the 16-bit audio of signal."""
+    return b"".join(iter_chunks(signal, chunk_frames=max(signal.frames, 1)))
 
-with wave.open('test-250ms.wav', 'wb') as f:
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(44100)
-    f.writeframes(_gen_audio(250))
 
+def write_wav(path: str | os.PathLike[str], signal: Signal, *, chunk_frames: int = CHUNK_FRAMES) -> None:
+    """Write signal to a 16-bit/44.1kHz mono .wav file, a chunk at a time."""
+    with wave.open(os.fspath(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.setnframes(signal.frames)  # The header is written once
+        for chunk in iter_chunks(signal, chunk_frames=chunk_frames):
+            f.writeframesraw(chunk)
 
-with wave.open('test-1000ms.wav', 'wb') as f:
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(44100)
-    f.writeframes(_gen_audio(1_000))
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--length", type=float, nargs="+", default=DEFAULT_LENGTHS, metavar="MS",
+        help="lengths of the files (in milliseconds), one file per length",
+    )
+    parser.add_argument("--frequency", type=float, default=440.0, help="frequency (Hz)")
+    parser.add_argument("--waveform", choices=WAVEFORMS, default="sine")
+    parser.add_argument("--amplitude", type=int, default=32765, help="peak amplitude (0-32767)")
+    parser.add_argument("--sweep-to", type=float, default=None, metavar="FREQUENCY", help="sweep to frequency (Hz)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the noise")
+    parser.add_argument("--prefix", default="test", help="file names are <prefix>-<length>ms.wav")
+    parser.add_argument("--output", default=".", help="directory to write the files to")
+    args = parser.parse_args()
 
-with wave.open('test-5000ms.wav', 'wb') as f:
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(44100)
-    f.writeframes(_gen_audio(5_000))
+    for len_ms in args.length:
+        signal = Signal(frames_for(len_ms), args.frequency, args.waveform, args.amplitude, args.sweep_to, args.seed)
+        write_wav(os.path.join(args.output, f"{args.prefix}-{len_ms:g}ms.wav"), signal)
 
 
-with wave.open('test-10000ms.wav', 'wb') as f:
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(44100)
-    f.writeframes(_gen_audio(10_000))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Keep an index of the headers of a library of Polyend Tracker .pti files."""
+from __future__ import annotations
+
+import argparse
+import enum
+import json
+import os
+import sqlite3
+import time
+
+from typing import Any, NamedTuple
+
+from inspectpti import HeaderOffset, HeaderStruct, decode_header, get_header
+from scanpti import iter_pti_files
+
+# SQLite column types for the HeaderStruct formats (enums are stored by name)
+_COLUMN_TYPES = {"?": "INTEGER", "b": "INTEGER", "B": "INTEGER", "H": "INTEGER", "L": "INTEGER", "f": "REAL"}
+
+
+def _columns() -> dict[str, str]:
+    """Return the name and type of the index column for every HeaderOffset."""
+    columns = {}
+    for field in sorted(HeaderOffset):
+        code = HeaderStruct[field.name].format.lstrip("<")
+        columns[field.name.lower()] = "TEXT" if code.endswith("s") else _COLUMN_TYPES[code]
+    columns["slice_n"] = "TEXT"  # JSON list of all 48 slice positions
+    return columns
+
+
+COLUMNS = _columns()
+
+
+class RefreshStats(NamedTuple):
+    """Number of files added, updated, removed and unchanged by refresh_index."""
+
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+
+
+def open_index(path: str | os.PathLike[str]) -> sqlite3.Connection:
+    """Open (or create) a header index database."""
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    columns = ", ".join(f"{name} {column_type}" for name, column_type in COLUMNS.items())
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS pti ("
+        "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, error TEXT, "
+        f"{columns})"
+    )
+    return connection
+
+
+def _to_column(value: Any) -> Any:
+    """Return a decoded header value as an SQLite value."""
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, tuple):
+        return json.dumps(value)
+    return value
+
+
+def _index_row(path: str, stat: os.stat_result) -> tuple[Any, ...]:
+    """Return the index row of a .pti file."""
+    try:
+        record = decode_header(get_header(path))
+    except (OSError, AssertionError, ValueError) as e:
+        return (path, stat.st_size, stat.st_mtime_ns, f"{type(e).__name__}: {e}", *[None] * len(COLUMNS))
+    return (path, stat.st_size, stat.st_mtime_ns, None, *[_to_column(getattr(record, name)) for name in COLUMNS])
+
+
+def refresh_index(connection: sqlite3.Connection, root: str | os.PathLike[str]) -> RefreshStats:
+    """
+    Bring the index up to date with the .pti files in root.
+
+    Only the headers of new files, and of files whose size or modification
+    time changed, are read. Files that are no longer in root are removed.
+    """
+    root = os.path.abspath(root)
+    prefix = os.path.join(root, "")
+    indexed = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in connection.execute("SELECT path, size, mtime_ns FROM pti")
+        if path.startswith(prefix)
+    }
+
+    rows = []
+    added = unchanged = 0
+    for path in iter_pti_files(root):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # Removed while walking the library
+        previous = indexed.pop(path, None)
+        if previous == (stat.st_size, stat.st_mtime_ns):
+            unchanged += 1
+            continue
+        added += previous is None
+        rows.append(_index_row(path, stat))
+
+    placeholders = ", ".join("?" * (3 + 1 + len(COLUMNS)))
+    with connection:
+        connection.executemany(f"INSERT OR REPLACE INTO pti VALUES ({placeholders})", rows)
+        connection.executemany("DELETE FROM pti WHERE path = ?", ((path,) for path in indexed))
+    return RefreshStats(added, len(rows) - added, len(indexed), unchanged)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("index", help="path to the index database")
+    parser.add_argument("root", help="directory of .pti files to index")
+    parser.add_argument("--where", help="print the paths of indexed files matching an SQL condition")
+    args = parser.parse_args()
+
+    connection = open_index(args.index)
+    start = time.perf_counter()
+    stats = refresh_index(connection, args.root)
+    print(f"{stats} in {time.perf_counter() - start:.2f}s")
+    if args.where:
+        for row in connection.execute(f"SELECT path FROM pti WHERE {args.where} ORDER BY path"):
+            print(row["path"])
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,31 +2,51 @@
 """Inspect Polyend Tracker .pti files."""
 from __future__ import annotations
 
+import argparse
+import array
+import contextlib
 import enum
 import functools
 import glob
 import io
 import json
+import mmap
+import operator
 import os
+import pathlib
 import struct
+import sys
+import threading
+import time
+import zlib
 
+from collections.abc import Iterable, Iterator, Mapping
 from typing import Any, Callable
 
+# NumPy is optional, and only imported when first needed (importing it takes longer than importing this module)
+_NOT_IMPORTED: Any = object()
+numpy: Any = _NOT_IMPORTED
+
+
+def _import_numpy() -> Any:
+    """Return NumPy (imported on first use), or None if it is not installed."""
+    global numpy
+    if numpy is _NOT_IMPORTED:
+        try:
+            import numpy as module
+        except ImportError:  # NumPy is optional
+            module = None
+        numpy = module
+    return numpy
+
+
 ##
 # Discover header length by finding PCM data offset
 ##
 
-with open("./test.wav", "rb") as f:
-    test_wav_data = f.read()
-
-with open("./test.pti", "rb") as f:
-    test_pti_data = f.read()
-
+# The audio of ./test.pti is identical to the audio of ./test.wav (see test_inspectpti.py)
 WAV_HEADER_LENGTH = 44
 
-test_wav_header = test_wav_data[0:WAV_HEADER_LENGTH]
-test_wav_audio = test_wav_data[WAV_HEADER_LENGTH:]
-
 # Find .pti header length
 # PTI_HEADER_LENGTH = test_pti_data.index(test_wav_audio)  # 392
 PTI_HEADER_LENGTH = 392
@@ -39,7 +59,7 @@ def get_header(value: object) -> bytes:
 
 
 @functools.singledispatch
-def get_audio(value: object) -> bytes:
+def get_audio(value: object) -> bytes | memoryview:
     """Return .pti audio."""
     raise NotImplementedError
 
@@ -56,12 +76,6 @@ def _(value: bytes) -> bytes:
     return value[PTI_HEADER_LENGTH:]
 
 
-test_pti_header = get_header(test_pti_data)
-test_pti_audio = get_audio(test_pti_data)
-
-assert test_pti_audio == test_wav_audio
-
-
 ##
 # Get header and audio from open .pti file
 ##
@@ -71,14 +85,20 @@ assert test_pti_audio == test_wav_audio
 def _(value: io.BufferedIOBase) -> bytes:
     """Return header from .pti file."""
     value.seek(0)
-    return value.read(PTI_HEADER_LENGTH)
+    header = value.read(PTI_HEADER_LENGTH)
+    if metrics is not None:
+        metrics.add("get_header_bytes", len(header))
+    return header
 
 
 @get_audio.register(io.BufferedIOBase)
 def _(value: io.BufferedIOBase) -> bytes:
     """Return audio from .pti file."""
     value.seek(PTI_HEADER_LENGTH)
-    return value.read()
+    audio = value.read()
+    if metrics is not None:
+        metrics.add("get_audio_bytes", len(audio))
+    return audio
 
 
 @get_header.register(str)
@@ -95,130 +115,85 @@ def _(value: str) -> bytes:
         return get_audio(f)
 
 
-# Headers of test .pti files
-pti_headers = {
-    "instrument_name": get_header("./test/1 ABCDEFGHIJKLMNOPQRSTUVWXYZabcde.pti"),
-    "volume_max": get_header("./test/2 test.pti"),
-    "volume_null": get_header("./test/3 test.pti"),
-    "volume_min": get_header("./test/4 test.pti"),
-    "panning_min": get_header("./test/5 test.pti"),
-    "panning_max": get_header("./test/6 test.pti"),
-    "tune_min": get_header("./test/7 test.pti"),
-    "tune_max": get_header("./test/8 test.pti"),
-    "tune_neg12": get_header("./test/16 test.pti"),
-    "finetune_min": get_header("./test/9 test.pti"),
-    "finetune_max": get_header("./test/10 test.pti"),
-    "filter_lp": get_header("./test/11 test.pti"),
-    "filter_hp": get_header("./test/12 test.pti"),
-    "filter_bp": get_header("./test/13 test.pti"),
-    "overdrive": get_header("./test/14 test.pti"),
-    "bit_depth": get_header("./test/15 test.pti"),
-    "lp_cutoff": get_header("./test/17 test.pti"),
-    "hp_cutoff_rez": get_header("./test/18 test.pti"),
-    "bp_cutoff_rez": get_header("./test/19 test.pti"),
-    "reverb_max": get_header("./test/20 test.pti"),
-    "reverb_min": get_header("./test/22 test.pti"),
-    "delay_max": get_header("./test/21 test.pti"),
-    "delay_min": get_header("./test/23 test.pti"),
-    "loop_fwd": get_header("./test/24 test.pti"),
-    "loop_bkwd": get_header("./test/25 test.pti"),
-    "loop_pingpong": get_header("./test/26 test.pti"),
-    "play_slice": get_header("./test/27 test.pti"),
-    "play_beat_slice": get_header("./test/28 test.pti"),
-    "play_wavetable": get_header("./test/29 test.pti"),
-    "play_granular": get_header("./test/30 test.pti"),
-    "volume_automation_off": get_header("./test/31 test.pti"),
-    "volume_automation_lfo": get_header("./test/32 test.pti"),
-    "panning_automation_envelope": get_header("./test/33 test.pti"),
-    "panning_automation_lfo": get_header("./test/34 test.pti"),
-    "cutoff_automation_envelope": get_header("./test/35 test.pti"),
-    "cutoff_automation_lfo": get_header("./test/36 test.pti"),
-    "wavetable_automation_envelope": get_header("./test/37 test.pti"),
-    "wavetable_automation_lfo": get_header("./test/38 test.pti"),
-    "granular_pos_automation_envelope": get_header("./test/39 test.pti"),
-    "granular_pos_automation_lfo": get_header("./test/40 test.pti"),
-    "finetune_envelope": get_header("./test/41 test.pti"),
-    "finetune_lfo": get_header("./test/42 test.pti"),
-    "filter_defaults": get_header("./filter-test/1 test.pti"),
-    "lp_100_0": get_header("./filter-test/2 test.pti"),
-    "lp_50_0": get_header("./filter-test/3 test.pti"),
-    "lp_0_0": get_header("./filter-test/4 test.pti"),
-    "lp_100_100": get_header("./filter-test/5 test.pti"),
-    "lp_100_50": get_header("./filter-test/6 test.pti"),
-    "lp_50_50": get_header("./filter-test/7 test.pti"),
-    "lp_0_100": get_header("./filter-test/8 test.pti"),
-    "lp_0_50": get_header("./filter-test/9 test.pti"),
-    "hp_100_0": get_header("./filter-test/10 test.pti"),
-    "hp_50_0": get_header("./filter-test/11 test.pti"),
-    "hp_0_0": get_header("./filter-test/12 test.pti"),
-    "hp_100_100": get_header("./filter-test/13 test.pti"),
-    "hp_100_50": get_header("./filter-test/14 test.pti"),
-    "hp_50_50": get_header("./filter-test/15 test.pti"),
-    "hp_0_100": get_header("./filter-test/16 test.pti"),
-    "hp_0_50": get_header("./filter-test/17 test.pti"),
-    "vol_env_attack_10": get_header("./envelope-test/2 test.pti"),
-    "vol_env_attack_5": get_header("./envelope-test/3 test.pti"),
-    "vol_env_decay_10": get_header("./envelope-test/4 test.pti"),
-    "vol_env_decay_5": get_header("./envelope-test/5 test.pti"),
-    "vol_env_sustain_50": get_header("./envelope-test/6 test.pti"),
-    "vol_env_sustain_0": get_header("./envelope-test/7 test.pti"),
-    "vol_env_release_10": get_header("./envelope-test/8 test.pti"),
-    "vol_env_release_0": get_header("./envelope-test/9 test.pti"),
-    "vol_env_amount_50": get_header("./envelope-test/10 test.pti"),
-    "vol_env_amount_0": get_header("./envelope-test/11 test.pti"),
-    "vol_lfo_rev_saw": get_header("./lfo-test/2 test.pti"),
-    "vol_lfo_saw": get_header("./lfo-test/3 test.pti"),
-    "vol_lfo_square": get_header("./lfo-test/4 test.pti"),
-    "vol_lfo_random": get_header("./lfo-test/5 test.pti"),
-    "vol_lfo_16_steps": get_header("./lfo-test/6 test.pti"),
-    "vol_lfo_6_steps": get_header("./lfo-test/7 test.pti"),
-    "vol_lfo_3_2_steps": get_header("./lfo-test/8 test.pti"),
-    "vol_lfo_1_64_steps": get_header("./lfo-test/9 test.pti"),
-    "vol_lfo_amount_100": get_header("./lfo-test/10 test.pti"),
-    "vol_lfo_amount_0": get_header("./lfo-test/11 test.pti"),
-    "pan_lfo_rev_saw": get_header("./lfo-test/12 test.pti"),
-    "pan_lfo_rev_random": get_header("./lfo-test/13 test.pti"),
-    "pan_lfo_1_48_step": get_header("./lfo-test/14 test.pti"),
-    "pan_lfo_1_128_steps": get_header("./lfo-test/15 test.pti"),
-    "pan_lfo_24_steps": get_header("./lfo-test/16 test.pti"),
-    "pan_lfo_amount_80": get_header("./lfo-test/17 test.pti"),
-    "pan_lfo_amount_66": get_header("./lfo-test/18 test.pti"),
-    "pan_lfo_amount_25": get_header("./lfo-test/19 test.pti"),
-    "pan_lfo_amount_10": get_header("./lfo-test/20 test.pti"),
-    "pan_lfo_amount_100": get_header("./lfo-test/21 test.pti"),
-    "cutoff_lfo_square_96_steps_amount38": get_header("./lfo-test/22 test.pti"),
-    "wavetable_lfo_random_2_steps_amount_8": get_header("./lfo-test/23 test.pti"),
-    "granular_lfo_saw_32_steps_amount_90": get_header("./lfo-test/24 test.pti"),
-    "finetune_lfo_square_3_steps_amount_100": get_header("./lfo-test/25 test.pti"),
-    "1-shot-start-002": get_header("./playback-test/2 test.pti"),
-    "1-shot-start-0025": get_header("./playback-test/3 test.pti"),
-    "1-shot-start-0125": get_header("./playback-test/4 test.pti"),
-    "1-shot-end-02": get_header("./playback-test/5 test.pti"),
-    "1-shot-end-0125": get_header("./playback-test/6 test.pti"),
-    "forward-loop-start-0025-loop-start-005": get_header("./playback-test/8 test.pti"),
-    "forward-loop-end-02-loop-end-018": get_header("./playback-test/9 test.pti"),
-    "backward-loop-start-0033-loop-start-01111-end-0234-loop-end-0197": get_header("./playback-test/10 test.pti"),
-    "pingpong-loop-start-0025-loop-start-0033-end-0250-loop-end-0190": get_header("./playback-test/11 test.pti"),
-    "slice-1-2-adjust-0025-2-2-adjust-008": get_header("./playback-test/12 test.pti"),
-    "48-slices": get_header("./playback-test/24 test.pti"),
-    "wavetable_window_32": get_header("./playback-test/28 test.pti"),
-    "wavetable_window_512": get_header("./playback-test/29 test.pti"),
-    "wavetable_window_1024_position_1": get_header("./playback-test/30 test.pti"),
-    "wavetable_window_32_position_343": get_header("./playback-test/31 test.pti"),
-    "wavetable_window_1024_position_9": get_header("./playback-test/32 test.pti"),
-    "granular_loop_backward": get_header("./playback-test/33 test.pti"),
-    "granular_loop_pingpong": get_header("./playback-test/34 test.pti"),
-    "granular_shape_triangle": get_header("./playback-test/35 test.pti"),
-    "granular_shape_gauss": get_header("./playback-test/36 test.pti"),
-    "granular_lenght_1_min": get_header("./playback-test/37 test.pti"),
-    "granular_lenght_250_max": get_header("./playback-test/38 test.pti"),
-    "granular_position_250_max_lenght_20": get_header("./playback-test/39 test.pti"),
-    "10ms": get_header("./sample-test/1 test-10ms.pti"),
-    "250ms": get_header("./sample-test/2 test-250ms.pti"),
-    "1000ms": get_header("./sample-test/3 test-1000ms.pti"),
-    "5000ms": get_header("./sample-test/4 test-5000ms.pti"),
-    "10000ms": get_header("./sample-test/5 test-10000ms.pti"),
-}
+##
+# Zero-copy access to .pti audio
+##
+
+
+def map_pti(path: str | os.PathLike[str]) -> mmap.mmap:
+    """Return a read-only memory map of a .pti file."""
+    with open(path, "rb") as f:
+        # mmap cannot map an empty file
+        assert os.fstat(f.fileno()).st_size > 0, f"Empty file: {os.fspath(path)}"
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@get_header.register(bytearray)
+@get_header.register(mmap.mmap)
+def _(value: bytearray | mmap.mmap) -> bytes:
+    """Return header from a .pti buffer."""
+    return bytes(value[0:PTI_HEADER_LENGTH])
+
+
+@get_header.register(memoryview)
+def _(value: memoryview) -> bytes:
+    """Return header from a .pti memoryview."""
+    return value[0:PTI_HEADER_LENGTH].tobytes()
+
+
+@get_audio.register(bytearray)
+@get_audio.register(mmap.mmap)
+def _(value: bytearray | mmap.mmap) -> memoryview:
+    """Return audio from a .pti buffer, without copying."""
+    return memoryview(value)[PTI_HEADER_LENGTH:]
+
+
+@get_audio.register(memoryview)
+def _(value: memoryview) -> memoryview:
+    """Return audio from a .pti memoryview, without copying."""
+    return value[PTI_HEADER_LENGTH:]
+
+
+@get_header.register(os.PathLike)
+def _(value: os.PathLike[str]) -> bytes:
+    """Return header from path to .pti file."""
+    return get_header(os.fspath(value))
+
+
+@get_audio.register(os.PathLike)
+def _(value: os.PathLike[str]) -> memoryview:
+    """Return audio from path to .pti file, backed by a memory map of the file."""
+    audio = get_audio(map_pti(value))
+    if metrics is not None:
+        metrics.add("get_audio_bytes", audio.nbytes)
+    return audio
+
+
+# 16-bit signed little-endian PCM samples
+AUDIO_DTYPE = "<i2"
+
+
+def get_audio_array(value: object) -> numpy.ndarray | array.array[int]:
+    """
+    Return .pti audio as 16-bit signed integer samples.
+
+    Returns a read-only NumPy view of the audio (no copy) if NumPy is installed,
+    otherwise an array.array('h') copy of the audio.
+    """
+    if isinstance(value, str):
+        value = pathlib.Path(value)  # Memory map instead of reading the file
+    return _audio_array(get_audio(value))
+
+
+def _audio_array(audio: bytes | memoryview) -> numpy.ndarray | array.array[int]:
+    """Return audio as 16-bit signed integer samples, see get_audio_array."""
+    if (numpy := _import_numpy()) is not None:
+        return numpy.frombuffer(audio, dtype=AUDIO_DTYPE)
+    samples = array.array("h")
+    samples.frombytes(audio)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
 
 
 @enum.unique
@@ -481,28 +456,21 @@ class HeaderStruct(struct.Struct, enum.Enum):
 
 def _cmp_head(
     *headers: str,
-    default_header: bytes = test_pti_header,
-    header_map: dict[str, bytes] = pti_headers,
+    default_header: bytes | None = None,
+    header_map: Mapping[str, bytes] | None = None,
 ) -> None:
-    """Compare .pti file header(s) to the default header and show which bytes are different."""
-    for i, v in enumerate(default_header):
-        if 21 <= i <= 51:
-            continue  # Instrument name
-
-        ivs = {header: header_map[header][i] for header in headers}
-        if any(iv != v for iv in ivs.values()):
-            if i in list(HeaderOffset):
-                print(HeaderOffset(i))
-                print("-" * 80)
-
-            dbg = {
-                k: {
-                    "int": v,
-                    "bytes": repr(bytes([v])),
-                }
-                for k, v in ivs.items()
-            }
-            print(f"\n{i=}, default: int: {v} bytes: {bytes([v])!r}" f"{json.dumps(dbg, indent=2)}")
+    """Compare .pti file header(s) to the default header and show which fields are different."""
+    # The test .pti files are only loaded when needed
+    import ptifixtures
+
+    if default_header is None:
+        default_header = ptifixtures.default_header()
+    if header_map is None:
+        header_map = ptifixtures.pti_headers
+    diff = diff_headers(
+        {header: header_map[header] for header in headers}, default_header, ignore=["NAME", "CHECKSUM"]
+    )
+    print(json.dumps(diff, indent=2))
 
 
 ##
@@ -612,6 +580,8 @@ def _cmp_head(
 
 def is_pti(header: bytes) -> bool:
     """Return True if a byte string has the characteristics of a .pti file header."""
+    if metrics is not None:
+        metrics.add("is_pti_calls")
     is_pti = False
     if len(header) == 392 and header[0:2] == b"TI":
         known_0 = [
@@ -700,9 +670,33 @@ def is_pti(header: bytes) -> bool:
 #         is_pti(header)
 
 
+class ValidatedHeader(bytes):
+    """
+    A .pti file header that only needs to be validated once.
+
+    By default (strict mode) the header is checked with is_pti when it is created,
+    pass trusted=True to skip validation for headers that are known to be valid.
+    Getters do not re-validate a ValidatedHeader.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, header: bytes, *, trusted: bool = False) -> ValidatedHeader:
+        self = super().__new__(cls, header)
+        if not trusted:
+            assert is_pti(self), "Not a .pti header"
+        return self
+
+
+def _check_header(header: bytes) -> None:
+    """Assert that header is a .pti header, unless it has already been validated."""
+    if not isinstance(header, ValidatedHeader):
+        assert is_pti(header), "Not a .pti header"
+
+
 def _unpack(header: bytes, field: str) -> bytes | int | float | bool:
     """Unpack a value from a .pti file header."""
-    assert is_pti(header), "Not a .pti header"
+    _check_header(header)
     assert isinstance(
         value := HeaderStruct[field].unpack_from(header, HeaderOffset[field])[0],
         (bytes, int, float),
@@ -710,11 +704,6 @@ def _unpack(header: bytes, field: str) -> bytes | int | float | bool:
     return value
 
 
-def _test(func: Callable[[bytes], Any], header: bytes, expected: Any) -> None:
-    """Assert that calling func with the given header returns the expected value."""
-    assert (value := func(header)) == expected, f"{func=} => {value=} ({expected=})"
-
-
 ##
 # Instrument name
 ##
@@ -726,10 +715,6 @@ def get_name(header: bytes) -> str:
     return value.rstrip(b"\x00").decode("ascii")
 
 
-_test(get_name, test_pti_header, "test")
-_test(get_name, pti_headers["instrument_name"], "ABCDEFGHIJKLMNOPQRSTUVWXYZabcde")
-
-
 ##
 # Sample length
 ##
@@ -742,14 +727,6 @@ def get_sample_length(header: bytes) -> int:
     return value
 
 
-_test(get_sample_length, test_pti_header, 0)
-_test(get_sample_length, pti_headers["10ms"], 10 * 44.1)
-_test(get_sample_length, pti_headers["250ms"], 250 * 44.1)
-_test(get_sample_length, pti_headers["1000ms"], 1000 * 44.1)
-_test(get_sample_length, pti_headers["5000ms"], 5000 * 44.1)
-_test(get_sample_length, pti_headers["10000ms"], 10000 * 44.1)
-
-
 ##
 # Instrument parameters
 ##
@@ -762,12 +739,6 @@ def get_volume(header: bytes) -> int:
     return value
 
 
-_test(get_volume, test_pti_header, 50)
-_test(get_volume, pti_headers["volume_null"], 0)
-_test(get_volume, pti_headers["volume_min"], 1)
-_test(get_volume, pti_headers["volume_max"], 100)
-
-
 def get_panning(header: bytes) -> int:
     """Return panning value (0-100)."""
     assert isinstance(value := _unpack(header, "PANNING"), int), type(value)
@@ -775,11 +746,6 @@ def get_panning(header: bytes) -> int:
     return value
 
 
-_test(get_panning, test_pti_header, 50)
-_test(get_panning, pti_headers["panning_min"], 0)
-_test(get_panning, pti_headers["panning_max"], 100)
-
-
 def get_tune(header: bytes) -> int:
     """Return tune value (-/+24)."""
     assert isinstance(value := _unpack(header, "TUNE"), int), type(value)
@@ -787,12 +753,6 @@ def get_tune(header: bytes) -> int:
     return value
 
 
-_test(get_tune, test_pti_header, 0)
-_test(get_tune, pti_headers["tune_min"], -24)
-_test(get_tune, pti_headers["tune_max"], 24)
-_test(get_tune, pti_headers["tune_neg12"], -12)
-
-
 def get_finetune(header: bytes) -> int:
     """Return finetune value (-/+100)."""
     assert isinstance(value := _unpack(header, "FINETUNE"), int), type(value)
@@ -800,11 +760,6 @@ def get_finetune(header: bytes) -> int:
     return value
 
 
-_test(get_finetune, test_pti_header, 0)
-_test(get_finetune, pti_headers["finetune_min"], -100)
-_test(get_finetune, pti_headers["finetune_max"], 100)
-
-
 ##
 # Filter parameters
 ##
@@ -817,17 +772,6 @@ def get_filter_cutoff(header: bytes) -> float:
     return value
 
 
-_test(get_filter_cutoff, test_pti_header, 1.0)
-_test(get_filter_cutoff, pti_headers["lp_100_0"], 1.0)
-_test(get_filter_cutoff, pti_headers["hp_100_0"], 1.0)
-_test(get_filter_cutoff, pti_headers["lp_50_0"], 0.5000002384185791)
-_test(get_filter_cutoff, pti_headers["hp_50_0"], 0.5000002384185791)
-_test(get_filter_cutoff, pti_headers["lp_0_0"], 0.0)
-_test(get_filter_cutoff, pti_headers["hp_0_0"], 0.0)
-_test(get_filter_cutoff, pti_headers["lp_100_100"], 1.0)
-_test(get_filter_cutoff, pti_headers["hp_100_100"], 1.0)
-
-
 def get_filter_resonance(header: bytes) -> float:
     """Return filter resonance value (0.0-+4.300000190734863)."""
     assert isinstance(value := _unpack(header, "FILTER_RESONANCE"), float), type(value)
@@ -836,17 +780,6 @@ def get_filter_resonance(header: bytes) -> float:
     return value
 
 
-_test(get_filter_resonance, test_pti_header, 0.0)
-_test(get_filter_resonance, pti_headers["lp_100_100"], 4.300000190734863)
-_test(get_filter_resonance, pti_headers["hp_100_100"], 4.300000190734863)
-_test(get_filter_resonance, pti_headers["lp_100_50"], 2.150000810623169)
-_test(get_filter_resonance, pti_headers["hp_100_50"], 2.1929996013641357)
-_test(get_filter_resonance, pti_headers["lp_100_0"], 0.0)
-_test(get_filter_resonance, pti_headers["hp_100_0"], 0.0)
-_test(get_filter_resonance, pti_headers["lp_0_50"], 2.1929996013641357)
-_test(get_filter_resonance, pti_headers["hp_0_50"], 2.192999839782715)
-
-
 @enum.unique
 class FilterType(bytes, enum.Enum):
     """Filter type."""
@@ -864,36 +797,6 @@ def get_filter_type(header: bytes) -> FilterType:
     return FilterType(value)
 
 
-_test(get_filter_type, test_pti_header, FilterType.DISABLED)
-
-for key in [
-    "filter_lp",
-    "lp_100_0",
-    "lp_50_0",
-    "lp_0_0",
-    "lp_100_100",
-    "lp_100_50",
-    "lp_50_50",
-    "lp_0_100",
-    "lp_0_50",
-]:
-    _test(get_filter_type, pti_headers[key], FilterType.LOW_PASS)
-
-for key in [
-    "filter_hp",
-    "hp_100_0",
-    "hp_50_0",
-    "hp_0_0",
-    "hp_100_100",
-    "hp_100_50",
-    "hp_50_50",
-    "hp_0_100",
-    "hp_0_50",
-]:
-    _test(get_filter_type, pti_headers[key], FilterType.HIGH_PASS)
-
-_test(get_filter_type, pti_headers["filter_bp"], FilterType.BAND_PASS)
-
 ##
 # Effects
 ##
@@ -906,10 +809,6 @@ def get_overdrive(header: bytes) -> int:
     return value
 
 
-_test(get_overdrive, test_pti_header, 0)
-_test(get_overdrive, pti_headers["overdrive"], 100)
-
-
 def get_bit_depth(header: bytes) -> int:
     """Return bit depth value (4-16)."""
     assert isinstance(value := _unpack(header, "BIT_DEPTH"), int), type(value)
@@ -917,10 +816,6 @@ def get_bit_depth(header: bytes) -> int:
     return value
 
 
-_test(get_bit_depth, test_pti_header, 16)
-_test(get_bit_depth, pti_headers["bit_depth"], 4)
-
-
 def get_delay_send(header: bytes) -> int:
     """Return delay send value (0-100)."""
     assert isinstance(value := _unpack(header, "DELAY_SEND"), int), type(value)
@@ -928,11 +823,6 @@ def get_delay_send(header: bytes) -> int:
     return value
 
 
-_test(get_delay_send, test_pti_header, 0)
-_test(get_delay_send, pti_headers["delay_min"], 1)
-_test(get_delay_send, pti_headers["delay_max"], 100)
-
-
 def get_reverb_send(header: bytes) -> int:
     """Return reverb send value (0-100)."""
     assert isinstance(value := _unpack(header, "REVERB_SEND"), int), type(value)
@@ -940,11 +830,6 @@ def get_reverb_send(header: bytes) -> int:
     return value
 
 
-_test(get_reverb_send, test_pti_header, 0)
-_test(get_reverb_send, pti_headers["reverb_min"], 1)
-_test(get_reverb_send, pti_headers["reverb_max"], 100)
-
-
 ##
 # Sample playback
 ##
@@ -970,16 +855,6 @@ def get_sample_playback(header: bytes) -> SamplePlayback:
     return SamplePlayback(value)
 
 
-_test(get_sample_playback, test_pti_header, SamplePlayback.ONE_SHOT)
-_test(get_sample_playback, pti_headers["loop_fwd"], SamplePlayback.FORWARD_LOOP)
-_test(get_sample_playback, pti_headers["loop_bkwd"], SamplePlayback.BACKWARD_LOOP)
-_test(get_sample_playback, pti_headers["loop_pingpong"], SamplePlayback.PINGPONG_LOOP)
-_test(get_sample_playback, pti_headers["play_slice"], SamplePlayback.SLICE)
-_test(get_sample_playback, pti_headers["play_beat_slice"], SamplePlayback.BEAT_SLICE)
-_test(get_sample_playback, pti_headers["play_wavetable"], SamplePlayback.WAVETABLE)
-_test(get_sample_playback, pti_headers["play_granular"], SamplePlayback.GRANULAR)
-
-
 ##
 # Instrument automation
 ##
@@ -1012,110 +887,36 @@ def get_volume_automation(header: bytes) -> InstrumentAutomation:
     return InstrumentAutomation(value)
 
 
-_test(get_volume_automation, test_pti_header, InstrumentAutomation.ENVELOPE)
-_test(
-    get_volume_automation,
-    pti_headers["volume_automation_off"],
-    InstrumentAutomation.OFF,
-)
-_test(
-    get_volume_automation,
-    pti_headers["volume_automation_lfo"],
-    InstrumentAutomation.LFO,
-)
-
-
 def get_panning_automation(header: bytes) -> InstrumentAutomation:
     """Return panning automation mode."""
     assert isinstance(value := _unpack(header, "PANNING_AUTOMATION"), bytes), type(value)
     return InstrumentAutomation(value)
 
 
-_test(get_panning_automation, test_pti_header, InstrumentAutomation.OFF)
-_test(
-    get_panning_automation,
-    pti_headers["panning_automation_envelope"],
-    InstrumentAutomation.ENVELOPE,
-)
-_test(
-    get_panning_automation,
-    pti_headers["panning_automation_lfo"],
-    InstrumentAutomation.LFO,
-)
-
-
 def get_cutoff_automation(header: bytes) -> InstrumentAutomation:
     """Return cutoff automation mode."""
     assert isinstance(value := _unpack(header, "CUTOFF_AUTOMATION"), bytes), type(value)
     return InstrumentAutomation(value)
 
 
-_test(get_cutoff_automation, test_pti_header, InstrumentAutomation.OFF)
-_test(
-    get_cutoff_automation,
-    pti_headers["cutoff_automation_envelope"],
-    InstrumentAutomation.ENVELOPE,
-)
-_test(
-    get_cutoff_automation,
-    pti_headers["cutoff_automation_lfo"],
-    InstrumentAutomation.LFO,
-)
-
-
 def get_wavetable_position_automation(header: bytes) -> InstrumentAutomation:
     """Return wabetable position automation mode."""
     assert isinstance(value := _unpack(header, "WAVETABLE_POSITION_AUTOMATION"), bytes), type(value)
     return InstrumentAutomation(value)
 
 
-_test(get_wavetable_position_automation, test_pti_header, InstrumentAutomation.OFF)
-_test(
-    get_wavetable_position_automation,
-    pti_headers["wavetable_automation_envelope"],
-    InstrumentAutomation.ENVELOPE,
-)
-_test(
-    get_wavetable_position_automation,
-    pti_headers["wavetable_automation_lfo"],
-    InstrumentAutomation.LFO,
-)
-
-
 def get_granular_position_automation(header: bytes) -> InstrumentAutomation:
     """Return granular position automation mode."""
     assert isinstance(value := _unpack(header, "GRANULAR_POSITION_AUTOMATION"), bytes), type(value)
     return InstrumentAutomation(value)
 
 
-_test(get_granular_position_automation, test_pti_header, InstrumentAutomation.OFF)
-_test(
-    get_granular_position_automation,
-    pti_headers["granular_pos_automation_envelope"],
-    InstrumentAutomation.ENVELOPE,
-)
-_test(
-    get_granular_position_automation,
-    pti_headers["granular_pos_automation_lfo"],
-    InstrumentAutomation.LFO,
-)
-
-
 def get_finetune_automation(header: bytes) -> InstrumentAutomation:
     """Return finetune automation mode."""
     assert isinstance(value := _unpack(header, "FINETUNE_AUTOMATION"), bytes), type(value)
     return InstrumentAutomation(value)
 
 
-_test(get_finetune_automation, test_pti_header, InstrumentAutomation.OFF)
-_test(
-    get_finetune_automation,
-    pti_headers["finetune_envelope"],
-    InstrumentAutomation.ENVELOPE,
-)
-_test(get_finetune_automation, pti_headers["finetune_lfo"], InstrumentAutomation.LFO)
-
-
 ##
 # Volume envelope
 ##
@@ -1128,11 +929,6 @@ def get_volume_envelope_amount(header: bytes) -> float:
     return value
 
 
-_test(get_volume_envelope_amount, test_pti_header, 1.0)
-_test(get_volume_envelope_amount, pti_headers["vol_env_amount_50"], 0.5000003576278687)
-_test(get_volume_envelope_amount, pti_headers["vol_env_amount_0"], 0.0)
-
-
 def get_volume_envelope_attack(header: bytes) -> int:
     """Return volume automation attack amount (0-1000)."""
     assert isinstance(value := _unpack(header, "VOLUME_ENVELOPE_ATTACK"), int), type(value)
@@ -1140,11 +936,6 @@ def get_volume_envelope_attack(header: bytes) -> int:
     return value
 
 
-_test(get_volume_envelope_attack, test_pti_header, 0)
-_test(get_volume_envelope_attack, pti_headers["vol_env_attack_10"], 10000)
-_test(get_volume_envelope_attack, pti_headers["vol_env_attack_5"], 5000)
-
-
 def get_volume_envelope_decay(header: bytes) -> int:
     """Return volume automation decay amount (0-1000)."""
     assert isinstance(value := _unpack(header, "VOLUME_ENVELOPE_DECAY"), int), type(value)
@@ -1152,11 +943,6 @@ def get_volume_envelope_decay(header: bytes) -> int:
     return value
 
 
-_test(get_volume_envelope_decay, test_pti_header, 0)
-_test(get_volume_envelope_decay, pti_headers["vol_env_decay_10"], 10000)
-_test(get_volume_envelope_decay, pti_headers["vol_env_decay_5"], 5000)
-
-
 def get_volume_envelope_sustain(header: bytes) -> float:
     """Return volume sustain attack amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "VOLUME_ENVELOPE_SUSTAIN"), float), type(value)
@@ -1164,11 +950,6 @@ def get_volume_envelope_sustain(header: bytes) -> float:
     return value
 
 
-_test(get_volume_envelope_sustain, test_pti_header, 1.0)
-_test(get_volume_envelope_sustain, pti_headers["vol_env_sustain_50"], 0.5000001788139343)
-_test(get_volume_envelope_sustain, pti_headers["vol_env_sustain_0"], 0)
-
-
 def get_volume_envelope_release(header: bytes) -> int:
     """Return volume automation release amount (0-1000)."""
     assert isinstance(value := _unpack(header, "VOLUME_ENVELOPE_RELEASE"), int), type(value)
@@ -1176,11 +957,6 @@ def get_volume_envelope_release(header: bytes) -> int:
     return value
 
 
-_test(get_volume_envelope_release, test_pti_header, 1000)
-_test(get_volume_envelope_release, pti_headers["vol_env_release_10"], 10000)
-_test(get_volume_envelope_release, pti_headers["vol_env_release_0"], 0)
-
-
 # TODO: Panning/Cutoff/Wavetable/Granular/Finetune envelope
 
 
@@ -1225,26 +1001,12 @@ def get_volume_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_volume_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(get_volume_lfo_type, pti_headers["vol_lfo_rev_saw"], AutomationLfoType.REV_SAW)
-_test(get_volume_lfo_type, pti_headers["vol_lfo_saw"], AutomationLfoType.SAW)
-_test(get_volume_lfo_type, pti_headers["vol_lfo_square"], AutomationLfoType.SQUARE)
-_test(get_volume_lfo_type, pti_headers["vol_lfo_random"], AutomationLfoType.RANDOM)
-
-
 def get_volume_lfo_steps(header: bytes) -> VolumeLfoSteps:
     """Return volume automation LFO steps."""
     assert isinstance(value := _unpack(header, "VOLUME_LFO_STEPS"), int), type(value)
     return VolumeLfoSteps(value)
 
 
-_test(get_volume_lfo_steps, test_pti_header, VolumeLfoSteps.S_24)
-_test(get_volume_lfo_steps, pti_headers["vol_lfo_16_steps"], VolumeLfoSteps.S_16)
-_test(get_volume_lfo_steps, pti_headers["vol_lfo_6_steps"], VolumeLfoSteps.S_6)
-_test(get_volume_lfo_steps, pti_headers["vol_lfo_3_2_steps"], VolumeLfoSteps.S_3_2)
-_test(get_volume_lfo_steps, pti_headers["vol_lfo_1_64_steps"], VolumeLfoSteps.S_1_64)
-
-
 def get_volume_lfo_amount(header: bytes) -> float:
     """Return volume automation LFO amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "VOLUME_LFO_AMOUNT"), float), type(value)
@@ -1252,11 +1014,6 @@ def get_volume_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_volume_lfo_amount, test_pti_header, 0.5)
-_test(get_volume_lfo_amount, pti_headers["vol_lfo_amount_0"], 0.0)
-_test(get_volume_lfo_amount, pti_headers["vol_lfo_amount_100"], 1.0)
-
-
 ##
 # Panning LFO
 ##
@@ -1303,23 +1060,12 @@ def get_panning_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_panning_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(get_panning_lfo_type, pti_headers["pan_lfo_rev_saw"], AutomationLfoType.REV_SAW)
-_test(get_panning_lfo_type, pti_headers["pan_lfo_rev_random"], AutomationLfoType.RANDOM)
-
-
 def get_panning_lfo_steps(header: bytes) -> AutomationLfoSteps:
     """Return panning automation LFO steps."""
     assert isinstance(value := _unpack(header, "PANNING_LFO_STEPS"), int), type(value)
     return AutomationLfoSteps(value)
 
 
-_test(get_panning_lfo_steps, test_pti_header, AutomationLfoSteps.S_128)
-_test(get_panning_lfo_steps, pti_headers["pan_lfo_1_48_step"], AutomationLfoSteps.S_1_48)
-_test(get_panning_lfo_steps, pti_headers["pan_lfo_1_128_steps"], AutomationLfoSteps.S_128)
-_test(get_panning_lfo_steps, pti_headers["pan_lfo_24_steps"], AutomationLfoSteps.S_24)
-
-
 def get_panning_lfo_amount(header: bytes) -> float:
     """Return panning automation LFO amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "PANNING_LFO_AMOUNT"), float), type(value)
@@ -1327,13 +1073,6 @@ def get_panning_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_panning_lfo_amount, test_pti_header, 0.5)
-_test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_80"], 0.7999998331069946)
-_test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_66"], 0.6599998474121094)
-_test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_25"], 0.25000011920928955)
-_test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_10"], 0.10000001639127731)
-
-
 ##
 # Cutoff LFO
 ##
@@ -1345,28 +1084,12 @@ def get_cutoff_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_cutoff_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(
-    get_cutoff_lfo_type,
-    pti_headers["cutoff_lfo_square_96_steps_amount38"],
-    AutomationLfoType.SQUARE,
-)
-
-
 def get_cutoff_lfo_steps(header: bytes) -> AutomationLfoSteps:
     """Return cutoff automation LFO steps."""
     assert isinstance(value := _unpack(header, "CUTOFF_LFO_STEPS"), int), type(value)
     return AutomationLfoSteps(value)
 
 
-_test(get_cutoff_lfo_steps, test_pti_header, AutomationLfoSteps.S_128)
-_test(
-    get_cutoff_lfo_steps,
-    pti_headers["cutoff_lfo_square_96_steps_amount38"],
-    AutomationLfoSteps.S_96,
-)
-
-
 def get_cutoff_lfo_amount(header: bytes) -> float:
     """Return cutoff automation LFO amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "CUTOFF_LFO_AMOUNT"), float), type(value)
@@ -1374,14 +1097,6 @@ def get_cutoff_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_cutoff_lfo_amount, test_pti_header, 0.5)
-_test(
-    get_cutoff_lfo_amount,
-    pti_headers["cutoff_lfo_square_96_steps_amount38"],
-    0.3800000250339508,
-)
-
-
 ##
 # Wavetable position LFO
 ##
@@ -1393,28 +1108,12 @@ def get_wavetable_position_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_wavetable_position_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(
-    get_wavetable_position_lfo_type,
-    pti_headers["wavetable_lfo_random_2_steps_amount_8"],
-    AutomationLfoType.RANDOM,
-)
-
-
 def get_wavetable_position_lfo_steps(header: bytes) -> AutomationLfoSteps:
     """Return wavetable position lfo steps."""
     assert isinstance(value := _unpack(header, "WAVETABLE_POSITION_LFO_STEPS"), int), type(value)
     return AutomationLfoSteps(value)
 
 
-_test(get_wavetable_position_lfo_steps, test_pti_header, AutomationLfoSteps.S_128)
-_test(
-    get_wavetable_position_lfo_steps,
-    pti_headers["wavetable_lfo_random_2_steps_amount_8"],
-    AutomationLfoSteps.S_2,
-)
-
-
 def get_wavetable_position_lfo_amount(header: bytes) -> float:
     """Return wavetable position lfo amount."""
     assert isinstance(value := _unpack(header, "WAVETABLE_POSITION_LFO_AMOUNT"), float), type(value)
@@ -1422,14 +1121,6 @@ def get_wavetable_position_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_wavetable_position_lfo_amount, test_pti_header, 0.5)
-_test(
-    get_wavetable_position_lfo_amount,
-    pti_headers["wavetable_lfo_random_2_steps_amount_8"],
-    0.08000002056360245,
-)
-
-
 ##
 # Granular position LFO
 ##
@@ -1441,28 +1132,12 @@ def get_granular_position_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_granular_position_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(
-    get_granular_position_lfo_type,
-    pti_headers["granular_lfo_saw_32_steps_amount_90"],
-    AutomationLfoType.SAW,
-)
-
-
 def get_granular_position_lfo_steps(header: bytes) -> AutomationLfoSteps:
     """Return granular position LFO steps."""
     assert isinstance(value := _unpack(header, "GRANULAR_POSITION_LFO_STEPS"), int), type(value)
     return AutomationLfoSteps(value)
 
 
-_test(get_granular_position_lfo_steps, test_pti_header, AutomationLfoSteps.S_128)
-_test(
-    get_granular_position_lfo_steps,
-    pti_headers["granular_lfo_saw_32_steps_amount_90"],
-    AutomationLfoSteps.S_32,
-)
-
-
 def get_granular_position_lfo_amount(header: bytes) -> float:
     """Return granular position LFO amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "GRANULAR_POSITION_LFO_AMOUNT"), float), type(value)
@@ -1470,14 +1145,6 @@ def get_granular_position_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_granular_position_lfo_amount, test_pti_header, 0.5)
-_test(
-    get_granular_position_lfo_amount,
-    pti_headers["granular_lfo_saw_32_steps_amount_90"],
-    0.8999996185302734,
-)
-
-
 ##
 # Finetune LFO
 ##
@@ -1489,28 +1156,12 @@ def get_finetune_lfo_type(header: bytes) -> AutomationLfoType:
     return AutomationLfoType(value)
 
 
-_test(get_finetune_lfo_type, test_pti_header, AutomationLfoType.TRIANGLE)
-_test(
-    get_finetune_lfo_type,
-    pti_headers["finetune_lfo_square_3_steps_amount_100"],
-    AutomationLfoType.SQUARE,
-)
-
-
 def get_finetune_lfo_steps(header: bytes) -> AutomationLfoSteps:
     """Return finetune LFO steps."""
     assert isinstance(value := _unpack(header, "FINETUNE_LFO_STEPS"), int), type(value)
     return AutomationLfoSteps(value)
 
 
-_test(get_finetune_lfo_steps, test_pti_header, AutomationLfoSteps.S_128)
-_test(
-    get_finetune_lfo_steps,
-    pti_headers["finetune_lfo_square_3_steps_amount_100"],
-    AutomationLfoSteps.S_3,
-)
-
-
 def get_finetune_lfo_amount(header: bytes) -> float:
     """Return finetune LFO amount (0.0-1.0)."""
     assert isinstance(value := _unpack(header, "FINETUNE_LFO_AMOUNT"), float), type(value)
@@ -1518,10 +1169,6 @@ def get_finetune_lfo_amount(header: bytes) -> float:
     return value
 
 
-_test(get_finetune_lfo_amount, test_pti_header, 0.5)
-_test(get_finetune_lfo_amount, pti_headers["finetune_lfo_square_3_steps_amount_100"], 1.0)
-
-
 ##
 # Playback/Loop parameters
 ##
@@ -1534,9 +1181,6 @@ def get_playback_start(header: bytes) -> int:
     return value
 
 
-_test(get_playback_start, test_pti_header, 0)
-
-
 def get_loop_start(header: bytes) -> int:
     """Return loop start position."""
     assert isinstance(value := _unpack(header, "LOOP_START"), int), type(value)
@@ -1544,9 +1188,6 @@ def get_loop_start(header: bytes) -> int:
     return value
 
 
-_test(get_loop_start, test_pti_header, 1)
-
-
 def get_loop_end(header: bytes) -> int:
     """Return loop end position."""
     assert isinstance(value := _unpack(header, "LOOP_END"), int), type(value)
@@ -1554,9 +1195,6 @@ def get_loop_end(header: bytes) -> int:
     return value
 
 
-_test(get_loop_end, test_pti_header, 65534)
-
-
 def get_playback_end(header: bytes) -> int:
     """Return playback end position."""
     assert isinstance(value := _unpack(header, "PLAYBACK_END"), int), type(value)
@@ -1564,9 +1202,6 @@ def get_playback_end(header: bytes) -> int:
     return value
 
 
-_test(get_playback_end, test_pti_header, 65535)
-
-
 ##
 # Slices
 ##
@@ -1592,18 +1227,6 @@ def get_slice_adjust(header: bytes, *, nslice: int) -> int:
     return value
 
 
-for n in range(1, 49):
-    _test(functools.partial(get_slice_adjust, nslice=n), test_pti_header, 0)
-
-
-for n in range(1, 49):
-    _test(
-        functools.partial(get_slice_adjust, nslice=n),
-        pti_headers["48-slices"],
-        int(65535 / 48 * (n - 1)),
-    )
-
-
 def get_num_slices(header: bytes) -> int:
     """Return the number of active slices."""
     assert isinstance(value := _unpack(header, "NUM_SLICES"), int), type(value)
@@ -1611,9 +1234,51 @@ def get_num_slices(header: bytes) -> int:
     return value
 
 
-_test(get_num_slices, test_pti_header, 0)
-_test(get_num_slices, pti_headers["slice-1-2-adjust-0025-2-2-adjust-008"], 2)
-_test(get_num_slices, pti_headers["48-slices"], 48)
+# The start positions of all 48 slices
+SLICE_TABLE = struct.Struct("<48H")
+
+
+def get_slices(header: bytes) -> tuple[int, ...]:
+    """Return the start positions (0-65535) of the active slices, read in a single unpack."""
+    num_slices = get_num_slices(header)
+    slices = SLICE_TABLE.unpack_from(header, HeaderOffset.SLICE_N)[:num_slices]
+    assert all(a <= b for a, b in zip(slices, slices[1:])), f"{slices=}"
+    return slices
+
+
+def position_to_frame(position: int, frames: int) -> int:
+    """Return the frame at a (playback/loop/slice) position (0-65535) in a sample of frames frames."""
+    assert 0 <= position <= 65535, f"{position=}"
+    return position * frames // 65535
+
+
+def slice_bounds(header: bytes, frames: int) -> list[tuple[int, int]]:
+    """Return the (start, stop) frames of every active slice in a sample of frames frames."""
+    # A slice plays until the next slice starts, the last slice until the end of the sample
+    starts = [position_to_frame(position, frames) for position in get_slices(header)]
+    return list(zip(starts, starts[1:] + [frames]))
+
+
+def slice_audio(value: object) -> list[memoryview]:
+    """Return the audio of every active slice of a .pti file, as views of the audio (no copy)."""
+    if isinstance(value, str):
+        value = pathlib.Path(value)  # Memory map instead of reading the file
+    header = get_header(value)
+    audio = memoryview(get_audio(value))
+    _check_frames(header, audio.nbytes)
+    return [
+        audio[start * FRAME_SIZE:stop * FRAME_SIZE] for start, stop in slice_bounds(header, audio.nbytes // FRAME_SIZE)
+    ]
+
+
+def slice_arrays(value: object) -> list[numpy.ndarray] | list[array.array[int]]:
+    """
+    Return the samples of every active slice of a .pti file.
+
+    Returns read-only NumPy views of the audio (no copy) if NumPy is installed,
+    otherwise array.array('h') copies (see get_audio_array).
+    """
+    return [_audio_array(audio) for audio in slice_audio(value)]
 
 
 ##
@@ -1630,32 +1295,13 @@ def is_wavetable(header: bytes) -> bool:
     return value
 
 
-_test(is_wavetable, test_pti_header, False)
-_test(is_wavetable, pti_headers["wavetable_window_1024_position_1"], True)
-_test(is_wavetable, pti_headers["wavetable_window_32_position_343"], True)
-_test(is_wavetable, pti_headers["wavetable_window_1024_position_9"], True)
-_test(is_wavetable, pti_headers["loop_fwd"], False)
-_test(is_wavetable, pti_headers["loop_bkwd"], False)
-_test(is_wavetable, pti_headers["loop_pingpong"], False)
-_test(is_wavetable, pti_headers["play_slice"], False)
-_test(is_wavetable, pti_headers["play_beat_slice"], False)
-_test(is_wavetable, pti_headers["play_wavetable"], True)
-_test(is_wavetable, pti_headers["play_granular"], False)
-
-
 def get_wavetable_window_size(header: bytes) -> int:
-    """Return wavetable window size (32, 64, 128, 256, 1024, 2048)."""
+    """Return wavetable window size (32, 64, 128, 256, 512, 1024, 2048)."""
     assert isinstance(value := _unpack(header, "WAVETABLE_WINDOW_SIZE"), int), type(value)
-    assert value in {32, 64, 128, 256, 1024, 2048}, f"{value=}"
+    assert value in {32, 64, 128, 256, 512, 1024, 2048}, f"{value=}"
     return value
 
 
-_test(get_wavetable_window_size, test_pti_header, 2048)
-_test(get_wavetable_window_size, pti_headers["wavetable_window_1024_position_1"], 1024)
-_test(get_wavetable_window_size, pti_headers["wavetable_window_32_position_343"], 32)
-_test(get_wavetable_window_size, pti_headers["wavetable_window_1024_position_9"], 1024)
-
-
 def get_wavetable_total_positions(header: bytes) -> int:
     """Return total number of wavetable positions."""
     assert isinstance(value := _unpack(header, "WAVETABLE_TOTAL_POSITIONS"), int), type(value)
@@ -1663,11 +1309,6 @@ def get_wavetable_total_positions(header: bytes) -> int:
     return value
 
 
-_test(get_wavetable_total_positions, test_pti_header, 0)
-_test(get_wavetable_total_positions, pti_headers["wavetable_window_1024_position_1"], 10)
-_test(get_wavetable_total_positions, pti_headers["wavetable_window_32_position_343"], 344)
-
-
 def get_wavetable_position(header: bytes) -> int:
     """Return active wavetable poisiotn."""
     assert isinstance(value := _unpack(header, "WAVETABLE_POSITION"), int), type(value)
@@ -1675,10 +1316,64 @@ def get_wavetable_position(header: bytes) -> int:
     return value
 
 
-_test(get_wavetable_position, test_pti_header, 0)
-_test(get_wavetable_position, pti_headers["wavetable_window_1024_position_1"], 1)
-_test(get_wavetable_position, pti_headers["wavetable_window_32_position_343"], 343)
-_test(get_wavetable_position, pti_headers["wavetable_window_1024_position_9"], 9)
+def get_wavetable_frames(value: object) -> numpy.ndarray | memoryview:
+    """
+    Return the audio of a wavetable .pti file as a (positions, window size) grid of 16-bit samples.
+
+    Returns a read-only NumPy view of the audio (no copy) if NumPy is installed,
+    otherwise a 2-D memoryview (a copy on big-endian platforms).
+    """
+    if isinstance(value, str):
+        value = pathlib.Path(value)  # Memory map instead of reading the file
+    header = ValidatedHeader(get_header(value))
+    assert is_wavetable(header), "Not a wavetable"
+    positions, window_size = get_wavetable_total_positions(header), get_wavetable_window_size(header)
+    audio = memoryview(get_audio(value))
+    _check_frames(header, audio.nbytes)
+    # The audio after the last whole window is not part of the wavetable
+    nbytes = positions * window_size * FRAME_SIZE
+    assert nbytes <= audio.nbytes, f"{positions=} {window_size=} {audio.nbytes=}"
+    if _import_numpy() is not None:
+        return _audio_array(audio[:nbytes]).reshape(positions, window_size)
+    samples = audio[:nbytes] if sys.byteorder == "little" else memoryview(_audio_array(audio[:nbytes])).cast("B")
+    return samples.cast("h", [positions, window_size])
+
+
+def wavetable_mipmaps(frames: numpy.ndarray, *, levels: int | None = None) -> numpy.ndarray:
+    """
+    Return band-limited copies of wavetable frames, as a (levels, positions, window size) array (-1.0-1.0).
+
+    Level 0 keeps every harmonic, every next level keeps half the harmonics
+    of the previous level, so level n can be played n octaves higher without
+    aliasing. By default the last level is a sine. Every frame is transformed
+    with a single batched FFT, every level with a single batched inverse FFT.
+    """
+    if (numpy := _import_numpy()) is None:
+        raise ImportError("wavetable_mipmaps requires NumPy")
+    positions, window_size = numpy.shape(frames)
+    max_levels = window_size.bit_length() - 1
+    levels = max_levels if levels is None else levels
+    assert 0 < levels <= max_levels, f"{levels=} {max_levels=}"
+    spectrum = numpy.fft.rfft(numpy.asarray(frames, dtype=numpy.float32) / 32768, axis=1)
+    # Highest harmonic of every level, the first level goes up to Nyquist
+    harmonics = (window_size // 2) >> numpy.arange(levels)
+    keep = numpy.arange(spectrum.shape[1]) <= harmonics[:, None]
+    return numpy.fft.irfft(spectrum * keep[:, None, :], n=window_size, axis=2).astype(numpy.float32)
+
+
+def get_wavetable_mipmaps(path: str | os.PathLike[str], *, levels: int | None = None) -> numpy.ndarray:
+    """Return the (read-only) wavetable_mipmaps of a wavetable .pti file, cached until the file changes."""
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return _cached_mipmaps(path, stat.st_mtime_ns, stat.st_size, levels)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_mipmaps(path: str, mtime_ns: int, size: int, levels: int | None) -> numpy.ndarray:
+    """Return the wavetable_mipmaps of path, mtime_ns and size only invalidate the cache."""
+    mipmaps = wavetable_mipmaps(get_wavetable_frames(path), levels=levels)
+    mipmaps.flags.writeable = False  # Shared by every caller
+    return mipmaps
 
 
 ##
@@ -1701,11 +1396,6 @@ def get_granular_shape(header: bytes) -> GranularShape:
     return GranularShape(value)
 
 
-_test(get_granular_shape, test_pti_header, GranularShape.SQUARE)
-_test(get_granular_shape, pti_headers["granular_shape_triangle"], GranularShape.TRIANGLE)
-_test(get_granular_shape, pti_headers["granular_shape_gauss"], GranularShape.GAUSS)
-
-
 @enum.unique
 class GranularLoopMode(enum.IntEnum):
     """Granular loop mode."""
@@ -1721,19 +1411,6 @@ def get_granular_loop_mode(header: bytes) -> GranularLoopMode:
     return GranularLoopMode(value)
 
 
-_test(get_granular_loop_mode, test_pti_header, GranularLoopMode.FORWARD)
-_test(
-    get_granular_loop_mode,
-    pti_headers["granular_loop_backward"],
-    GranularLoopMode.BACKWARD,
-)
-_test(
-    get_granular_loop_mode,
-    pti_headers["granular_loop_pingpong"],
-    GranularLoopMode.PINGPONG,
-)
-
-
 def get_granular_position(header: bytes) -> int:
     """Return granular start position."""
     assert isinstance(value := _unpack(header, "GRANULAR_POSITION"), int), type(value)
@@ -1741,10 +1418,6 @@ def get_granular_position(header: bytes) -> int:
     return value
 
 
-_test(get_granular_position, test_pti_header, 0)
-_test(get_granular_position, pti_headers["granular_position_250_max_lenght_20"], 65535)
-
-
 def get_granular_length(header: bytes) -> int:
     """Return granular length value (44-44100)."""
     assert isinstance(value := _unpack(header, "GRANULAR_LENGTH"), int), type(value)
@@ -1752,12 +1425,719 @@ def get_granular_length(header: bytes) -> int:
     return value
 
 
-_test(get_granular_length, test_pti_header, int(0.01 * 44100))
-_test(get_granular_length, pti_headers["granular_lenght_1_min"], int(0.001 * 44100))
-_test(get_granular_length, pti_headers["granular_lenght_250_max"], int(0.25 * 44100))
-_test(get_granular_length, pti_headers["granular_position_250_max_lenght_20"], int(0.02 * 44100) - 1)  # Off by one
-_test(get_granular_length, pti_headers["10ms"], int(0.005 * 44100))
-_test(get_granular_length, pti_headers["250ms"], int(0.02 * 44100) - 1)  # Off by one
-_test(get_granular_length, pti_headers["1000ms"], int(0.1 * 44100) + 2)  # Close enough
-_test(get_granular_length, pti_headers["5000ms"], 44100)
-_test(get_granular_length, pti_headers["10000ms"], 44100)
+##
+# Decode a full header in a single pass
+##
+
+# Fields that span more than one value of their HeaderStruct format
+_FIELD_COUNT = {"SLICE_N": 48}
+
+_FIELD_DECODERS: dict[str, Callable[[Any], Any]] = {
+    "NAME": lambda value: value.rstrip(b"\x00").decode("ascii"),
+    "SAMPLE_PLAYBACK": SamplePlayback,
+    "FILTER_TYPE": FilterType,
+    "VOLUME_LFO_STEPS": VolumeLfoSteps,
+    "GRANULAR_SHAPE": GranularShape,
+    "GRANULAR_LOOP_MODE": GranularLoopMode,
+}
+for field in HeaderOffset:
+    if field.name.endswith("_AUTOMATION"):
+        _FIELD_DECODERS[field.name] = InstrumentAutomation
+    elif field.name.endswith("_LFO_TYPE"):
+        _FIELD_DECODERS[field.name] = AutomationLfoType
+    elif field.name.endswith("_LFO_STEPS"):
+        _FIELD_DECODERS.setdefault(field.name, AutomationLfoSteps)
+
+
+def _compile_header_struct() -> tuple[struct.Struct, tuple[HeaderOffset, ...]]:
+    """Return a struct that unpacks every known field of a .pti header in one call."""
+    fmt = "<"
+    position = 0
+    fields = tuple(sorted(HeaderOffset))
+    for field in fields:
+        assert position <= field, f"{field=} overlaps the previous field"
+        if position < field:
+            fmt += f"{field - position}x"  # Unknown (or known constant) bytes
+        code = HeaderStruct[field.name].format.lstrip("<")
+        count = _FIELD_COUNT.get(field.name, 1)
+        fmt += code if count == 1 else f"{count}{code}"
+        position = field + struct.calcsize(f"<{code}") * count
+    fmt += f"{PTI_HEADER_LENGTH - position}x"
+    compiled = struct.Struct(fmt)
+    assert compiled.size == PTI_HEADER_LENGTH, compiled.size
+    return compiled, fields
+
+
+_HEADER_STRUCT, _HEADER_FIELDS = _compile_header_struct()
+
+
+class PtiHeader:
+    """All known values of a .pti file header, as returned by decode_header."""
+
+    __slots__ = tuple(field.name.lower() for field in _HEADER_FIELDS)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PtiHeader):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+def _decode_plan() -> tuple[tuple[int, int], tuple[tuple[int, Callable[[Any], Any]], ...]]:
+    """Return the (start, stop) of the slice table and the (index, decoder) pairs for the unpacked values."""
+    names = [field.name for field in _HEADER_FIELDS]
+    start = names.index("SLICE_N")
+    slices = (start, start + _FIELD_COUNT["SLICE_N"])
+    decoders = tuple((i, _FIELD_DECODERS[name]) for i, name in enumerate(names) if name in _FIELD_DECODERS)
+    return slices, decoders
+
+
+_SLICES, _DECODERS = _decode_plan()
+
+
+def _decode_measured(values: list[Any], metrics: Metrics) -> None:
+    """Decode unpacked values in place (like decode_header), timing every field and counting enum failures."""
+    for i, decoder in _DECODERS:
+        name = PtiHeader.__slots__[i]
+        start = time.perf_counter()
+        try:
+            values[i] = decoder(values[i])
+        except ValueError:
+            if isinstance(decoder, enum.EnumMeta):
+                metrics.add("enum_errors")
+                metrics.add(f"enum_errors.{name}")
+            raise
+        finally:
+            metrics.add(f"decode_seconds.{name}", time.perf_counter() - start)
+
+
+def decode_header(header: bytes) -> PtiHeader:
+    """Return all known values of a .pti file header, decoded in a single pass."""
+    _check_header(header)
+    values = list(_HEADER_STRUCT.unpack(header))
+    start, stop = _SLICES
+    values[start:stop] = [tuple(values[start:stop])]
+    if metrics is not None:
+        _decode_measured(values, metrics)
+    else:
+        for i, decoder in _DECODERS:
+            values[i] = decoder(values[i])
+    record = PtiHeader.__new__(PtiHeader)
+    for name, value in zip(PtiHeader.__slots__, values):
+        setattr(record, name, value)
+    return record
+
+
+##
+# Decode many headers at once
+##
+
+# NumPy equivalents of the HeaderStruct formats
+_NUMPY_FORMATS = {"?": "?", "b": "i1", "B": "u1", "H": "<u2", "L": "<u4", "f": "<f4"}
+
+
+@functools.cache
+def _header_dtype() -> numpy.dtype:
+    """Return a NumPy structured dtype with a field (in lower case) for every HeaderOffset."""
+    names, formats, offsets = [], [], []
+    for field in _HEADER_FIELDS:
+        code = HeaderStruct[field.name].format.lstrip("<")
+        fmt: Any = f"S{code[:-1]}" if code.endswith("s") else _NUMPY_FORMATS[code]
+        if (count := _FIELD_COUNT.get(field.name, 1)) > 1:
+            fmt = (fmt, (count,))
+        names.append(field.name.lower())
+        formats.append(fmt)
+        offsets.append(int(field))
+    return _import_numpy().dtype(
+        {"names": names, "formats": formats, "offsets": offsets, "itemsize": PTI_HEADER_LENGTH}
+    )
+
+
+def decode_headers(headers: Iterable[bytes]) -> numpy.ndarray:
+    """
+    Return many .pti file headers as a NumPy structured array (see HEADER_DTYPE).
+
+    The headers are copied into one contiguous buffer, every field of the
+    array is a view on that buffer. Enum fields are not converted, compare
+    them to the enum values instead (e.g. FilterType.LOW_PASS.value).
+    """
+    if (numpy := _import_numpy()) is None:
+        raise ImportError("decode_headers requires NumPy")
+    buffer = bytearray()
+    for header in headers:
+        _check_header(header)
+        buffer += header
+    return numpy.frombuffer(buffer, dtype=_header_dtype())
+
+
+def __getattr__(name: str) -> Any:
+    """Return HEADER_DTYPE (the dtype of decode_headers, None without NumPy), built on first use."""
+    if name == "HEADER_DTYPE":
+        return _header_dtype() if _import_numpy() is not None else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+##
+# Stream audio in chunks
+##
+
+# Bytes per audio frame (16-bit mono)
+FRAME_SIZE = 2
+
+
+def _check_frames(header: bytes, nbytes: int) -> None:
+    """Assert that nbytes of audio matches the sample length of the header (if set)."""
+    assert nbytes % FRAME_SIZE == 0, f"{nbytes=}"
+    frames = nbytes // FRAME_SIZE
+    # The sample length is 0 (not set) for some instruments
+    assert (sample_length := get_sample_length(header)) in {0, frames}, f"{sample_length=} {frames=}"
+
+
+@functools.singledispatch
+def iter_audio(value: object, *, frames_per_chunk: int = 65536) -> Iterator[memoryview]:
+    """Yield .pti audio in chunks of frames_per_chunk frames (the last chunk may be shorter)."""
+    assert frames_per_chunk > 0, f"{frames_per_chunk=}"
+    header = get_header(value)
+    audio = memoryview(get_audio(value))
+    chunk_size = frames_per_chunk * FRAME_SIZE
+    _check_frames(header, audio.nbytes)
+    for start in range(0, audio.nbytes, chunk_size):
+        yield audio[start:start + chunk_size]
+
+
+@iter_audio.register(bytes)
+def _(value: bytes, *, frames_per_chunk: int = 65536) -> Iterator[memoryview]:
+    """Yield audio from .pti bytestring in chunks, without copying."""
+    return iter_audio(memoryview(value), frames_per_chunk=frames_per_chunk)
+
+
+@iter_audio.register(io.BufferedIOBase)
+def _(value: io.BufferedIOBase, *, frames_per_chunk: int = 65536) -> Iterator[memoryview]:
+    """
+    Yield audio from .pti file in chunks.
+
+    All chunks are read into the same buffer, a chunk is only valid until the next chunk is read.
+    The size of the audio is checked (against the end of the file) before the first chunk is read.
+    """
+    assert frames_per_chunk > 0, f"{frames_per_chunk=}"
+    header = get_header(value)
+    _check_frames(header, value.seek(0, io.SEEK_END) - PTI_HEADER_LENGTH)
+    value.seek(PTI_HEADER_LENGTH)
+    buffer = memoryview(bytearray(frames_per_chunk * FRAME_SIZE))
+    while size := value.readinto(buffer):
+        yield buffer[:size]
+
+
+@iter_audio.register(str)
+@iter_audio.register(os.PathLike)
+def _(value: str | os.PathLike[str], *, frames_per_chunk: int = 65536) -> Iterator[memoryview]:
+    """Yield audio from path to .pti file in chunks, see iter_audio for open files."""
+    with open(value, "rb") as f:
+        yield from iter_audio(f, frames_per_chunk=frames_per_chunk)
+
+
+##
+# Positional (thread-safe) reads from a file descriptor
+##
+
+
+def _preadinto(fd: int, buffer: memoryview, offset: int) -> int:
+    """Read into buffer from offset, without changing the file position, return the number of bytes read."""
+    nbytes = 0
+    while nbytes < buffer.nbytes:
+        if hasattr(os, "preadv"):
+            size = os.preadv(fd, [buffer[nbytes:]], offset + nbytes)
+        else:
+            data = os.pread(fd, buffer.nbytes - nbytes, offset + nbytes)
+            size = len(data)
+            buffer[nbytes:nbytes + size] = data
+        if not size:
+            break  # End of file
+        nbytes += size
+    return nbytes
+
+
+@get_header.register(int)
+def _(value: int) -> bytes:
+    """Return header from .pti file descriptor, without changing the file position."""
+    header = os.pread(value, PTI_HEADER_LENGTH, 0)
+    while len(header) < PTI_HEADER_LENGTH and (data := os.pread(value, PTI_HEADER_LENGTH - len(header), len(header))):
+        header += data
+    if metrics is not None:
+        metrics.add("get_header_bytes", len(header))
+    return header
+
+
+@get_audio.register(int)
+def _(value: int) -> memoryview:
+    """Return audio from .pti file descriptor, without changing the file position."""
+    audio = read_audio_range(value)
+    if metrics is not None:
+        metrics.add("get_audio_bytes", audio.nbytes)
+    return audio
+
+
+@get_header.register(bool)
+@get_audio.register(bool)
+def _(value: bool) -> bytes:
+    """Reject booleans, they are ints but not file descriptors (True would read from stdout)."""
+    raise NotImplementedError
+
+
+def read_audio_range(fd: int, start: int = 0, frames: int | None = None) -> memoryview:
+    """
+    Return (at most) frames frames of audio from a .pti file descriptor, starting at frame start.
+
+    The audio is read with positional reads (os.preadv/os.pread), the file
+    position is never changed, so threads can safely share a descriptor.
+    """
+    assert start >= 0, f"{start=}"
+    offset = PTI_HEADER_LENGTH + start * FRAME_SIZE
+    if frames is None:
+        frames = max(0, os.fstat(fd).st_size - offset) // FRAME_SIZE
+    assert frames >= 0, f"{frames=}"
+    buffer = memoryview(bytearray(frames * FRAME_SIZE))
+    return buffer[:_preadinto(fd, buffer, offset)]
+
+
+class DescriptorCache:
+    """
+    Thread-safe cache of read-only file descriptors, one per path.
+
+    Use with get_header/get_audio/read_audio_range to serve concurrent
+    requests without reopening files. When more than maxsize files are
+    open, the least recently used descriptors that are not in use are closed.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        assert maxsize > 0, f"{maxsize=}"
+        self.maxsize = maxsize
+        self._fds: dict[str, list[int]] = {}  # path => [fd, users], least recently used first
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, path: str | os.PathLike[str]) -> Iterator[int]:
+        """Return the (cached) file descriptor of path, it stays open until the with block ends."""
+        path = os.fspath(path)
+        with self._lock:
+            if (entry := self._fds.pop(path, None)) is None:
+                entry = [os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0)), 0]
+            entry[1] += 1
+            self._fds[path] = entry
+        try:
+            yield entry[0]
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                self._evict()
+
+    def _evict(self) -> None:
+        """Close unused descriptors until at most maxsize are open (if possible)."""
+        for path in [path for path, (_, users) in self._fds.items() if not users]:
+            if len(self._fds) <= self.maxsize:
+                break
+            os.close(self._fds.pop(path)[0])
+
+    def close(self) -> None:
+        """Close all cached file descriptors, they must no longer be in use."""
+        with self._lock:
+            while self._fds:
+                os.close(self._fds.popitem()[1][0])
+
+    def __enter__(self) -> DescriptorCache:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+##
+# Encode a header
+##
+
+# Header of ./test.pti, an instrument named "test" with default settings and no sample
+DEFAULT_HEADER = bytes.fromhex(
+    "5449010001050001090909097401666601000000007465737400000000000000"
+    "0000000000000000000000000000000000000000000000000000000000000000"
+    "000800000000000000000000000000000100feffffff0000000000000000803f"
+    "00000000000000000000803fe80300010000803f0000b80b000000000000803f"
+    "e80300000000803f0000b80b000000000000803fe80300000000803f0000b80b"
+    "000000000000803fe80300000000803f0000b80b000000000000803fe8030000"
+    "0000803f0000b80b000000000000803fe8030000020000000000003f02000000"
+    "0000003f020000000000003f020000000000003f020000000000003f02000000"
+    "0000003f0000803f000000000000000032000000320000000000000000000000"
+    "0000000000000000000000000000000000000000000000000000000000000000"
+    "0000000000000000000000000000000000000000000000000000000000000000"
+    "0000000000000000000000000000000000000000000000000000b90100000000"
+    "000010004a9ea009"
+)
+
+
+# Bytes 388-391 are the crc32 of the rest of the header (see discoverpti.py)
+CHECKSUM_OFFSET = 388
+CHECKSUM = struct.Struct("<L")
+
+
+def header_checksum(header: bytes) -> int:
+    """Return the checksum of a .pti header, the crc32 of the bytes before CHECKSUM_OFFSET."""
+    return zlib.crc32(memoryview(header)[:CHECKSUM_OFFSET])
+
+
+def _encode_name(value: str) -> bytes:
+    """Return an instrument name as header value."""
+    assert len(name := value.encode("ascii")) <= 31, f"{value=}"
+    return name
+
+
+def _encode_plan() -> tuple[tuple[str, struct.Struct, int, Callable[[Any], Any] | None], ...]:
+    """Return the (attribute, struct, offset, encoder) to pack every PtiHeader attribute with."""
+    plan = []
+    for field in _HEADER_FIELDS:
+        name = field.name.lower()
+        if (count := _FIELD_COUNT.get(field.name, 1)) > 1:
+            code = HeaderStruct[field.name].format.lstrip("<")
+            plan.append((name, struct.Struct(f"<{count}{code}"), int(field), None))
+        elif field.name == "NAME":
+            plan.append((name, HeaderStruct[field.name], int(field), _encode_name))
+        elif field.name in _FIELD_DECODERS:
+            plan.append((name, HeaderStruct[field.name], int(field), operator.attrgetter("value")))
+        else:
+            plan.append((name, HeaderStruct[field.name], int(field), None))
+    return tuple(plan)
+
+
+_ENCODERS = _encode_plan()
+
+
+# Getter that checks the value of every PtiHeader attribute that has one (see encode_header)
+_VALIDATORS: dict[str, Callable[[bytes], Any]] = {
+    "is_wavetable": is_wavetable,
+    "name": get_name,
+    "sample_length": get_sample_length,
+    "wavetable_window_size": get_wavetable_window_size,
+    "wavetable_total_positions": get_wavetable_total_positions,
+    "sample_playback": get_sample_playback,
+    "playback_start": get_playback_start,
+    "loop_start": get_loop_start,
+    "loop_end": get_loop_end,
+    "playback_end": get_playback_end,
+    "wavetable_position": get_wavetable_position,
+    "volume_envelope_amount": get_volume_envelope_amount,
+    "volume_envelope_attack": get_volume_envelope_attack,
+    "volume_envelope_decay": get_volume_envelope_decay,
+    "volume_envelope_sustain": get_volume_envelope_sustain,
+    "volume_envelope_release": get_volume_envelope_release,
+    "volume_automation": get_volume_automation,
+    "panning_automation": get_panning_automation,
+    "cutoff_automation": get_cutoff_automation,
+    "wavetable_position_automation": get_wavetable_position_automation,
+    "granular_position_automation": get_granular_position_automation,
+    "finetune_automation": get_finetune_automation,
+    "volume_lfo_type": get_volume_lfo_type,
+    "volume_lfo_steps": get_volume_lfo_steps,
+    "volume_lfo_amount": get_volume_lfo_amount,
+    "panning_lfo_type": get_panning_lfo_type,
+    "panning_lfo_steps": get_panning_lfo_steps,
+    "panning_lfo_amount": get_panning_lfo_amount,
+    "cutoff_lfo_type": get_cutoff_lfo_type,
+    "cutoff_lfo_steps": get_cutoff_lfo_steps,
+    "cutoff_lfo_amount": get_cutoff_lfo_amount,
+    "wavetable_position_lfo_type": get_wavetable_position_lfo_type,
+    "wavetable_position_lfo_steps": get_wavetable_position_lfo_steps,
+    "wavetable_position_lfo_amount": get_wavetable_position_lfo_amount,
+    "granular_position_lfo_type": get_granular_position_lfo_type,
+    "granular_position_lfo_steps": get_granular_position_lfo_steps,
+    "granular_position_lfo_amount": get_granular_position_lfo_amount,
+    "finetune_lfo_type": get_finetune_lfo_type,
+    "finetune_lfo_steps": get_finetune_lfo_steps,
+    "finetune_lfo_amount": get_finetune_lfo_amount,
+    "filter_cutoff": get_filter_cutoff,
+    "filter_resonance": get_filter_resonance,
+    "filter_type": get_filter_type,
+    "tune": get_tune,
+    "finetune": get_finetune,
+    "volume": get_volume,
+    "panning": get_panning,
+    "delay_send": get_delay_send,
+    "slice_n": get_slices,
+    "num_slices": get_num_slices,
+    "granular_length": get_granular_length,
+    "granular_position": get_granular_position,
+    "granular_shape": get_granular_shape,
+    "granular_loop_mode": get_granular_loop_mode,
+    "reverb_send": get_reverb_send,
+    "overdrive": get_overdrive,
+    "bit_depth": get_bit_depth,
+}
+
+
+def encode_header(record: PtiHeader | None = None, *, template: bytes = DEFAULT_HEADER, **fields: Any) -> bytearray:
+    """
+    Return a .pti file header.
+
+    Values are taken from fields (PtiHeader attribute names, e.g. volume=100),
+    then record, then template. The bytes that are not (yet) understood are
+    always copied from template, the checksum is updated. Every value that is
+    written is checked by its getter (e.g. volume=200 raises AssertionError).
+    """
+    assert len(template) == PTI_HEADER_LENGTH, f"{len(template)=}"
+    assert not (unknown := fields.keys() - set(PtiHeader.__slots__)), f"{unknown=}"
+    header = bytearray(template)
+    written = []
+    for name, field_struct, offset, encoder in _ENCODERS:
+        if name in fields:
+            value = fields[name]
+        elif record is not None:
+            value = getattr(record, name)
+        else:
+            continue
+        written.append(name)
+        if encoder is not None:
+            value = encoder(value)
+        if isinstance(value, (tuple, list)):
+            field_struct.pack_into(header, offset, *value)  # SLICE_N
+        else:
+            field_struct.pack_into(header, offset, value)
+    CHECKSUM.pack_into(header, CHECKSUM_OFFSET, header_checksum(header))
+    validated = ValidatedHeader(header, trusted=True)
+    for name in written:
+        if (validator := _VALIDATORS.get(name)) is not None:
+            validator(validated)
+    return header
+
+
+def write_pti(path: str | os.PathLike[str], header: bytes, audio: bytes | memoryview) -> None:
+    """Write a .pti file, the header and audio are written with a single os.writev call (if possible)."""
+    assert len(header) == PTI_HEADER_LENGTH, f"{len(header)=}"
+    _check_frames(header, memoryview(audio).nbytes)
+    buffers = [memoryview(header).cast("B"), memoryview(audio).cast("B")]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        while buffers:
+            size = os.writev(fd, buffers)
+            # Continue after a partial write
+            while buffers and size >= buffers[0].nbytes:
+                size -= buffers.pop(0).nbytes
+            if buffers:
+                buffers[0] = buffers[0][size:]
+    finally:
+        os.close(fd)
+
+
+##
+# Patch header values in place
+##
+
+# Offset and size of every PtiHeader attribute
+_FIELD_RANGES = {name: (offset, field_struct.size) for name, field_struct, offset, _ in _ENCODERS}
+
+
+def _merge_ranges(ranges: Iterable[tuple[int, int]], max_gap: int) -> list[tuple[int, int]]:
+    """Return (start, stop) ranges with ranges that are at most max_gap bytes apart merged."""
+    merged: list[tuple[int, int]] = []
+    for start, stop in sorted(ranges):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], max(stop, merged[-1][1]))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def patch_pti(path: str | os.PathLike[str], *, max_gap: int = 8, **fields: Any) -> list[tuple[int, int]]:
+    """
+    Change header values of a .pti file in place, without rewriting the audio.
+
+    Takes the same fields as encode_header. Only values that actually change
+    are written (and the checksum, if anything changed), with positional writes;
+    values that are at most max_gap bytes apart are written together. Returns
+    the (start, stop) range of every write.
+    """
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        header = get_header(fd)
+        _check_header(header)
+        patched = encode_header(template=header, **fields)
+        changed = []
+        for name in fields:
+            offset, size = _FIELD_RANGES[name]
+            if patched[offset:offset + size] != header[offset:offset + size]:
+                changed.append((offset, offset + size))
+        if changed:
+            changed.append((CHECKSUM_OFFSET, CHECKSUM_OFFSET + CHECKSUM.size))
+        writes = _merge_ranges(changed, max_gap)
+        for start, stop in writes:
+            data = memoryview(patched)[start:stop]
+            while data:
+                data = data[os.pwrite(fd, data, stop - data.nbytes):]
+    finally:
+        os.close(fd)
+    return writes
+
+
+##
+# Compare headers
+##
+
+_UNKNOWN_BYTE = struct.Struct("<B")
+
+
+def _byte_index() -> tuple[tuple[tuple[str, int, struct.Struct], ...], tuple[int, ...]]:
+    """
+    Return the parts of a header, in order, and the part every header byte belongs to.
+
+    A part is a (name, offset, struct) tuple: a field, a single slice
+    (SLICE_N[1]-SLICE_N[48]), the CHECKSUM or an unknown byte (BYTE_<offset>).
+    """
+    starts = {CHECKSUM_OFFSET: ("CHECKSUM", CHECKSUM)}
+    for field in _HEADER_FIELDS:
+        field_struct = HeaderStruct[field.name]
+        count = _FIELD_COUNT.get(field.name, 1)
+        for n in range(count):
+            name = field.name if count == 1 else f"{field.name}[{n + 1}]"
+            starts[field + n * field_struct.size] = (name, field_struct)
+    parts: list[tuple[str, int, struct.Struct]] = []
+    owners: list[int] = []
+    while (offset := len(owners)) < PTI_HEADER_LENGTH:
+        name, field_struct = starts.get(offset, (f"BYTE_{offset}", _UNKNOWN_BYTE))
+        owners.extend([len(parts)] * field_struct.size)
+        parts.append((name, offset, field_struct))
+    return tuple(parts), tuple(owners)
+
+
+_DIFF_PARTS, _BYTE_PARTS = _byte_index()
+
+
+def _diff_value(header: bytes, field_struct: struct.Struct, offset: int) -> Any:
+    """Return a JSON compatible header value (bytes as hex)."""
+    value = field_struct.unpack_from(header, offset)[0]
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def diff_headers(
+    headers: Mapping[str, bytes],
+    baseline: bytes = DEFAULT_HEADER,
+    *,
+    ignore: Iterable[str] = (),
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """
+    Return the fields (and unknown bytes) of every header that differ from baseline.
+
+    All headers are compared to baseline at once (with NumPy, if available),
+    every changed byte is mapped to the field it is part of. The result is
+    JSON compatible: {key: {field: {"offset", "size", "baseline", "value"}}},
+    ordered by offset. Fields in ignore (e.g. NAME or CHECKSUM) are left out.
+    """
+    assert len(baseline) == PTI_HEADER_LENGTH, f"{len(baseline)=}"
+    keys = list(headers)
+    values = list(headers.values())
+    assert all(len(header) == PTI_HEADER_LENGTH for header in values), "Not a .pti header"
+    if (numpy := _import_numpy()) is not None:
+        stacked = numpy.frombuffer(b"".join(values), dtype=numpy.uint8).reshape(-1, PTI_HEADER_LENGTH)
+        rows, columns = numpy.nonzero(stacked != numpy.frombuffer(baseline, dtype=numpy.uint8))
+        # (header, part) of every changed byte, in order, keep one per changed part
+        pairs = rows * len(_DIFF_PARTS) + numpy.asarray(_BYTE_PARTS)[columns]
+        pairs = pairs[numpy.diff(pairs, prepend=-1) != 0]
+        changed = zip(*(column.tolist() for column in numpy.divmod(pairs, len(_DIFF_PARTS))))
+    else:
+        changed = sorted({
+            (row, _BYTE_PARTS[i])
+            for row, header in enumerate(values)
+            for i, (value, expected) in enumerate(zip(header, baseline))
+            if value != expected
+        })
+    ignored = set(ignore)
+    diff: dict[str, dict[str, dict[str, Any]]] = {key: {} for key in keys}
+    for row, part in changed:
+        name, offset, field_struct = _DIFF_PARTS[part]
+        if name.split("[")[0] in ignored:
+            continue
+        diff[keys[row]][name] = {
+            "offset": offset,
+            "size": field_struct.size,
+            "baseline": _diff_value(baseline, field_struct, offset),
+            "value": _diff_value(values[row], field_struct, offset),
+        }
+    return diff
+
+
+##
+# Instrumentation
+##
+
+
+class Metrics:
+    """
+    Counters and timers (in seconds) of instrumented operations, see enable_metrics.
+
+    Every value only ever increases (like a Prometheus counter):
+    get_header_bytes/get_audio_bytes (read from files), is_pti_calls,
+    decode_seconds.<field> and enum_errors(.<field>) (decode_header),
+    scan_files, scan_errors and scan_seconds (scanpti.scan_library).
+    """
+
+    def __init__(self, callback: Callable[[str, float], None] | None = None) -> None:
+        self.callback = callback
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value: float = 1) -> None:
+        """Add value to a counter or timer, and pass it on to the callback."""
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+        if self.callback is not None:
+            self.callback(name, value)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return a copy of every counter and timer, and the scan rate in files per second."""
+        with self._lock:
+            values = dict(self._values)
+        if values.get("scan_seconds"):
+            values["scan_files_per_second"] = values.get("scan_files", 0) / values["scan_seconds"]
+        return values
+
+
+# The active Metrics, instrumented code only checks this when metrics are disabled
+metrics: Metrics | None = None
+
+
+def enable_metrics(callback: Callable[[str, float], None] | None = None) -> Metrics:
+    """
+    Start collecting metrics (in this process), return the (new) Metrics.
+
+    callback(name, value) is called for every increment, e.g. to update
+    the counters of an exporter, use Metrics.snapshot to poll instead.
+    """
+    global metrics
+    metrics = Metrics(callback)
+    return metrics
+
+
+def disable_metrics() -> None:
+    """Stop collecting metrics."""
+    global metrics
+    metrics = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show which header fields of .pti files differ from a baseline.")
+    parser.add_argument("paths", nargs="+", help=".pti files (or directories of .pti files) to compare")
+    parser.add_argument("--baseline", help=".pti file to compare to (default: the default instrument)")
+    parser.add_argument("--ignore", action="append", default=[], metavar="FIELD", help="field to leave out, e.g. NAME")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(glob.escape(path), "**", "*.pti"), recursive=True)))
+        else:
+            paths.append(path)
+    baseline = get_header(args.baseline) if args.baseline else DEFAULT_HEADER
+    diff = diff_headers({path: get_header(path) for path in paths}, baseline, ignore=args.ignore)
+    print(json.dumps(diff, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Registry of the test .pti files, loaded lazily."""
+from __future__ import annotations
+
+import functools
+import os
+
+from collections.abc import Iterator, Mapping
+
+from inspectpti import WAV_HEADER_LENGTH, get_audio, get_header
+
+FIXTURE_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Paths (relative to FIXTURE_ROOT) of test .pti files, see pti-test.md
+FIXTURE_PATHS = {
+    "instrument_name": "test/1 ABCDEFGHIJKLMNOPQRSTUVWXYZabcde.pti",
+    "volume_max": "test/2 test.pti",
+    "volume_null": "test/3 test.pti",
+    "volume_min": "test/4 test.pti",
+    "panning_min": "test/5 test.pti",
+    "panning_max": "test/6 test.pti",
+    "tune_min": "test/7 test.pti",
+    "tune_max": "test/8 test.pti",
+    "tune_neg12": "test/16 test.pti",
+    "finetune_min": "test/9 test.pti",
+    "finetune_max": "test/10 test.pti",
+    "filter_lp": "test/11 test.pti",
+    "filter_hp": "test/12 test.pti",
+    "filter_bp": "test/13 test.pti",
+    "overdrive": "test/14 test.pti",
+    "bit_depth": "test/15 test.pti",
+    "lp_cutoff": "test/17 test.pti",
+    "hp_cutoff_rez": "test/18 test.pti",
+    "bp_cutoff_rez": "test/19 test.pti",
+    "reverb_max": "test/20 test.pti",
+    "reverb_min": "test/22 test.pti",
+    "delay_max": "test/21 test.pti",
+    "delay_min": "test/23 test.pti",
+    "loop_fwd": "test/24 test.pti",
+    "loop_bkwd": "test/25 test.pti",
+    "loop_pingpong": "test/26 test.pti",
+    "play_slice": "test/27 test.pti",
+    "play_beat_slice": "test/28 test.pti",
+    "play_wavetable": "test/29 test.pti",
+    "play_granular": "test/30 test.pti",
+    "volume_automation_off": "test/31 test.pti",
+    "volume_automation_lfo": "test/32 test.pti",
+    "panning_automation_envelope": "test/33 test.pti",
+    "panning_automation_lfo": "test/34 test.pti",
+    "cutoff_automation_envelope": "test/35 test.pti",
+    "cutoff_automation_lfo": "test/36 test.pti",
+    "wavetable_automation_envelope": "test/37 test.pti",
+    "wavetable_automation_lfo": "test/38 test.pti",
+    "granular_pos_automation_envelope": "test/39 test.pti",
+    "granular_pos_automation_lfo": "test/40 test.pti",
+    "finetune_envelope": "test/41 test.pti",
+    "finetune_lfo": "test/42 test.pti",
+    "filter_defaults": "filter-test/1 test.pti",
+    "lp_100_0": "filter-test/2 test.pti",
+    "lp_50_0": "filter-test/3 test.pti",
+    "lp_0_0": "filter-test/4 test.pti",
+    "lp_100_100": "filter-test/5 test.pti",
+    "lp_100_50": "filter-test/6 test.pti",
+    "lp_50_50": "filter-test/7 test.pti",
+    "lp_0_100": "filter-test/8 test.pti",
+    "lp_0_50": "filter-test/9 test.pti",
+    "hp_100_0": "filter-test/10 test.pti",
+    "hp_50_0": "filter-test/11 test.pti",
+    "hp_0_0": "filter-test/12 test.pti",
+    "hp_100_100": "filter-test/13 test.pti",
+    "hp_100_50": "filter-test/14 test.pti",
+    "hp_50_50": "filter-test/15 test.pti",
+    "hp_0_100": "filter-test/16 test.pti",
+    "hp_0_50": "filter-test/17 test.pti",
+    "vol_env_attack_10": "envelope-test/2 test.pti",
+    "vol_env_attack_5": "envelope-test/3 test.pti",
+    "vol_env_decay_10": "envelope-test/4 test.pti",
+    "vol_env_decay_5": "envelope-test/5 test.pti",
+    "vol_env_sustain_50": "envelope-test/6 test.pti",
+    "vol_env_sustain_0": "envelope-test/7 test.pti",
+    "vol_env_release_10": "envelope-test/8 test.pti",
+    "vol_env_release_0": "envelope-test/9 test.pti",
+    "vol_env_amount_50": "envelope-test/10 test.pti",
+    "vol_env_amount_0": "envelope-test/11 test.pti",
+    "vol_lfo_rev_saw": "lfo-test/2 test.pti",
+    "vol_lfo_saw": "lfo-test/3 test.pti",
+    "vol_lfo_square": "lfo-test/4 test.pti",
+    "vol_lfo_random": "lfo-test/5 test.pti",
+    "vol_lfo_16_steps": "lfo-test/6 test.pti",
+    "vol_lfo_6_steps": "lfo-test/7 test.pti",
+    "vol_lfo_3_2_steps": "lfo-test/8 test.pti",
+    "vol_lfo_1_64_steps": "lfo-test/9 test.pti",
+    "vol_lfo_amount_100": "lfo-test/10 test.pti",
+    "vol_lfo_amount_0": "lfo-test/11 test.pti",
+    "pan_lfo_rev_saw": "lfo-test/12 test.pti",
+    "pan_lfo_rev_random": "lfo-test/13 test.pti",
+    "pan_lfo_1_48_step": "lfo-test/14 test.pti",
+    "pan_lfo_1_128_steps": "lfo-test/15 test.pti",
+    "pan_lfo_24_steps": "lfo-test/16 test.pti",
+    "pan_lfo_amount_80": "lfo-test/17 test.pti",
+    "pan_lfo_amount_66": "lfo-test/18 test.pti",
+    "pan_lfo_amount_25": "lfo-test/19 test.pti",
+    "pan_lfo_amount_10": "lfo-test/20 test.pti",
+    "pan_lfo_amount_100": "lfo-test/21 test.pti",
+    "cutoff_lfo_square_96_steps_amount38": "lfo-test/22 test.pti",
+    "wavetable_lfo_random_2_steps_amount_8": "lfo-test/23 test.pti",
+    "granular_lfo_saw_32_steps_amount_90": "lfo-test/24 test.pti",
+    "finetune_lfo_square_3_steps_amount_100": "lfo-test/25 test.pti",
+    "1-shot-start-002": "playback-test/2 test.pti",
+    "1-shot-start-0025": "playback-test/3 test.pti",
+    "1-shot-start-0125": "playback-test/4 test.pti",
+    "1-shot-end-02": "playback-test/5 test.pti",
+    "1-shot-end-0125": "playback-test/6 test.pti",
+    "forward-loop-start-0025-loop-start-005": "playback-test/8 test.pti",
+    "forward-loop-end-02-loop-end-018": "playback-test/9 test.pti",
+    "backward-loop-start-0033-loop-start-01111-end-0234-loop-end-0197": "playback-test/10 test.pti",
+    "pingpong-loop-start-0025-loop-start-0033-end-0250-loop-end-0190": "playback-test/11 test.pti",
+    "slice-1-2-adjust-0025-2-2-adjust-008": "playback-test/12 test.pti",
+    "48-slices": "playback-test/24 test.pti",
+    "wavetable_window_32": "playback-test/28 test.pti",
+    "wavetable_window_512": "playback-test/29 test.pti",
+    "wavetable_window_1024_position_1": "playback-test/30 test.pti",
+    "wavetable_window_32_position_343": "playback-test/31 test.pti",
+    "wavetable_window_1024_position_9": "playback-test/32 test.pti",
+    "granular_loop_backward": "playback-test/33 test.pti",
+    "granular_loop_pingpong": "playback-test/34 test.pti",
+    "granular_shape_triangle": "playback-test/35 test.pti",
+    "granular_shape_gauss": "playback-test/36 test.pti",
+    "granular_lenght_1_min": "playback-test/37 test.pti",
+    "granular_lenght_250_max": "playback-test/38 test.pti",
+    "granular_position_250_max_lenght_20": "playback-test/39 test.pti",
+    "10ms": "sample-test/1 test-10ms.pti",
+    "250ms": "sample-test/2 test-250ms.pti",
+    "1000ms": "sample-test/3 test-1000ms.pti",
+    "5000ms": "sample-test/4 test-5000ms.pti",
+    "10000ms": "sample-test/5 test-10000ms.pti",
+}
+
+
+def fixture_path(name: str) -> str:
+    """Return the absolute path to a file in the fixture tree."""
+    return os.path.join(FIXTURE_ROOT, name)
+
+
+class _HeaderRegistry(Mapping[str, bytes]):
+    """Headers of test .pti files, each file is read on first access."""
+
+    def __init__(self, paths: Mapping[str, str]) -> None:
+        self._paths = paths
+        self._headers: dict[str, bytes] = {}
+
+    def __getitem__(self, key: str) -> bytes:
+        if (header := self._headers.get(key)) is None:
+            header = self._headers[key] = get_header(fixture_path(self._paths[key]))
+        return header
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+# Headers of test .pti files
+pti_headers = _HeaderRegistry(FIXTURE_PATHS)
+
+
+@functools.cache
+def default_header() -> bytes:
+    """Return the header of ./test.pti (default instrument settings)."""
+    return get_header(fixture_path("test.pti"))
+
+
+@functools.cache
+def default_audio() -> bytes:
+    """Return the audio of ./test.pti."""
+    return get_audio(fixture_path("test.pti"))
+
+
+@functools.cache
+def wav_audio() -> bytes:
+    """Return the audio of ./test.wav, the sample used to create ./test.pti."""
+    with open(fixture_path("test.wav"), "rb") as f:
+        return f.read()[WAV_HEADER_LENGTH:]
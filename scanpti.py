@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Scan a library of Polyend Tracker .pti files."""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import itertools
+import os
+import time
+
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+import inspectpti
+
+from inspectpti import PTI_HEADER_LENGTH, Metrics, PtiHeader, decode_header
+
+# Libraries with fewer .pti files are scanned serially by default: reading a header takes ~50µs, starting the worker
+# processes ~15ms and sending a result back ~40µs, so the pool is slower for small libraries (0.4x at 300 files)
+SERIAL_SCAN_FILES = 1000
+
+
+class ScanResult(NamedTuple):
+    """Decoded header of a .pti file, or the reason it could not be decoded."""
+
+    path: str
+    header: PtiHeader | None
+    error: str | None = None
+
+
+def iter_files(root: str | os.PathLike[str], extension: str) -> Iterator[str]:
+    """Yield the paths of all files with extension (e.g. ".wav", in any case) in (sub directories of) root."""
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(extension) and entry.is_file():
+                    yield entry.path
+
+
+def iter_pti_files(root: str | os.PathLike[str]) -> Iterator[str]:
+    """Yield the paths of all .pti files in (sub directories of) root."""
+    return iter_files(root, ".pti")
+
+
+def read_header(path: str) -> ScanResult:
+    """Read and decode only the header of a .pti file."""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            header = f.read(PTI_HEADER_LENGTH)
+        if (metrics := inspectpti.metrics) is not None:
+            metrics.add("get_header_bytes", len(header))
+        return ScanResult(path, decode_header(header))
+    except (OSError, AssertionError, ValueError) as e:
+        return ScanResult(path, None, f"{type(e).__name__}: {e}")
+
+
+def _read_headers(paths: list[str], collect_metrics: bool = False) -> tuple[list[ScanResult], dict[str, float]]:
+    """
+    Read and decode the headers of a batch of .pti files.
+
+    With collect_metrics (in a worker process), the metrics of this batch
+    are returned as well, so they can be added to the Metrics of the caller.
+    """
+    if not collect_metrics:
+        return [read_header(path) for path in paths], {}
+    batch_metrics = inspectpti.enable_metrics()
+    try:
+        results = [read_header(path) for path in paths]
+    finally:
+        inspectpti.disable_metrics()
+    return results, batch_metrics.snapshot()
+
+
+def _merge_metrics(batch: tuple[list[ScanResult], dict[str, float]]) -> list[ScanResult]:
+    """Add the metrics of a batch that was read by a worker process to the Metrics of this process."""
+    results, values = batch
+    if (metrics := inspectpti.metrics) is not None:
+        for name, value in values.items():
+            metrics.add(name, value)
+    return results
+
+
+def _batched(paths: Iterable[str], size: int) -> Iterator[list[str]]:
+    """Yield lists of (at most) size paths."""
+    batch: list[str] = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _measure_scan(results: Iterator[ScanResult], metrics: Metrics) -> Iterator[ScanResult]:
+    """Yield results, counting files and errors and the time spent scanning (between results)."""
+    start = time.perf_counter()
+    for result in results:
+        now = time.perf_counter()
+        metrics.add("scan_seconds", now - start)
+        metrics.add("scan_files")
+        if result.error is not None:
+            metrics.add("scan_errors")
+        yield result
+        start = time.perf_counter()
+
+
+def scan_library(
+    root: str | os.PathLike[str],
+    *,
+    workers: int | None = None,
+    chunksize: int = 64,
+) -> Iterator[ScanResult]:
+    """
+    Yield the decoded header of every .pti file in root, in the order they finish.
+
+    Headers are decoded in batches of chunksize files by a pool of worker processes
+    (os.cpu_count() by default), pass workers=1 to scan serially in this process.
+    By default, libraries of less than SERIAL_SCAN_FILES files are scanned serially as well.
+    """
+    assert chunksize > 0, f"{chunksize=}"
+    if (metrics := inspectpti.metrics) is not None:
+        yield from _measure_scan(_scan(root, workers, chunksize), metrics)
+    else:
+        yield from _scan(root, workers, chunksize)
+
+
+def _scan(root: str | os.PathLike[str], workers: int | None, chunksize: int) -> Iterator[ScanResult]:
+    """Yield the decoded header of every .pti file in root (see scan_library)."""
+    paths: Iterable[str] = iter_pti_files(root)
+    if workers is None:
+        # Only start worker processes if the library is large enough to make up for it
+        first = list(itertools.islice(paths, SERIAL_SCAN_FILES))
+        if len(first) < SERIAL_SCAN_FILES:
+            workers = 1
+        paths = itertools.chain(first, paths)
+    batches = _batched(paths, chunksize)
+    if workers == 1:
+        for batch in batches:
+            yield from _read_headers(batch)[0]
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Limit the number of pending batches, so results are yielded while walking the library
+        max_pending = 4 * workers
+        pending: set[concurrent.futures.Future[tuple[list[ScanResult], dict[str, float]]]] = set()
+        for batch in batches:
+            # Workers only collect metrics when they are enabled in this process
+            pending.add(executor.submit(_read_headers, batch, inspectpti.metrics is not None))
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield from _merge_metrics(future.result())
+        for future in concurrent.futures.as_completed(pending):
+            yield from _merge_metrics(future.result())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", help="directory to scan")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = errors = 0
+    for result in scan_library(args.root, workers=args.workers):
+        count += 1
+        if result.error is not None:
+            errors += 1
+            print(f"{result.path}: {result.error}")
+    elapsed = time.perf_counter() - start
+    print(f"Scanned {count} files ({errors} errors) in {elapsed:.2f}s ({count / elapsed:.0f} files/s)")
+
+
+if __name__ == "__main__":
+    main()
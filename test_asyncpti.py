@@ -0,0 +1,97 @@
+"""Tests for asyncpti.py."""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import pathlib
+import threading
+
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+import asyncpti
+import scanpti
+
+from asyncpti import async_get_audio, async_get_header, async_scan_library
+from inspectpti import decode_header, get_audio, get_header
+from ptifixtures import FIXTURE_PATHS, fixture_path
+from scanpti import ScanResult
+
+
+def test_async_get_header(monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = [fixture_path(path) for path in FIXTURE_PATHS.values()]
+    jobs: list[list[object]] = []
+    read_headers = asyncpti._read_headers
+
+    def _read_headers(values: list[object]) -> list[bytes | BaseException]:
+        jobs.append(values)
+        return read_headers(values)
+
+    monkeypatch.setattr(asyncpti, "_read_headers", _read_headers)
+
+    async def main() -> list[bytes]:
+        return await asyncio.gather(*(async_get_header(path) for path in paths))
+
+    assert asyncio.run(main()) == [get_header(path) for path in paths]
+    # Headers requested at the same time are read in batches
+    assert [len(values) for values in jobs] == [64, len(paths) - 64]
+
+
+def test_async_get_header_error() -> None:
+    async def main() -> list[bytes | BaseException]:
+        return await asyncio.gather(
+            async_get_header(fixture_path("test.pti")),
+            async_get_header(fixture_path("missing.pti")),
+            return_exceptions=True,
+        )
+
+    header, error = asyncio.run(main())
+    assert header == get_header(fixture_path("test.pti"))
+    assert isinstance(error, FileNotFoundError)
+
+
+def test_async_get_audio() -> None:
+    path = pathlib.Path(fixture_path("sample-test/3 test-1000ms.pti"))
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        audio = asyncio.run(async_get_audio(path, executor=executor))
+    assert audio == get_audio(str(path))
+
+
+def test_async_scan_library() -> None:
+    async def main() -> list[tuple[str, object]]:
+        return [(result.path, result.header) async for result in async_scan_library(fixture_path("test"), workers=1)]
+
+    results = asyncio.run(main())
+    assert len(results) == 42
+    assert all(header == decode_header(get_header(path)) for path, header in results)
+
+
+def test_async_scan_library_cancel(monkeypatch: pytest.MonkeyPatch) -> None:
+    scans = []
+    reading, release = threading.Event(), threading.Event()
+
+    def scan_library(*args: Any, **kwargs: Any) -> Iterator[ScanResult]:
+        def scan() -> Iterator[ScanResult]:
+            reading.set()
+            release.wait()
+            yield from scanpti.scan_library(*args, **kwargs)
+
+        scans.append(scan())
+        return scans[-1]
+
+    monkeypatch.setattr(asyncpti, "scan_library", scan_library)
+
+    async def main() -> None:
+        task = asyncio.create_task(anext(async_scan_library(fixture_path("test"), workers=1)))
+        await asyncio.get_running_loop().run_in_executor(None, reading.wait)
+        task.cancel()
+        await asyncio.sleep(0)
+        # Cancelled while results are read, the scan is closed once the read is done
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert scans[0].gi_frame is None
@@ -0,0 +1,20 @@
+"""Tests for benchpti.py."""
+from __future__ import annotations
+
+import pathlib
+
+from benchpti import compare, load_results, save_results
+
+
+def test_compare() -> None:
+    baseline = {"decode_header": 10.0, "is_pti": 2.0, "removed": 1.0}
+    assert compare(baseline, {"decode_header": 11.9, "is_pti": 1.0, "new": 100.0}) == []
+    regressions = compare(baseline, {"decode_header": 12.1, "is_pti": 2.0})
+    assert regressions == ["decode_header: 12.1 µs (baseline 10.0 µs, +21%)"]
+    assert compare(baseline, {"decode_header": 12.1}, threshold=0.5) == []
+
+
+def test_save_results(tmp_path: pathlib.Path) -> None:
+    results = {"decode_header": 10.0, "get_header (path)": 8.5}
+    save_results(tmp_path / "baseline.json", results)
+    assert load_results(tmp_path / "baseline.json") == results
@@ -0,0 +1,396 @@
+"""Tests for convertpti.py."""
+from __future__ import annotations
+
+import os
+import pathlib
+import shutil
+import struct
+import wave
+import zlib
+
+from typing import Any
+
+import pytest
+
+import convertpti
+from convertpti import (
+    WAVE_FORMAT_EXTENSIBLE,
+    WAVE_FORMAT_IEEE_FLOAT,
+    WAVE_FORMAT_PCM,
+    WavInfo,
+    convert_directory,
+    copy_range,
+    export_directory,
+    export_slices,
+    export_slices_directory,
+    export_wav,
+    instrument_name,
+    position_to_frame,
+    read_wav_info,
+    transcode,
+    wav_to_pti,
+)
+import inspectpti
+from inspectpti import (
+    CHECKSUM,
+    CHECKSUM_OFFSET,
+    PTI_HEADER_LENGTH,
+    SamplePlayback,
+    decode_header,
+    get_audio,
+    get_header,
+    map_pti,
+    patch_pti,
+    slice_audio,
+)
+from ptifixtures import FIXTURE_PATHS, fixture_path
+
+
+def _write_wav(path: pathlib.Path, audio_format: int, channels: int, rate: int, bits: int, data: bytes,
+               *, extra: bytes = b"") -> None:
+    """Write a .wav file by hand, with optional chunks between the fmt and data chunks."""
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHLLHH", audio_format, channels, rate, rate * block_align, block_align, bits)
+    if audio_format == WAVE_FORMAT_EXTENSIBLE:
+        # Extension size, valid bits, channel mask and sub format GUID (PCM)
+        fmt += struct.pack("<HHL", 22, bits, 0) + struct.pack("<H", WAVE_FORMAT_PCM) + bytes(14)
+    chunks = b"fmt " + struct.pack("<L", len(fmt)) + fmt + extra + b"data" + struct.pack("<L", len(data)) + data
+    path.write_bytes(b"RIFF" + struct.pack("<L", 4 + len(chunks)) + b"WAVE" + chunks)
+
+
+def _read_info(path: str | os.PathLike[str]) -> WavInfo:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return read_wav_info(fd)
+    finally:
+        os.close(fd)
+
+
+def test_read_wav_info(tmp_path: pathlib.Path) -> None:
+    info = _read_info(fixture_path("test.wav"))
+    assert info == WavInfo(WAVE_FORMAT_PCM, 1, 44100, 16, 44, 22050)
+    assert info.frames == 11025
+    assert info.is_pti_audio
+
+    # An odd sized LIST chunk (with pad byte) before the data chunk
+    source = tmp_path / "list.wav"
+    _write_wav(source, WAVE_FORMAT_PCM, 2, 48000, 24, bytes(60), extra=b"LIST\x03\x00\x00\x00abc\x00")
+    info = _read_info(source)
+    assert info == WavInfo(WAVE_FORMAT_PCM, 2, 48000, 24, 56, 60)
+    assert info.frames == 10
+    assert not info.is_pti_audio
+
+    source = tmp_path / "extensible.wav"
+    _write_wav(source, WAVE_FORMAT_EXTENSIBLE, 1, 44100, 16, bytes(8))
+    assert _read_info(source).is_pti_audio
+
+    # Truncated file, the data chunk size is larger than the file
+    source.write_bytes(source.read_bytes()[:-3])
+    assert _read_info(source).data_size == 4
+
+    source = tmp_path / "adpcm.wav"
+    _write_wav(source, 2, 1, 44100, 4, bytes(8))
+    with pytest.raises(AssertionError):
+        _read_info(source)
+
+
+def test_wav_to_pti_stereo(tmp_path: pathlib.Path) -> None:
+    numpy = pytest.importorskip("numpy")
+    samples = numpy.arange(-1000, 1000, dtype="<i2")
+    source = tmp_path / "stereo.wav"
+    _write_wav(source, WAVE_FORMAT_PCM, 2, 44100, 16, numpy.stack([samples, samples], axis=1).tobytes())
+    destination = tmp_path / "stereo.pti"
+    assert wav_to_pti(source, destination) == len(samples) * 2
+    assert decode_header(get_header(destination)).sample_length == len(samples)
+    # Channels are averaged, dither adds at most one step
+    output = numpy.frombuffer(get_audio(str(destination)), dtype="<i2")
+    assert numpy.abs(output.astype(int) - samples).max() <= 1
+
+
+@pytest.mark.parametrize(
+    ("audio_format", "rate", "bits", "dtype"),
+    [
+        (WAVE_FORMAT_PCM, 8000, 8, "u1"),
+        (WAVE_FORMAT_PCM, 22050, 16, "<i2"),
+        (WAVE_FORMAT_PCM, 48000, 24, None),
+        (WAVE_FORMAT_PCM, 96000, 32, "<i4"),
+        (WAVE_FORMAT_IEEE_FLOAT, 32000, 32, "<f4"),
+        (WAVE_FORMAT_IEEE_FLOAT, 44100, 64, "<f8"),
+    ],
+)
+def test_wav_to_pti_transcode(
+    tmp_path: pathlib.Path, audio_format: int, rate: int, bits: int, dtype: str | None,
+) -> None:
+    numpy = pytest.importorskip("numpy")
+    # 0.2 seconds of a 440Hz sine at half volume
+    signal = 0.5 * numpy.sin(2 * numpy.pi * 440 * numpy.arange(rate // 5) / rate)
+    if dtype is None:
+        ints = numpy.round(signal * (2 ** 23 - 1)).astype("<i4")
+        data = ints.view(numpy.uint8).reshape(-1, 4)[:, :3].tobytes()
+    elif dtype == "u1":
+        data = numpy.round(signal * 127 + 128).astype(dtype).tobytes()
+    elif dtype.startswith("<i"):
+        data = numpy.round(signal * (2 ** (bits - 1) - 1)).astype(dtype).tobytes()
+    else:
+        data = signal.astype(dtype).tobytes()
+    source = tmp_path / "sine.wav"
+    _write_wav(source, audio_format, 1, rate, bits, data)
+
+    destination = tmp_path / "sine.pti"
+    frames = 44100 // 5
+    assert wav_to_pti(source, destination) == frames * 2
+    assert decode_header(get_header(destination)).sample_length == frames
+    output = numpy.frombuffer(get_audio(str(destination)), dtype="<i2") / 32768
+    expected = 0.5 * numpy.sin(2 * numpy.pi * 440 * numpy.arange(frames) / 44100)
+    # Ignore the edges of the filter, 8-bit audio is a lot less precise
+    error = numpy.abs(output - expected)[100:-100].max()
+    assert error < (0.01 if bits == 8 else 0.001), error
+
+
+def test_transcode_blocks(tmp_path: pathlib.Path) -> None:
+    numpy = pytest.importorskip("numpy")
+    source = tmp_path / "noise.wav"
+    _write_wav(source, WAVE_FORMAT_PCM, 1, 48000, 16, numpy.random.default_rng(1).bytes(20000))
+    info = _read_info(source)
+    outputs = []
+    for block_frames in (1 << 16, 1000, 7):
+        destination = tmp_path / f"{block_frames}.raw"
+        src_fd = os.open(source, os.O_RDONLY)
+        dst_fd = os.open(destination, os.O_WRONLY | os.O_CREAT)
+        try:
+            assert transcode(src_fd, info, dst_fd, 0, block_frames=block_frames) == 9188 * 2
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+        outputs.append(numpy.frombuffer(destination.read_bytes(), dtype="<i2").astype(int))
+    # The same audio, apart from the dither of every block
+    assert numpy.abs(outputs[1] - outputs[0]).max() <= 2
+    assert numpy.abs(outputs[2] - outputs[0]).max() <= 2
+
+
+def test_wav_to_pti_without_numpy(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(inspectpti, "numpy", None)
+    source = tmp_path / "stereo.wav"
+    _write_wav(source, WAVE_FORMAT_PCM, 2, 44100, 16, bytes(40))
+    with pytest.raises(ImportError):
+        wav_to_pti(source, tmp_path / "stereo.pti")
+    assert not (tmp_path / "stereo.pti").exists()
+    # 16-bit/44.1kHz mono audio does not need NumPy
+    assert wav_to_pti(fixture_path("test.wav"), tmp_path / "test.pti") == 22050
+
+
+def test_wav_to_pti_failures(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    stereo = tmp_path / "stereo.wav"
+    _write_wav(stereo, WAVE_FORMAT_PCM, 2, 44100, 16, bytes(40))
+    # A fmt chunk that ends before the format does
+    truncated = tmp_path / "truncated.wav"
+    truncated.write_bytes(b"RIFF" + struct.pack("<L", 16) + b"WAVE" + b"fmt " + struct.pack("<L", 16) + bytes(4))
+
+    def fail(*args: object) -> None:
+        raise OSError("No space left on device")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(inspectpti, "numpy", None)
+        result = convertpti._convert(wav_to_pti, str(stereo), str(tmp_path / "stereo.pti"))
+        assert result.error is not None and result.error.startswith("ImportError")
+    result = convertpti._convert(wav_to_pti, str(truncated), str(tmp_path / "truncated.pti"))
+    assert result.error is not None and result.error.startswith("error")  # struct.error
+    monkeypatch.setattr(convertpti, "copy_range", fail)
+    result = convertpti._convert(wav_to_pti, fixture_path("test.wav"), str(tmp_path / "test.pti"))
+    assert result.error == "OSError: No space left on device"
+    # No partial .pti files are left behind
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["stereo.wav", "truncated.wav"]
+
+
+def test_wav_to_pti(tmp_path: pathlib.Path) -> None:
+    destination = tmp_path / "test.pti"
+    assert wav_to_pti(fixture_path("test.wav"), destination) == 22050
+    assert get_audio(str(destination)) == get_audio(fixture_path("test.pti"))
+    record = decode_header(get_header(destination))
+    assert record.name == "test"
+    assert record.sample_length == 11025
+
+
+def test_wav_to_pti_invalid(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(AssertionError):
+        wav_to_pti(fixture_path("test.pti"), tmp_path / "test.pti")
+
+
+def test_instrument_name() -> None:
+    assert instrument_name("/samples/Kick 01.wav") == "Kick 01"
+    assert instrument_name("Bassdrum één.pti") == "Bassdrum __n"
+    assert len(instrument_name("x" * 100 + ".wav")) == 31
+
+
+@pytest.mark.parametrize("unsupported", [[], ["copy_file_range"], ["copy_file_range", "sendfile"]])
+def test_copy_range(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, unsupported: list[str]) -> None:
+    for name in unsupported:
+        monkeypatch.delattr(os, name, raising=False)
+    source = pathlib.Path(fixture_path("sample-test/3 test-1000ms.pti"))
+    data = source.read_bytes()
+    destination = tmp_path / "copy"
+    destination.write_bytes(b"\xff" * 10)
+    src_fd = os.open(source, os.O_RDONLY)
+    dst_fd = os.open(destination, os.O_WRONLY)
+    try:
+        copy_range(src_fd, PTI_HEADER_LENGTH, dst_fd, 5, len(data) - PTI_HEADER_LENGTH)
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+    assert destination.read_bytes() == b"\xff" * 5 + data[PTI_HEADER_LENGTH:]
+
+
+def test_convert_directory(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "wav"
+    source.mkdir()
+    shutil.copy(fixture_path("test.wav"), source / "a.wav")
+    shutil.copy(fixture_path("test.wav"), source / "b.WAV")
+    (source / "broken.wav").write_bytes(b"RIFF")
+    (source / "notes.txt").write_text("Not a sample")
+
+    results = {
+        os.path.basename(result.destination): result
+        for result in convert_directory(source, tmp_path / "pti", workers=1)
+    }
+    assert sorted(results) == ["a.pti", "b.pti", "broken.pti"]
+    assert results["broken.pti"].error is not None
+    for name in ("a.pti", "b.pti"):
+        assert results[name].nbytes == 22050
+        assert get_audio(str(tmp_path / "pti" / name)) == get_audio(fixture_path("test.pti"))
+
+
+def test_export_wav(tmp_path: pathlib.Path) -> None:
+    destination = tmp_path / "test.wav"
+    # The sample length of ./test.pti is not set
+    assert export_wav(fixture_path("test.pti"), destination) == 22050
+    assert destination.read_bytes() == pathlib.Path(fixture_path("test.wav")).read_bytes()
+
+    source = fixture_path("sample-test/3 test-1000ms.pti")
+    assert export_wav(source, destination) == 88200
+    with wave.open(str(destination), "rb") as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate(), f.getnframes()) == (1, 2, 44100, 44100)
+        assert f.readframes(44100) == get_audio(source)
+
+
+def test_export_wav_playback_region(tmp_path: pathlib.Path) -> None:
+    # Playback start ~0.033s, end ~0.234s
+    source = fixture_path("playback-test/10 test.pti")
+    record = decode_header(get_header(source))
+    start = position_to_frame(record.playback_start, record.sample_length)
+    stop = position_to_frame(record.playback_end, record.sample_length)
+    assert (start, stop) == (1466, 10328)
+
+    destination = tmp_path / "region.wav"
+    assert export_wav(source, destination, playback_region=True) == (stop - start) * 2
+    with wave.open(str(destination), "rb") as f:
+        assert f.readframes(f.getnframes()) == get_audio(source)[start * 2:stop * 2]
+
+
+def test_export_wav_failure(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(*args: object) -> None:
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(convertpti, "copy_range", fail)
+    result = convertpti._convert(export_wav, fixture_path("test.pti"), str(tmp_path / "test.wav"))
+    assert result.error == "OSError: No space left on device"
+    # No partial .wav files are left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_directory(tmp_path: pathlib.Path) -> None:
+    results = list(export_directory(fixture_path("sample-test"), tmp_path, workers=1))
+    assert len(results) == 5
+    assert all(result.error is None for result in results)
+    for result in results:
+        assert wav_to_pti(result.destination, tmp_path / "roundtrip.pti") == result.nbytes
+        assert get_audio(str(tmp_path / "roundtrip.pti")) == get_audio(result.source)
+
+
+def test_export_directory_nested(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "pti"
+    shutil.copytree(fixture_path("sample-test"), source / "drums" / "kicks")
+    shutil.copy(fixture_path("test.pti"), source / "test.pti")
+    results = list(export_directory(source, tmp_path / "wav", workers=1))
+    assert all(result.error is None for result in results)
+    # Sub directories are exported to the same sub directories
+    paths = sorted(pathlib.Path(result.destination).relative_to(tmp_path / "wav").as_posix() for result in results)
+    expected = sorted(f"drums/kicks/{path.stem}.wav" for path in (source / "drums" / "kicks").iterdir())
+    assert paths == expected + ["test.wav"]
+    assert all(pathlib.Path(result.destination).is_file() for result in results)
+
+    # The destination can be in source
+    results = list(convert_directory(tmp_path / "wav", tmp_path / "wav" / "pti", workers=1))
+    assert len(results) == 6 and all(result.error is None for result in results)
+    assert (tmp_path / "wav" / "pti" / "drums" / "kicks").is_dir()
+
+
+@pytest.mark.parametrize("pti", [False, True])
+def test_export_slices(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, pti: bool) -> None:
+    mapped: list[Any] = []
+    monkeypatch.setattr(convertpti, "map_pti", lambda path: mapped.append(map_pti(path)) or mapped[-1])
+    source = fixture_path(FIXTURE_PATHS["slice-1-2-adjust-0025-2-2-adjust-008"])
+    assert export_slices(source, tmp_path / "slices", pti=pti) == (11025 - 1100) * 2
+    extension = ".pti" if pti else ".wav"
+    assert sorted(path.name for path in (tmp_path / "slices").iterdir()) == [f"01{extension}", f"02{extension}"]
+    for n, expected in enumerate(slice_audio(source), start=1):
+        path = tmp_path / "slices" / f"{n:02d}{extension}"
+        if pti:
+            record = decode_header(get_header(str(path)))
+            assert (record.name, record.sample_length) == (f"{n:02d} slices", len(expected) // 2)
+            assert (record.sample_playback, record.num_slices) == (SamplePlayback.ONE_SHOT, 0)
+            assert record.volume == decode_header(get_header(source)).volume
+            header = get_header(str(path))
+            assert CHECKSUM.unpack_from(header, CHECKSUM_OFFSET)[0] == zlib.crc32(header[:CHECKSUM_OFFSET])
+            assert get_audio(str(path)) == expected
+        else:
+            with wave.open(str(path), "rb") as f:
+                assert f.readframes(f.getnframes()) == expected
+
+    with pytest.raises(AssertionError):
+        export_slices(fixture_path("test.pti"), tmp_path / "test")
+
+    pwrite = os.pwrite
+
+    def fail(fd: int, data: Any, offset: int) -> int:
+        if offset > 0:  # The audio, after the header
+            del data  # Like os.pwrite, do not keep the view alive (in the traceback)
+            raise OSError("No space left on device")
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", fail)
+    with pytest.raises(OSError):
+        export_slices(source, tmp_path / "failed", pti=pti)
+    # The memory maps are closed, also when the instrument is not sliced or a write fails
+    assert len(mapped) == 3 and all(m.closed for m in mapped)
+
+
+def test_export_slices_directory(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    shutil.copy(fixture_path(FIXTURE_PATHS["48-slices"]), source / "48.pti")
+    shutil.copy(fixture_path(FIXTURE_PATHS["slice-1-2-adjust-0025-2-2-adjust-008"]), source / "2.pti")
+    shutil.copy(fixture_path("test.pti"), source / "test.pti")
+    results = {
+        os.path.basename(result.source): result
+        for result in export_slices_directory(source, tmp_path / "slices", workers=1)
+    }
+    assert results["test.pti"].error is not None
+    assert results["48.pti"].error is None and results["2.pti"].error is None
+    assert len(list((tmp_path / "slices" / "48").iterdir())) == 48
+    assert len(list((tmp_path / "slices" / "2").iterdir())) == 2
+
+
+def test_export_slices_directory_sample_length(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    shutil.copy(fixture_path(FIXTURE_PATHS["48-slices"]), source / "48.pti")
+    shutil.copy(fixture_path(FIXTURE_PATHS["slice-1-2-adjust-0025-2-2-adjust-008"]), source / "2.pti")
+    # A sample length that does not match the audio
+    patch_pti(source / "2.pti", sample_length=12345)
+    results = {
+        os.path.basename(result.source): result
+        for result in export_slices_directory(source, tmp_path / "slices", workers=1)
+    }
+    assert results["2.pti"].error is not None and results["2.pti"].error.startswith("AssertionError")
+    assert results["48.pti"].error is None
+    assert len(list((tmp_path / "slices" / "48").iterdir())) == 48
@@ -0,0 +1,81 @@
+"""Tests for corpuspti.py."""
+from __future__ import annotations
+
+import enum
+import pathlib
+
+import pytest
+
+import inspectpti
+from corpuspti import generate_corpus, random_fields
+from inspectpti import (
+    FRAME_SIZE,
+    AutomationLfoSteps,
+    AutomationLfoType,
+    FilterType,
+    GranularLoopMode,
+    GranularShape,
+    InstrumentAutomation,
+    PtiHeader,
+    SamplePlayback,
+    decode_header,
+    get_audio,
+    get_header,
+    is_pti,
+)
+from scanpti import scan_library
+
+
+def test_random_fields() -> None:
+    assert random_fields(7, seed=1) == random_fields(7, seed=1)
+    assert random_fields(7, seed=1) != random_fields(7, seed=2)
+    assert random_fields(7, seed=1) != random_fields(8, seed=1)
+
+    records = [random_fields(index) for index in range(len(AutomationLfoSteps))]
+    for enum_type in (
+        SamplePlayback, FilterType, InstrumentAutomation, AutomationLfoType, AutomationLfoSteps, GranularShape,
+        GranularLoopMode,
+    ):
+        used = {value for record in records for value in record.values() if isinstance(value, enum_type)}
+        assert used == set(enum_type), enum_type
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory: pytest.TempPathFactory) -> list[str]:
+    return list(generate_corpus(tmp_path_factory.mktemp("corpus"), 1100, min_frames=10, max_frames=3000))
+
+
+def test_generate_corpus(corpus: list[str], tmp_path: pathlib.Path) -> None:
+    assert len(corpus) == 1100
+    assert pathlib.Path(corpus[-1]).parent.name == "0001"
+    # The same seed creates the same files
+    again = list(generate_corpus(tmp_path, 50, min_frames=10, max_frames=3000))
+    assert [pathlib.Path(path).read_bytes() for path in again] == [
+        pathlib.Path(path).read_bytes() for path in corpus[:50]
+    ]
+
+
+def test_generate_corpus_valid(corpus: list[str]) -> None:
+    # Not every field has a getter (yet)
+    getters = [inspectpti.is_wavetable] + [
+        getattr(inspectpti, f"get_{name}") for name in PtiHeader.__slots__ if hasattr(inspectpti, f"get_{name}")
+    ]
+    playbacks = set()
+    for path in corpus[:200]:
+        header = get_header(path)
+        assert is_pti(header)
+        for getter in getters:
+            getter(header)
+        record = decode_header(header)
+        assert len(get_audio(path)) == record.sample_length * FRAME_SIZE
+        slices = record.slice_n[:record.num_slices]
+        assert list(slices) == sorted(slices)
+        if record.sample_playback == SamplePlayback.WAVETABLE:
+            assert record.sample_length == record.wavetable_total_positions * record.wavetable_window_size
+        playbacks.add(record.sample_playback)
+    assert playbacks == set(SamplePlayback)
+
+    results = list(scan_library(pathlib.Path(corpus[0]).parent.parent, workers=1))
+    assert len(results) == 1100
+    assert all(result.error is None for result in results)
+    assert all(isinstance(result.header.sample_playback, enum.Enum) for result in results)
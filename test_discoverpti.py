@@ -0,0 +1,51 @@
+"""Tests for discoverpti.py."""
+from __future__ import annotations
+
+import pathlib
+import zlib
+
+import pytest
+
+import discoverpti
+from discoverpti import discover, features, load_corpus, targets
+import inspectpti
+from inspectpti import PTI_HEADER_LENGTH
+from ptifixtures import FIXTURE_PATHS, fixture_path
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture(scope="module")
+def corpus() -> discoverpti.Corpus:
+    return load_corpus([fixture_path("test"), fixture_path("sample-test")])
+
+
+def test_load_corpus(corpus: discoverpti.Corpus, tmp_path: pathlib.Path) -> None:
+    assert len(corpus.paths) == len(corpus.headers) == len(corpus.sizes) > 1
+    assert corpus.headers.shape[1] == PTI_HEADER_LENGTH
+    path = fixture_path(FIXTURE_PATHS["10ms"])
+    assert corpus.sizes[corpus.paths.index(path)] == pathlib.Path(path).stat().st_size
+
+    (tmp_path / "invalid.pti").write_bytes(b"TI" * 300)
+    assert load_corpus([tmp_path, path]).paths == [path]
+
+
+def test_targets(corpus: discoverpti.Corpus) -> None:
+    values = targets(corpus)
+    assert set(values) == set(discoverpti.UNKNOWN_FIELDS)
+    assert values["BYTES_388_391"][0] == zlib.crc32(corpus.headers[0, :388])
+    assert len(features(corpus)["audio_bytes"]) == len(corpus.paths)
+
+
+def test_discover(corpus: discoverpti.Corpus) -> None:
+    candidates = {(candidate.target, candidate.kind, candidate.feature) for candidate in discover(corpus)}
+    assert ("BYTES_388_391", "checksum", "crc32(header[:388])") in candidates
+    assert ("BYTES_56_59", "counter", "audio_bytes") in candidates
+    assert ("BYTE_5", "constant", None) in candidates
+    assert ("BYTE_14", "constant", None) in candidates
+
+
+def test_load_corpus_without_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(inspectpti, "numpy", None)
+    with pytest.raises(ImportError):
+        load_corpus([fixture_path("test")])
@@ -0,0 +1,73 @@
+"""Tests for genwav.py."""
+from __future__ import annotations
+
+import pathlib
+import sys
+import wave
+
+import pytest
+
+from genwav import WAVEFORMS, Signal, frames_for, gen_audio, iter_chunks, main, write_wav
+import inspectpti
+from inspectpti import get_audio
+from ptifixtures import fixture_path
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_gen_audio(monkeypatch: pytest.MonkeyPatch, numpy: bool) -> None:
+    if not numpy:
+        monkeypatch.setattr(inspectpti, "numpy", None)
+    # The files in sample-test/ were created from these .wav files
+    assert gen_audio(Signal(frames_for(10))) == get_audio(fixture_path("sample-test/1 test-10ms.pti"))
+    assert gen_audio(Signal(frames_for(1_000))) == get_audio(fixture_path("sample-test/3 test-1000ms.pti"))
+
+
+@pytest.mark.parametrize("waveform", WAVEFORMS)
+def test_gen_audio_without_numpy(monkeypatch: pytest.MonkeyPatch, waveform: str) -> None:
+    pytest.importorskip("numpy")
+    signal = Signal(5000, frequency=100.0, waveform=waveform, amplitude=1000, sweep_to=5000.0)
+    audio = gen_audio(signal)
+    assert len(audio) == 10000
+    monkeypatch.setattr(inspectpti, "numpy", None)
+    if waveform == "noise":
+        assert gen_audio(signal) != audio
+        assert gen_audio(signal) == gen_audio(signal)  # Deterministic
+        assert gen_audio(signal._replace(seed=1)) != gen_audio(signal)
+    else:
+        assert gen_audio(signal) == audio
+
+
+def test_iter_chunks() -> None:
+    signal = Signal(1000, waveform="saw")
+    chunks = list(iter_chunks(signal, chunk_frames=300))
+    assert [len(chunk) for chunk in chunks] == [600, 600, 600, 200]
+    assert b"".join(chunks) == gen_audio(signal)
+    assert gen_audio(Signal(0)) == b""
+
+    with pytest.raises(AssertionError):
+        iter_chunks(Signal(1000, waveform="pulse"))
+    with pytest.raises(AssertionError):
+        iter_chunks(Signal(1000, amplitude=32768))
+
+
+def test_write_wav(tmp_path: pathlib.Path) -> None:
+    signal = Signal(frames_for(250), waveform="triangle", sweep_to=880.0)
+    write_wav(tmp_path / "sweep.wav", signal, chunk_frames=1000)
+    with wave.open(str(tmp_path / "sweep.wav"), "rb") as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate(), f.getnframes()) == (1, 2, 44100, 11025)
+        assert f.readframes(f.getnframes()) == gen_audio(signal)
+
+
+def test_main(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sys, "argv", ["genwav.py", "--output", str(tmp_path)])
+    main()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "test-10000ms.wav", "test-1000ms.wav", "test-10ms.wav", "test-250ms.wav", "test-5000ms.wav",
+    ]
+    with wave.open(str(tmp_path / "test-10ms.wav"), "rb") as f:
+        assert f.readframes(f.getnframes()) == get_audio(fixture_path("sample-test/1 test-10ms.pti"))
+
+    monkeypatch.setattr(sys, "argv", ["genwav.py", "--output", str(tmp_path), "--length", "2.5", "--prefix", "x"])
+    main()
+    with wave.open(str(tmp_path / "x-2.5ms.wav"), "rb") as f:
+        assert f.getnframes() == 110
@@ -0,0 +1,58 @@
+"""Tests for indexpti.py."""
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import shutil
+
+from indexpti import RefreshStats, open_index, refresh_index
+from inspectpti import HeaderOffset, HeaderStruct
+from ptifixtures import fixture_path
+
+
+def test_refresh_index(tmp_path: pathlib.Path) -> None:
+    library = tmp_path / "library"
+    shutil.copytree(fixture_path("playback-test"), library)
+    connection = open_index(tmp_path / "index.db")
+
+    assert refresh_index(connection, library) == RefreshStats(added=39, updated=0, removed=0, unchanged=0)
+    assert refresh_index(connection, library) == RefreshStats(added=0, updated=0, removed=0, unchanged=39)
+
+    row = connection.execute("SELECT * FROM pti WHERE path = ?", (str(library / "36 test.pti"),)).fetchone()
+    assert row["error"] is None
+    assert row["name"] == "test"
+    assert row["sample_playback"] == "GRANULAR"
+    assert row["granular_shape"] == "GAUSS"
+    assert row["filter_type"] == "DISABLED"
+    assert row["volume"] == 50
+    assert row["filter_cutoff"] == 1.0
+    row = connection.execute("SELECT slice_n FROM pti WHERE path = ?", (str(library / "24 test.pti"),)).fetchone()
+    assert json.loads(row["slice_n"]) == [int(65535 / 48 * n) for n in range(48)]
+
+    # Change the volume of an instrument (without changing its size)
+    changed = library / "2 test.pti"
+    data = bytearray(changed.read_bytes())
+    HeaderStruct.VOLUME.pack_into(data, HeaderOffset.VOLUME, 100)
+    changed.write_bytes(data)
+    os.utime(changed, ns=(0, 0))
+    (library / "3 test.pti").unlink()
+    (library / "new.pti").write_bytes(b"Not an instrument")
+
+    assert refresh_index(connection, library) == RefreshStats(added=1, updated=1, removed=1, unchanged=37)
+    row = connection.execute("SELECT volume FROM pti WHERE path = ?", (str(changed),)).fetchone()
+    assert row["volume"] == 100
+    row = connection.execute("SELECT * FROM pti WHERE path = ?", (str(library / "new.pti"),)).fetchone()
+    assert row["error"] is not None
+    assert row["volume"] is None
+
+
+def test_refresh_index_other_root(tmp_path: pathlib.Path) -> None:
+    shutil.copytree(fixture_path("sample-test"), tmp_path / "a")
+    shutil.copytree(fixture_path("sample-test"), tmp_path / "ab")
+    connection = open_index(":memory:")
+    assert refresh_index(connection, tmp_path / "a").added == 5
+    assert refresh_index(connection, tmp_path / "ab").added == 5
+    # Files in other roots are not removed
+    assert refresh_index(connection, tmp_path / "a") == RefreshStats(added=0, updated=0, removed=0, unchanged=5)
+    assert connection.execute("SELECT COUNT(*) FROM pti").fetchone()[0] == 10
@@ -0,0 +1,1091 @@
+"""Tests for inspectpti.py, using the test .pti files in this repository."""
+from __future__ import annotations
+
+import array
+import concurrent.futures
+import functools
+import io
+import json
+import os
+import pathlib
+import struct
+import subprocess
+import sys
+import zlib
+
+from collections.abc import Iterator
+from typing import Any, Callable
+
+import pytest
+
+import inspectpti
+import ptifixtures
+
+from inspectpti import (
+    AutomationLfoSteps,
+    AutomationLfoType,
+    CHECKSUM,
+    CHECKSUM_OFFSET,
+    DEFAULT_HEADER,
+    DescriptorCache,
+    FRAME_SIZE,
+    FilterType,
+    GranularLoopMode,
+    GranularShape,
+    HeaderOffset,
+    HeaderStruct,
+    InstrumentAutomation,
+    PTI_HEADER_LENGTH,
+    SamplePlayback,
+    ValidatedHeader,
+    VolumeLfoSteps,
+    _FIELD_DECODERS,
+    _unpack,
+    decode_header,
+    decode_headers,
+    diff_headers,
+    disable_metrics,
+    enable_metrics,
+    encode_header,
+    get_audio,
+    get_audio_array,
+    get_bit_depth,
+    get_cutoff_automation,
+    get_cutoff_lfo_amount,
+    get_cutoff_lfo_steps,
+    get_cutoff_lfo_type,
+    get_delay_send,
+    get_filter_cutoff,
+    get_filter_resonance,
+    get_filter_type,
+    get_finetune,
+    get_finetune_automation,
+    get_finetune_lfo_amount,
+    get_finetune_lfo_steps,
+    get_finetune_lfo_type,
+    get_granular_length,
+    get_granular_loop_mode,
+    get_granular_position,
+    get_granular_position_automation,
+    get_granular_position_lfo_amount,
+    get_granular_position_lfo_steps,
+    get_granular_position_lfo_type,
+    get_granular_shape,
+    get_header,
+    get_loop_end,
+    get_loop_start,
+    get_name,
+    get_num_slices,
+    get_overdrive,
+    get_panning,
+    get_panning_automation,
+    get_panning_lfo_amount,
+    get_panning_lfo_steps,
+    get_panning_lfo_type,
+    get_playback_end,
+    get_playback_start,
+    get_reverb_send,
+    get_sample_length,
+    get_sample_playback,
+    get_slice_adjust,
+    get_slices,
+    get_tune,
+    get_volume,
+    get_volume_automation,
+    get_volume_envelope_amount,
+    get_volume_envelope_attack,
+    get_volume_envelope_decay,
+    get_volume_envelope_release,
+    get_volume_envelope_sustain,
+    get_volume_lfo_amount,
+    get_volume_lfo_steps,
+    get_volume_lfo_type,
+    get_wavetable_position,
+    get_wavetable_position_automation,
+    get_wavetable_position_lfo_amount,
+    get_wavetable_position_lfo_steps,
+    get_wavetable_position_lfo_type,
+    get_wavetable_frames,
+    get_wavetable_mipmaps,
+    get_wavetable_total_positions,
+    get_wavetable_window_size,
+    header_checksum,
+    is_pti,
+    is_wavetable,
+    iter_audio,
+    map_pti,
+    patch_pti,
+    position_to_frame,
+    read_audio_range,
+    slice_arrays,
+    slice_audio,
+    slice_bounds,
+    wavetable_mipmaps,
+    write_pti,
+)
+from ptifixtures import default_audio, default_header, fixture_path, pti_headers, wav_audio
+
+
+def _test(func: Callable[[bytes], Any], header: bytes, expected: Any) -> None:
+    """Assert that calling func with the given header returns the expected value."""
+    assert (value := func(header)) == expected, f"{func=} => {value=} ({expected=})"
+
+
+def _test_decode_header(header: bytes) -> None:
+    """Assert that decode_header agrees with the individual getters."""
+    record = decode_header(header)
+    for field in HeaderOffset:
+        if field.name == "SLICE_N":
+            expected: Any = tuple(
+                HeaderStruct.SLICE_N.unpack_from(header, HeaderOffset.SLICE_N + 2 * n)[0] for n in range(48)
+            )
+        elif field.name in _FIELD_DECODERS:
+            expected = _FIELD_DECODERS[field.name](_unpack(header, field.name))
+        else:
+            expected = _unpack(header, field.name)
+        assert (value := getattr(record, field.name.lower())) == expected, f"{field=} => {value=} ({expected=})"
+
+
+def _field_sizes() -> list[tuple[int, int]]:
+    """Return the offset and size of every known header value."""
+    sizes = []
+    for field in HeaderOffset:
+        size = HeaderStruct[field.name].size
+        sizes.append((int(field), size * 48 if field.name == "SLICE_N" else size))
+    return sizes
+
+
+def test_import_has_no_side_effects(tmp_path: pathlib.Path) -> None:
+    # Importing from outside the fixture tree must not read any of the test files
+    script = "import sys, inspectpti; assert 'ptifixtures' not in sys.modules"
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=tmp_path, env=env)
+
+
+def test_import_without_numpy(tmp_path: pathlib.Path) -> None:
+    # NumPy takes longer to import than inspectpti, only import it when it is needed
+    script = "import sys, inspectpti; assert 'numpy' not in sys.modules; inspectpti.HEADER_DTYPE"
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=tmp_path, env=env)
+    assert inspectpti.HEADER_DTYPE is None or len(inspectpti.HEADER_DTYPE.names) == len(HeaderOffset)
+
+
+def test_get_audio() -> None:
+    assert default_audio() == wav_audio()
+
+
+def test_get_audio_zero_copy() -> None:
+    path = pathlib.Path(fixture_path("test.pti"))
+    data = path.read_bytes()
+    with map_pti(path) as mapped:
+        buffers: list[Any] = [path, mapped, bytearray(data), memoryview(data)]
+        for buffer in buffers:
+            assert get_header(buffer) == default_header(), type(buffer)
+            assert isinstance(audio := get_audio(buffer), memoryview), type(buffer)
+            with audio:
+                assert audio == default_audio(), type(buffer)
+        with get_audio(mapped) as audio:
+            assert audio.obj is mapped
+
+
+def test_map_pti_empty(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "empty.pti").write_bytes(b"")
+    with pytest.raises(AssertionError, match="Empty file"):
+        map_pti(tmp_path / "empty.pti")
+
+
+def test_get_audio_array() -> None:
+    expected = struct.unpack(f"<{len(wav_audio()) // 2}h", wav_audio())
+    samples = get_audio_array(fixture_path("test.pti"))
+    assert tuple(samples) == expected
+
+
+def test_get_audio_array_without_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(inspectpti, "numpy", None)
+    samples = get_audio_array(pathlib.Path(fixture_path("test.pti")).read_bytes())
+    assert isinstance(samples, array.array)
+    assert tuple(samples) == struct.unpack(f"<{len(samples)}h", default_audio())
+
+
+def test_iter_audio() -> None:
+    path = fixture_path("sample-test/5 test-10000ms.pti")
+    data = pathlib.Path(path).read_bytes()
+    with open(path, "rb") as f, map_pti(path) as mapped:
+        buffers: list[Any] = [path, pathlib.Path(path), f, data, memoryview(data), mapped]
+        for buffer in buffers:
+            chunks = [bytes(chunk) for chunk in iter_audio(buffer, frames_per_chunk=4096)]
+            assert {len(chunk) for chunk in chunks[:-1]} == {4096 * 2}, type(buffer)
+            assert b"".join(chunks) == data[PTI_HEADER_LENGTH:], type(buffer)
+
+
+def test_iter_audio_reuses_buffer() -> None:
+    chunks = list(iter_audio(fixture_path("sample-test/3 test-1000ms.pti"), frames_per_chunk=1024))
+    assert len(chunks) == 44
+    assert len({id(chunk.obj) for chunk in chunks}) == 1
+
+
+def test_iter_audio_sample_length() -> None:
+    data = bytearray(pathlib.Path(fixture_path("sample-test/2 test-250ms.pti")).read_bytes())
+    HeaderStruct.SAMPLE_LENGTH.pack_into(data, HeaderOffset.SAMPLE_LENGTH, 1)
+    with pytest.raises(AssertionError):
+        list(iter_audio(data))
+
+
+def test_iter_audio_truncated() -> None:
+    data = pathlib.Path(fixture_path("sample-test/2 test-250ms.pti")).read_bytes()
+    chunks = iter_audio(io.BufferedReader(io.BytesIO(data[:-FRAME_SIZE])), frames_per_chunk=1024)
+    with pytest.raises(AssertionError):
+        next(chunks)
+
+
+def test_get_audio_array_numpy() -> None:
+    numpy = pytest.importorskip("numpy")
+    samples = get_audio_array(pathlib.Path(fixture_path("test.pti")))
+    assert samples.dtype == numpy.dtype("<i2")
+    assert not samples.flags.writeable
+    assert samples.tobytes() == default_audio()
+
+
+def test_get_name() -> None:
+    _test(get_name, default_header(), "test")
+    _test(get_name, pti_headers["instrument_name"], "ABCDEFGHIJKLMNOPQRSTUVWXYZabcde")
+
+
+def test_get_sample_length() -> None:
+    _test(get_sample_length, default_header(), 0)
+    _test(get_sample_length, pti_headers["10ms"], 10 * 44.1)
+    _test(get_sample_length, pti_headers["250ms"], 250 * 44.1)
+    _test(get_sample_length, pti_headers["1000ms"], 1000 * 44.1)
+    _test(get_sample_length, pti_headers["5000ms"], 5000 * 44.1)
+    _test(get_sample_length, pti_headers["10000ms"], 10000 * 44.1)
+
+
+def test_get_volume() -> None:
+    _test(get_volume, default_header(), 50)
+    _test(get_volume, pti_headers["volume_null"], 0)
+    _test(get_volume, pti_headers["volume_min"], 1)
+    _test(get_volume, pti_headers["volume_max"], 100)
+
+
+def test_get_panning() -> None:
+    _test(get_panning, default_header(), 50)
+    _test(get_panning, pti_headers["panning_min"], 0)
+    _test(get_panning, pti_headers["panning_max"], 100)
+
+
+def test_get_tune() -> None:
+    _test(get_tune, default_header(), 0)
+    _test(get_tune, pti_headers["tune_min"], -24)
+    _test(get_tune, pti_headers["tune_max"], 24)
+    _test(get_tune, pti_headers["tune_neg12"], -12)
+
+
+def test_get_finetune() -> None:
+    _test(get_finetune, default_header(), 0)
+    _test(get_finetune, pti_headers["finetune_min"], -100)
+    _test(get_finetune, pti_headers["finetune_max"], 100)
+
+
+def test_get_filter_cutoff() -> None:
+    _test(get_filter_cutoff, default_header(), 1.0)
+    _test(get_filter_cutoff, pti_headers["lp_100_0"], 1.0)
+    _test(get_filter_cutoff, pti_headers["hp_100_0"], 1.0)
+    _test(get_filter_cutoff, pti_headers["lp_50_0"], 0.5000002384185791)
+    _test(get_filter_cutoff, pti_headers["hp_50_0"], 0.5000002384185791)
+    _test(get_filter_cutoff, pti_headers["lp_0_0"], 0.0)
+    _test(get_filter_cutoff, pti_headers["hp_0_0"], 0.0)
+    _test(get_filter_cutoff, pti_headers["lp_100_100"], 1.0)
+    _test(get_filter_cutoff, pti_headers["hp_100_100"], 1.0)
+
+
+def test_get_filter_resonance() -> None:
+    _test(get_filter_resonance, default_header(), 0.0)
+    _test(get_filter_resonance, pti_headers["lp_100_100"], 4.300000190734863)
+    _test(get_filter_resonance, pti_headers["hp_100_100"], 4.300000190734863)
+    _test(get_filter_resonance, pti_headers["lp_100_50"], 2.150000810623169)
+    _test(get_filter_resonance, pti_headers["hp_100_50"], 2.1929996013641357)
+    _test(get_filter_resonance, pti_headers["lp_100_0"], 0.0)
+    _test(get_filter_resonance, pti_headers["hp_100_0"], 0.0)
+    _test(get_filter_resonance, pti_headers["lp_0_50"], 2.1929996013641357)
+    _test(get_filter_resonance, pti_headers["hp_0_50"], 2.192999839782715)
+
+
+def test_get_filter_type() -> None:
+    _test(get_filter_type, default_header(), FilterType.DISABLED)
+    for key in [
+        "filter_lp",
+        "lp_100_0",
+        "lp_50_0",
+        "lp_0_0",
+        "lp_100_100",
+        "lp_100_50",
+        "lp_50_50",
+        "lp_0_100",
+        "lp_0_50",
+    ]:
+        _test(get_filter_type, pti_headers[key], FilterType.LOW_PASS)
+    for key in [
+        "filter_hp",
+        "hp_100_0",
+        "hp_50_0",
+        "hp_0_0",
+        "hp_100_100",
+        "hp_100_50",
+        "hp_50_50",
+        "hp_0_100",
+        "hp_0_50",
+    ]:
+        _test(get_filter_type, pti_headers[key], FilterType.HIGH_PASS)
+    _test(get_filter_type, pti_headers["filter_bp"], FilterType.BAND_PASS)
+
+
+def test_get_overdrive() -> None:
+    _test(get_overdrive, default_header(), 0)
+    _test(get_overdrive, pti_headers["overdrive"], 100)
+
+
+def test_get_bit_depth() -> None:
+    _test(get_bit_depth, default_header(), 16)
+    _test(get_bit_depth, pti_headers["bit_depth"], 4)
+
+
+def test_get_delay_send() -> None:
+    _test(get_delay_send, default_header(), 0)
+    _test(get_delay_send, pti_headers["delay_min"], 1)
+    _test(get_delay_send, pti_headers["delay_max"], 100)
+
+
+def test_get_reverb_send() -> None:
+    _test(get_reverb_send, default_header(), 0)
+    _test(get_reverb_send, pti_headers["reverb_min"], 1)
+    _test(get_reverb_send, pti_headers["reverb_max"], 100)
+
+
+def test_get_sample_playback() -> None:
+    _test(get_sample_playback, default_header(), SamplePlayback.ONE_SHOT)
+    _test(get_sample_playback, pti_headers["loop_fwd"], SamplePlayback.FORWARD_LOOP)
+    _test(get_sample_playback, pti_headers["loop_bkwd"], SamplePlayback.BACKWARD_LOOP)
+    _test(get_sample_playback, pti_headers["loop_pingpong"], SamplePlayback.PINGPONG_LOOP)
+    _test(get_sample_playback, pti_headers["play_slice"], SamplePlayback.SLICE)
+    _test(get_sample_playback, pti_headers["play_beat_slice"], SamplePlayback.BEAT_SLICE)
+    _test(get_sample_playback, pti_headers["play_wavetable"], SamplePlayback.WAVETABLE)
+    _test(get_sample_playback, pti_headers["play_granular"], SamplePlayback.GRANULAR)
+
+
+def test_get_volume_automation() -> None:
+    _test(get_volume_automation, default_header(), InstrumentAutomation.ENVELOPE)
+    _test(
+        get_volume_automation,
+        pti_headers["volume_automation_off"],
+        InstrumentAutomation.OFF,
+    )
+    _test(
+        get_volume_automation,
+        pti_headers["volume_automation_lfo"],
+        InstrumentAutomation.LFO,
+    )
+
+
+def test_get_panning_automation() -> None:
+    _test(get_panning_automation, default_header(), InstrumentAutomation.OFF)
+    _test(
+        get_panning_automation,
+        pti_headers["panning_automation_envelope"],
+        InstrumentAutomation.ENVELOPE,
+    )
+    _test(
+        get_panning_automation,
+        pti_headers["panning_automation_lfo"],
+        InstrumentAutomation.LFO,
+    )
+
+
+def test_get_cutoff_automation() -> None:
+    _test(get_cutoff_automation, default_header(), InstrumentAutomation.OFF)
+    _test(
+        get_cutoff_automation,
+        pti_headers["cutoff_automation_envelope"],
+        InstrumentAutomation.ENVELOPE,
+    )
+    _test(
+        get_cutoff_automation,
+        pti_headers["cutoff_automation_lfo"],
+        InstrumentAutomation.LFO,
+    )
+
+
+def test_get_wavetable_position_automation() -> None:
+    _test(get_wavetable_position_automation, default_header(), InstrumentAutomation.OFF)
+    _test(
+        get_wavetable_position_automation,
+        pti_headers["wavetable_automation_envelope"],
+        InstrumentAutomation.ENVELOPE,
+    )
+    _test(
+        get_wavetable_position_automation,
+        pti_headers["wavetable_automation_lfo"],
+        InstrumentAutomation.LFO,
+    )
+
+
+def test_get_granular_position_automation() -> None:
+    _test(get_granular_position_automation, default_header(), InstrumentAutomation.OFF)
+    _test(
+        get_granular_position_automation,
+        pti_headers["granular_pos_automation_envelope"],
+        InstrumentAutomation.ENVELOPE,
+    )
+    _test(
+        get_granular_position_automation,
+        pti_headers["granular_pos_automation_lfo"],
+        InstrumentAutomation.LFO,
+    )
+
+
+def test_get_finetune_automation() -> None:
+    _test(get_finetune_automation, default_header(), InstrumentAutomation.OFF)
+    _test(
+        get_finetune_automation,
+        pti_headers["finetune_envelope"],
+        InstrumentAutomation.ENVELOPE,
+    )
+    _test(get_finetune_automation, pti_headers["finetune_lfo"], InstrumentAutomation.LFO)
+
+
+def test_get_volume_envelope_amount() -> None:
+    _test(get_volume_envelope_amount, default_header(), 1.0)
+    _test(get_volume_envelope_amount, pti_headers["vol_env_amount_50"], 0.5000003576278687)
+    _test(get_volume_envelope_amount, pti_headers["vol_env_amount_0"], 0.0)
+
+
+def test_get_volume_envelope_attack() -> None:
+    _test(get_volume_envelope_attack, default_header(), 0)
+    _test(get_volume_envelope_attack, pti_headers["vol_env_attack_10"], 10000)
+    _test(get_volume_envelope_attack, pti_headers["vol_env_attack_5"], 5000)
+
+
+def test_get_volume_envelope_decay() -> None:
+    _test(get_volume_envelope_decay, default_header(), 0)
+    _test(get_volume_envelope_decay, pti_headers["vol_env_decay_10"], 10000)
+    _test(get_volume_envelope_decay, pti_headers["vol_env_decay_5"], 5000)
+
+
+def test_get_volume_envelope_sustain() -> None:
+    _test(get_volume_envelope_sustain, default_header(), 1.0)
+    _test(get_volume_envelope_sustain, pti_headers["vol_env_sustain_50"], 0.5000001788139343)
+    _test(get_volume_envelope_sustain, pti_headers["vol_env_sustain_0"], 0)
+
+
+def test_get_volume_envelope_release() -> None:
+    _test(get_volume_envelope_release, default_header(), 1000)
+    _test(get_volume_envelope_release, pti_headers["vol_env_release_10"], 10000)
+    _test(get_volume_envelope_release, pti_headers["vol_env_release_0"], 0)
+
+
+def test_get_volume_lfo_type() -> None:
+    _test(get_volume_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(get_volume_lfo_type, pti_headers["vol_lfo_rev_saw"], AutomationLfoType.REV_SAW)
+    _test(get_volume_lfo_type, pti_headers["vol_lfo_saw"], AutomationLfoType.SAW)
+    _test(get_volume_lfo_type, pti_headers["vol_lfo_square"], AutomationLfoType.SQUARE)
+    _test(get_volume_lfo_type, pti_headers["vol_lfo_random"], AutomationLfoType.RANDOM)
+
+
+def test_get_volume_lfo_steps() -> None:
+    _test(get_volume_lfo_steps, default_header(), VolumeLfoSteps.S_24)
+    _test(get_volume_lfo_steps, pti_headers["vol_lfo_16_steps"], VolumeLfoSteps.S_16)
+    _test(get_volume_lfo_steps, pti_headers["vol_lfo_6_steps"], VolumeLfoSteps.S_6)
+    _test(get_volume_lfo_steps, pti_headers["vol_lfo_3_2_steps"], VolumeLfoSteps.S_3_2)
+    _test(get_volume_lfo_steps, pti_headers["vol_lfo_1_64_steps"], VolumeLfoSteps.S_1_64)
+
+
+def test_get_volume_lfo_amount() -> None:
+    _test(get_volume_lfo_amount, default_header(), 0.5)
+    _test(get_volume_lfo_amount, pti_headers["vol_lfo_amount_0"], 0.0)
+    _test(get_volume_lfo_amount, pti_headers["vol_lfo_amount_100"], 1.0)
+
+
+def test_get_panning_lfo_type() -> None:
+    _test(get_panning_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(get_panning_lfo_type, pti_headers["pan_lfo_rev_saw"], AutomationLfoType.REV_SAW)
+    _test(get_panning_lfo_type, pti_headers["pan_lfo_rev_random"], AutomationLfoType.RANDOM)
+
+
+def test_get_panning_lfo_steps() -> None:
+    _test(get_panning_lfo_steps, default_header(), AutomationLfoSteps.S_128)
+    _test(get_panning_lfo_steps, pti_headers["pan_lfo_1_48_step"], AutomationLfoSteps.S_1_48)
+    _test(get_panning_lfo_steps, pti_headers["pan_lfo_1_128_steps"], AutomationLfoSteps.S_128)
+    _test(get_panning_lfo_steps, pti_headers["pan_lfo_24_steps"], AutomationLfoSteps.S_24)
+
+
+def test_get_panning_lfo_amount() -> None:
+    _test(get_panning_lfo_amount, default_header(), 0.5)
+    _test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_80"], 0.7999998331069946)
+    _test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_66"], 0.6599998474121094)
+    _test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_25"], 0.25000011920928955)
+    _test(get_panning_lfo_amount, pti_headers["pan_lfo_amount_10"], 0.10000001639127731)
+
+
+def test_get_cutoff_lfo_type() -> None:
+    _test(get_cutoff_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(
+        get_cutoff_lfo_type,
+        pti_headers["cutoff_lfo_square_96_steps_amount38"],
+        AutomationLfoType.SQUARE,
+    )
+
+
+def test_get_cutoff_lfo_steps() -> None:
+    _test(get_cutoff_lfo_steps, default_header(), AutomationLfoSteps.S_128)
+    _test(
+        get_cutoff_lfo_steps,
+        pti_headers["cutoff_lfo_square_96_steps_amount38"],
+        AutomationLfoSteps.S_96,
+    )
+
+
+def test_get_cutoff_lfo_amount() -> None:
+    _test(get_cutoff_lfo_amount, default_header(), 0.5)
+    _test(
+        get_cutoff_lfo_amount,
+        pti_headers["cutoff_lfo_square_96_steps_amount38"],
+        0.3800000250339508,
+    )
+
+
+def test_get_wavetable_position_lfo_type() -> None:
+    _test(get_wavetable_position_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(
+        get_wavetable_position_lfo_type,
+        pti_headers["wavetable_lfo_random_2_steps_amount_8"],
+        AutomationLfoType.RANDOM,
+    )
+
+
+def test_get_wavetable_position_lfo_steps() -> None:
+    _test(get_wavetable_position_lfo_steps, default_header(), AutomationLfoSteps.S_128)
+    _test(
+        get_wavetable_position_lfo_steps,
+        pti_headers["wavetable_lfo_random_2_steps_amount_8"],
+        AutomationLfoSteps.S_2,
+    )
+
+
+def test_get_wavetable_position_lfo_amount() -> None:
+    _test(get_wavetable_position_lfo_amount, default_header(), 0.5)
+    _test(
+        get_wavetable_position_lfo_amount,
+        pti_headers["wavetable_lfo_random_2_steps_amount_8"],
+        0.08000002056360245,
+    )
+
+
+def test_get_granular_position_lfo_type() -> None:
+    _test(get_granular_position_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(
+        get_granular_position_lfo_type,
+        pti_headers["granular_lfo_saw_32_steps_amount_90"],
+        AutomationLfoType.SAW,
+    )
+
+
+def test_get_granular_position_lfo_steps() -> None:
+    _test(get_granular_position_lfo_steps, default_header(), AutomationLfoSteps.S_128)
+    _test(
+        get_granular_position_lfo_steps,
+        pti_headers["granular_lfo_saw_32_steps_amount_90"],
+        AutomationLfoSteps.S_32,
+    )
+
+
+def test_get_granular_position_lfo_amount() -> None:
+    _test(get_granular_position_lfo_amount, default_header(), 0.5)
+    _test(
+        get_granular_position_lfo_amount,
+        pti_headers["granular_lfo_saw_32_steps_amount_90"],
+        0.8999996185302734,
+    )
+
+
+def test_get_finetune_lfo_type() -> None:
+    _test(get_finetune_lfo_type, default_header(), AutomationLfoType.TRIANGLE)
+    _test(
+        get_finetune_lfo_type,
+        pti_headers["finetune_lfo_square_3_steps_amount_100"],
+        AutomationLfoType.SQUARE,
+    )
+
+
+def test_get_finetune_lfo_steps() -> None:
+    _test(get_finetune_lfo_steps, default_header(), AutomationLfoSteps.S_128)
+    _test(
+        get_finetune_lfo_steps,
+        pti_headers["finetune_lfo_square_3_steps_amount_100"],
+        AutomationLfoSteps.S_3,
+    )
+
+
+def test_get_finetune_lfo_amount() -> None:
+    _test(get_finetune_lfo_amount, default_header(), 0.5)
+    _test(get_finetune_lfo_amount, pti_headers["finetune_lfo_square_3_steps_amount_100"], 1.0)
+
+
+def test_get_playback_start() -> None:
+    _test(get_playback_start, default_header(), 0)
+
+
+def test_get_loop_start() -> None:
+    _test(get_loop_start, default_header(), 1)
+
+
+def test_get_loop_end() -> None:
+    _test(get_loop_end, default_header(), 65534)
+
+
+def test_get_playback_end() -> None:
+    _test(get_playback_end, default_header(), 65535)
+
+
+def test_get_slice_adjust() -> None:
+    for n in range(1, 49):
+        _test(functools.partial(get_slice_adjust, nslice=n), default_header(), 0)
+    for n in range(1, 49):
+        _test(
+            functools.partial(get_slice_adjust, nslice=n),
+            pti_headers["48-slices"],
+            int(65535 / 48 * (n - 1)),
+        )
+
+
+def test_get_slices() -> None:
+    _test(get_slices, default_header(), ())
+    _test(get_slices, pti_headers["slice-1-2-adjust-0025-2-2-adjust-008"], (6540, 20886))
+    _test(get_slices, pti_headers["48-slices"], decode_header(pti_headers["48-slices"]).slice_n)
+    with pytest.raises(AssertionError):
+        get_slices(bytes(encode_header(num_slices=2, slice_n=[1000, 10] + [0] * 46)))
+
+
+def test_slice_bounds() -> None:
+    header = pti_headers["slice-1-2-adjust-0025-2-2-adjust-008"]
+    assert slice_bounds(header, 11025) == [(1100, 3513), (3513, 11025)]
+    assert slice_bounds(default_header(), 11025) == []
+    bounds = slice_bounds(pti_headers["48-slices"], 65535)
+    assert [start for start, _ in bounds] == list(get_slices(pti_headers["48-slices"]))
+    assert bounds[-1][1] == 65535
+    assert position_to_frame(65535, 11025) == 11025
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_slice_audio(monkeypatch: pytest.MonkeyPatch, numpy: bool) -> None:
+    if not numpy:
+        monkeypatch.setattr(inspectpti, "numpy", None)
+    path = ptifixtures.FIXTURE_PATHS["48-slices"]
+    data = pathlib.Path(fixture_path(path)).read_bytes()
+    frames = (len(data) - PTI_HEADER_LENGTH) // FRAME_SIZE
+    bounds = slice_bounds(get_header(data), frames)
+    for value in (fixture_path(path), pathlib.Path(fixture_path(path)), data, bytearray(data)):
+        views = slice_audio(value)
+        assert len(views) == 48
+        assert b"".join(views) == data[PTI_HEADER_LENGTH + bounds[0][0] * FRAME_SIZE:]
+        assert all(isinstance(view, memoryview) for view in views)
+    arrays = slice_arrays(fixture_path(path))
+    assert [len(samples) for samples in arrays] == [stop - start for start, stop in bounds]
+    assert b"".join(samples.tobytes() for samples in arrays) == b"".join(views)
+    if numpy:
+        assert all(not samples.flags.writeable for samples in arrays)
+    assert slice_audio(fixture_path("test.pti")) == []
+
+
+def test_get_num_slices() -> None:
+    _test(get_num_slices, default_header(), 0)
+    _test(get_num_slices, pti_headers["slice-1-2-adjust-0025-2-2-adjust-008"], 2)
+    _test(get_num_slices, pti_headers["48-slices"], 48)
+
+
+def test_is_wavetable() -> None:
+    _test(is_wavetable, default_header(), False)
+    _test(is_wavetable, pti_headers["wavetable_window_1024_position_1"], True)
+    _test(is_wavetable, pti_headers["wavetable_window_32_position_343"], True)
+    _test(is_wavetable, pti_headers["wavetable_window_1024_position_9"], True)
+    _test(is_wavetable, pti_headers["loop_fwd"], False)
+    _test(is_wavetable, pti_headers["loop_bkwd"], False)
+    _test(is_wavetable, pti_headers["loop_pingpong"], False)
+    _test(is_wavetable, pti_headers["play_slice"], False)
+    _test(is_wavetable, pti_headers["play_beat_slice"], False)
+    _test(is_wavetable, pti_headers["play_wavetable"], True)
+    _test(is_wavetable, pti_headers["play_granular"], False)
+
+
+def test_get_wavetable_window_size() -> None:
+    _test(get_wavetable_window_size, default_header(), 2048)
+    _test(get_wavetable_window_size, pti_headers["wavetable_window_1024_position_1"], 1024)
+    _test(get_wavetable_window_size, pti_headers["wavetable_window_32_position_343"], 32)
+    _test(get_wavetable_window_size, pti_headers["wavetable_window_1024_position_9"], 1024)
+    _test(get_wavetable_window_size, pti_headers["wavetable_window_512"], 512)
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_get_wavetable_frames(monkeypatch: pytest.MonkeyPatch, numpy: bool) -> None:
+    if not numpy:
+        monkeypatch.setattr(inspectpti, "numpy", None)
+    path = fixture_path(ptifixtures.FIXTURE_PATHS["wavetable_window_1024_position_9"])
+    samples = get_audio_array(path)
+    for value in (path, pathlib.Path(path), pathlib.Path(path).read_bytes()):
+        frames = get_wavetable_frames(value)
+        assert frames.shape == (10, 1024)
+        # The last 801 frames are not part of the wavetable
+        assert [frames[9, n] for n in range(1024)] == list(samples[9216:10240])
+        assert frames[1, 0] == samples[1024]
+    with pytest.raises(AssertionError):
+        get_wavetable_frames(fixture_path("test.pti"))
+
+
+def test_wavetable_mipmaps() -> None:
+    numpy = pytest.importorskip("numpy")
+    path = fixture_path(ptifixtures.FIXTURE_PATHS["wavetable_window_32_position_343"])
+    frames = get_wavetable_frames(path)
+    mipmaps = wavetable_mipmaps(frames)
+    assert mipmaps.shape == (5, 344, 32)
+    assert numpy.allclose(mipmaps[0], frames / 32768, atol=1e-6)
+    spectrum = numpy.abs(numpy.fft.rfft(mipmaps, axis=2))
+    for level, harmonics in enumerate([16, 8, 4, 2, 1]):
+        assert spectrum[level, :, harmonics + 1:].max(initial=0) < 1e-4
+    assert wavetable_mipmaps(frames, levels=2).shape == (2, 344, 32)
+    with pytest.raises(AssertionError):
+        wavetable_mipmaps(frames, levels=6)
+
+    cached = get_wavetable_mipmaps(path)
+    assert numpy.array_equal(cached, mipmaps)
+    assert not cached.flags.writeable
+    assert get_wavetable_mipmaps(pathlib.Path(path)) is cached
+
+
+def test_wavetable_mipmaps_without_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(inspectpti, "numpy", None)
+    with pytest.raises(ImportError):
+        wavetable_mipmaps([[0] * 32])
+
+
+def test_get_wavetable_total_positions() -> None:
+    _test(get_wavetable_total_positions, default_header(), 0)
+    _test(get_wavetable_total_positions, pti_headers["wavetable_window_1024_position_1"], 10)
+    _test(get_wavetable_total_positions, pti_headers["wavetable_window_32_position_343"], 344)
+
+
+def test_get_wavetable_position() -> None:
+    _test(get_wavetable_position, default_header(), 0)
+    _test(get_wavetable_position, pti_headers["wavetable_window_1024_position_1"], 1)
+    _test(get_wavetable_position, pti_headers["wavetable_window_32_position_343"], 343)
+    _test(get_wavetable_position, pti_headers["wavetable_window_1024_position_9"], 9)
+
+
+def test_get_granular_shape() -> None:
+    _test(get_granular_shape, default_header(), GranularShape.SQUARE)
+    _test(get_granular_shape, pti_headers["granular_shape_triangle"], GranularShape.TRIANGLE)
+    _test(get_granular_shape, pti_headers["granular_shape_gauss"], GranularShape.GAUSS)
+
+
+def test_get_granular_loop_mode() -> None:
+    _test(get_granular_loop_mode, default_header(), GranularLoopMode.FORWARD)
+    _test(
+        get_granular_loop_mode,
+        pti_headers["granular_loop_backward"],
+        GranularLoopMode.BACKWARD,
+    )
+    _test(
+        get_granular_loop_mode,
+        pti_headers["granular_loop_pingpong"],
+        GranularLoopMode.PINGPONG,
+    )
+
+
+def test_get_granular_position() -> None:
+    _test(get_granular_position, default_header(), 0)
+    _test(get_granular_position, pti_headers["granular_position_250_max_lenght_20"], 65535)
+
+
+def test_get_granular_length() -> None:
+    _test(get_granular_length, default_header(), int(0.01 * 44100))
+    _test(get_granular_length, pti_headers["granular_lenght_1_min"], int(0.001 * 44100))
+    _test(get_granular_length, pti_headers["granular_lenght_250_max"], int(0.25 * 44100))
+    _test(get_granular_length, pti_headers["granular_position_250_max_lenght_20"], int(0.02 * 44100) - 1)
+    _test(get_granular_length, pti_headers["10ms"], int(0.005 * 44100))
+    _test(get_granular_length, pti_headers["250ms"], int(0.02 * 44100) - 1)
+    _test(get_granular_length, pti_headers["1000ms"], int(0.1 * 44100) + 2)
+    _test(get_granular_length, pti_headers["5000ms"], 44100)
+    _test(get_granular_length, pti_headers["10000ms"], 44100)
+
+
+def test_decode_header() -> None:
+    _test_decode_header(default_header())
+    for header in pti_headers.values():
+        _test_decode_header(header)
+
+    _test(lambda header: decode_header(header).name, default_header(), "test")
+    _test(lambda header: decode_header(header).volume, pti_headers["volume_max"], 100)
+    _test(lambda header: decode_header(header).filter_type, pti_headers["filter_bp"], FilterType.BAND_PASS)
+    _test(lambda header: decode_header(header).sample_playback, pti_headers["play_granular"], SamplePlayback.GRANULAR)
+    _test(lambda header: decode_header(header).slice_n[47], pti_headers["48-slices"], int(65535 / 48 * 47))
+
+
+def test_validated_header() -> None:
+    _test(is_pti, ValidatedHeader(default_header()), True)
+    _test(get_volume, ValidatedHeader(pti_headers["volume_max"]), 100)
+    _test(get_name, ValidatedHeader(pti_headers["instrument_name"]), "ABCDEFGHIJKLMNOPQRSTUVWXYZabcde")
+    _test(decode_header, ValidatedHeader(pti_headers["filter_bp"]), decode_header(pti_headers["filter_bp"]))
+    _test(get_volume, ValidatedHeader(b"\x00" * PTI_HEADER_LENGTH, trusted=True), 0)
+    with pytest.raises(AssertionError):
+        ValidatedHeader(b"\x00" * PTI_HEADER_LENGTH)
+
+
+def test_decode_headers() -> None:
+    numpy = pytest.importorskip("numpy")
+    keys = list(pti_headers)
+    headers = decode_headers(pti_headers[key] for key in keys)
+    assert headers.shape == (len(keys),)
+    assert headers.dtype.itemsize == PTI_HEADER_LENGTH
+    assert headers.view(numpy.uint8).reshape(-1, PTI_HEADER_LENGTH).tobytes() == b"".join(pti_headers.values())
+
+    for key, header in zip(keys, headers):
+        expected = decode_header(pti_headers[key])
+        assert header["name"].decode("ascii") == expected.name
+        assert header["volume"] == expected.volume
+        assert header["tune"] == expected.tune
+        assert header["sample_length"] == expected.sample_length
+        assert header["filter_cutoff"] == numpy.float32(expected.filter_cutoff)
+        assert SamplePlayback(header["sample_playback"]) == expected.sample_playback
+        assert FilterType(header["filter_type"].ljust(2, b"\x00")) == expected.filter_type
+        assert tuple(header["slice_n"]) == expected.slice_n
+
+    records = [decode_header(pti_headers[key]) for key in keys]
+    granular = headers["sample_playback"] == SamplePlayback.GRANULAR
+    assert numpy.count_nonzero(granular) == 13
+    assert granular.tolist() == [record.sample_playback == SamplePlayback.GRANULAR for record in records]
+    assert [keys[i] for i in numpy.flatnonzero(headers["reverb_send"] > 50)] == ["reverb_max"]
+    high_pass = headers["filter_type"] == FilterType.HIGH_PASS.value
+    assert high_pass.tolist() == [record.filter_type == FilterType.HIGH_PASS for record in records]
+
+
+def test_pread() -> None:
+    path = fixture_path("sample-test/3 test-1000ms.pti")
+    data = pathlib.Path(path).read_bytes()
+    with open(path, "rb") as f:
+        fd = f.fileno()
+        assert get_header(fd) == data[:PTI_HEADER_LENGTH]
+        assert get_audio(fd) == data[PTI_HEADER_LENGTH:]
+        assert read_audio_range(fd, 100, 10) == data[PTI_HEADER_LENGTH + 200:PTI_HEADER_LENGTH + 220]
+        assert read_audio_range(fd, 44100 - 5, 10) == data[-10:]
+        assert read_audio_range(fd, 44100 + 5) == b""
+        assert f.tell() == 0
+    with pytest.raises(NotImplementedError):
+        get_header(True)
+    with pytest.raises(NotImplementedError):
+        get_audio(False)
+
+
+def test_pread_threads() -> None:
+    paths = [fixture_path(path) for path in ptifixtures.FIXTURE_PATHS.values()]
+    expected = {path: pathlib.Path(path).read_bytes() for path in paths}
+
+    def read(path: str, start: int) -> bool:
+        with cache.open(path) as fd:
+            header = get_header(fd)
+            audio = read_audio_range(fd, start, 64)
+        data = expected[path]
+        offset = PTI_HEADER_LENGTH + start * FRAME_SIZE
+        return header == data[:PTI_HEADER_LENGTH] and audio == data[offset:offset + 64 * FRAME_SIZE]
+
+    with DescriptorCache(maxsize=8) as cache, concurrent.futures.ThreadPoolExecutor(8) as executor:
+        jobs = [executor.submit(read, path, start) for start in range(0, 400, 7) for path in paths]
+        assert all(job.result() for job in jobs)
+        assert len(cache._fds) <= 8
+
+
+def test_encode_header() -> None:
+    assert encode_header() == DEFAULT_HEADER == default_header()
+    # Every test file has a valid checksum
+    for header in pti_headers.values():
+        assert CHECKSUM.unpack_from(header, CHECKSUM_OFFSET)[0] == header_checksum(header)
+    known = {offset for field, size in _field_sizes() for offset in range(field, field + size)}
+    for header in pti_headers.values():
+        record = decode_header(header)
+        assert encode_header(record, template=header) == header
+        # Only bytes that are not understood yet are copied from the template
+        encoded = encode_header(record)
+        assert [i for i in range(PTI_HEADER_LENGTH) if encoded[i] != header[i] and i in known] == []
+        assert decode_header(bytes(encoded)) == record
+
+
+def test_encode_header_fields() -> None:
+    header = encode_header(
+        decode_header(pti_headers["48-slices"]),
+        name="ABCDEFGHIJKLMNOPQRSTUVWXYZabcde",
+        volume=100,
+        filter_type=FilterType.BAND_PASS,
+        sample_playback=SamplePlayback.GRANULAR,
+        volume_lfo_steps=VolumeLfoSteps.S_1_64,
+    )
+    record = decode_header(bytes(header))
+    assert record.name == "ABCDEFGHIJKLMNOPQRSTUVWXYZabcde"
+    assert record.volume == 100
+    assert record.filter_type == FilterType.BAND_PASS
+    assert record.sample_playback == SamplePlayback.GRANULAR
+    assert record.volume_lfo_steps == VolumeLfoSteps.S_1_64
+    assert record.slice_n == decode_header(pti_headers["48-slices"]).slice_n
+    assert decode_header(bytes(encode_header(slice_n=[0] * 48))).slice_n == (0,) * 48
+    assert CHECKSUM.unpack_from(header, CHECKSUM_OFFSET)[0] == zlib.crc32(header[:388])
+    assert encode_header(volume=100)[CHECKSUM_OFFSET:] != DEFAULT_HEADER[CHECKSUM_OFFSET:]
+    with pytest.raises(AssertionError):
+        encode_header(volumes=100)
+    with pytest.raises(AssertionError):
+        encode_header(name="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdef")
+    # Values are checked by their getters
+    for fields in ({"volume": 200}, {"tune": -25}, {"num_slices": 2, "slice_n": [1000, 10] + [0] * 46}):
+        with pytest.raises(AssertionError):
+            encode_header(**fields)
+
+
+def test_encode_header_validators() -> None:
+    # Every field that has a getter (which checks the range of its value) is checked when it is encoded
+    names = [name for name, *_ in inspectpti._ENCODERS]
+    getters = {name: getattr(inspectpti, f"get_{name}") for name in names if hasattr(inspectpti, f"get_{name}")}
+    getters.update(is_wavetable=is_wavetable, slice_n=get_slices)
+    assert inspectpti._VALIDATORS == getters
+
+
+def test_write_pti(tmp_path: pathlib.Path) -> None:
+    source = pathlib.Path(fixture_path("sample-test/2 test-250ms.pti")).read_bytes()
+    header = encode_header(decode_header(source[:PTI_HEADER_LENGTH]), template=source[:PTI_HEADER_LENGTH])
+    write_pti(tmp_path / "test.pti", header, get_audio(memoryview(source)))
+    assert (tmp_path / "test.pti").read_bytes() == source
+    with pytest.raises(AssertionError):
+        write_pti(tmp_path / "test.pti", header, b"\x00\x00")
+
+
+def test_patch_pti(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "test.pti"
+    source = pathlib.Path(fixture_path("sample-test/3 test-1000ms.pti")).read_bytes()
+    path.write_bytes(source)
+
+    # Adjacent values (and values a few bytes apart) are written together
+    # The checksum (388-391) is written whenever a value changes
+    assert patch_pti(path, reverb_send=50, overdrive=10, volume=100, panning=0) == [(272, 277), (384, 392)]
+    assert patch_pti(path, name="patched") == [(21, 52), (388, 392)]
+    assert patch_pti(path, volume=100, name="patched") == []  # Unchanged
+    assert patch_pti(path, volume=0, panning=100, max_gap=0) == [(272, 273), (276, 277), (388, 392)]
+
+    data = path.read_bytes()
+    expected = encode_header(
+        template=source[:PTI_HEADER_LENGTH], name="patched", volume=0, panning=100, reverb_send=50, overdrive=10
+    )
+    assert data[:PTI_HEADER_LENGTH] == expected
+    assert CHECKSUM.unpack_from(data, CHECKSUM_OFFSET)[0] == header_checksum(data)
+    assert data[PTI_HEADER_LENGTH:] == source[PTI_HEADER_LENGTH:]
+
+
+def test_patch_pti_invalid(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "test.pti"
+    path.write_bytes(b"\x00" * 1024)
+    with pytest.raises(AssertionError):
+        patch_pti(path, volume=100)
+    assert path.read_bytes() == b"\x00" * 1024
+
+    source = pathlib.Path(fixture_path("test.pti")).read_bytes()
+    path.write_bytes(source)
+    with pytest.raises(AssertionError):
+        patch_pti(path, volume=200)
+    assert path.read_bytes() == source
+
+
+@pytest.fixture
+def metrics() -> Iterator[inspectpti.Metrics]:
+    yield enable_metrics()
+    disable_metrics()
+
+
+def test_metrics(metrics: inspectpti.Metrics) -> None:
+    path = fixture_path("sample-test/3 test-1000ms.pti")
+    get_header(path)
+    get_header(pathlib.Path(path))
+    get_audio(path)
+    get_audio(pathlib.Path(path))
+    get_header(ptifixtures.default_header())  # Not read from a file
+    header = get_header(path)
+    decode_header(header)
+    decode_header(ValidatedHeader(header, trusted=True))
+
+    values = metrics.snapshot()
+    assert values["get_header_bytes"] == 3 * PTI_HEADER_LENGTH
+    assert values["get_audio_bytes"] == 2 * 88200
+    assert values["is_pti_calls"] == 1
+    assert values["decode_seconds.sample_playback"] > 0
+    assert "decode_seconds.volume" not in values  # Not decoded, just unpacked
+    assert "enum_errors" not in values
+
+    invalid = encode_header(template=header)
+    invalid[HeaderOffset.GRANULAR_SHAPE] = 3
+    with pytest.raises(ValueError):
+        decode_header(ValidatedHeader(invalid, trusted=True))
+    values = metrics.snapshot()
+    assert values["enum_errors"] == values["enum_errors.granular_shape"] == 1
+
+    disable_metrics()
+    get_header(path)
+    assert metrics.snapshot() == values
+
+
+def test_metrics_callback() -> None:
+    events: list[tuple[str, float]] = []
+    try:
+        enable_metrics(lambda name, value: events.append((name, value)))
+        is_pti(ptifixtures.default_header())
+        get_header(fixture_path("test.pti"))
+    finally:
+        disable_metrics()
+    assert events == [("is_pti_calls", 1), ("get_header_bytes", PTI_HEADER_LENGTH)]
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_diff_headers(monkeypatch: pytest.MonkeyPatch, numpy: bool) -> None:
+    if not numpy:
+        monkeypatch.setattr(inspectpti, "numpy", None)
+    default = ptifixtures.default_header()
+    headers = {
+        "default": default,
+        "sustain": encode_header(template=default, volume_envelope_sustain=0.5),
+        "slices": encode_header(template=default, num_slices=2, slice_n=[0, 1000] + [0] * 46),
+        "unknown": default[:5] + b"\xff" + default[6:],
+        "name": encode_header(template=default, name="renamed"),
+    }
+    diff = diff_headers(headers, default, ignore=["NAME", "CHECKSUM"])
+    assert list(diff) == list(headers)
+    assert diff["default"] == diff["name"] == {}
+    # A multi-byte field is reported once, however many of its bytes changed
+    assert diff["sustain"] == {
+        "VOLUME_ENVELOPE_SUSTAIN": {"offset": 104, "size": 4, "baseline": 1.0, "value": 0.5},
+    }
+    assert diff["slices"] == {
+        "SLICE_N[2]": {"offset": 282, "size": 2, "baseline": 0, "value": 1000},
+        "NUM_SLICES": {"offset": 376, "size": 1, "baseline": 0, "value": 2},
+    }
+    assert diff["unknown"] == {"BYTE_5": {"offset": 5, "size": 1, "baseline": default[5], "value": 255}}
+
+    diff = diff_headers({"name": headers["name"], "filter": ptifixtures.pti_headers["filter_lp"]}, default)
+    assert diff["name"]["NAME"]["value"] == b"renamed".ljust(31, b"\x00").hex()
+    assert diff["name"]["CHECKSUM"]["value"] == header_checksum(headers["name"])
+    assert diff["filter"]["FILTER_TYPE"] == {"offset": 268, "size": 2, "baseline": "0000", "value": "0001"}
+    assert json.loads(json.dumps(diff)) == diff
+
+    with pytest.raises(AssertionError):
+        diff_headers({"short": default[:100]}, default)
+
+
+def test_diff_headers_library() -> None:
+    headers = dict(ptifixtures.pti_headers)
+    default = ptifixtures.default_header()
+    for key, fields in diff_headers(headers, default).items():
+        changed = {i for i, (value, expected) in enumerate(zip(headers[key], default)) if value != expected}
+        # Every changed byte is part of exactly one reported field, every reported field changed
+        ranges = [range(field["offset"], field["offset"] + field["size"]) for field in fields.values()]
+        assert changed == {i for offsets in ranges for i in offsets} & changed, key
+        assert all(changed.intersection(offsets) for offsets in ranges), key
+        assert sum(len(offsets) for offsets in ranges) == len({i for offsets in ranges for i in offsets}), key
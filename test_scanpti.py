@@ -0,0 +1,76 @@
+"""Tests for scanpti.py."""
+from __future__ import annotations
+
+import concurrent.futures
+import pathlib
+import shutil
+
+import pytest
+
+from inspectpti import PTI_HEADER_LENGTH, decode_header, disable_metrics, enable_metrics, get_header
+from ptifixtures import fixture_path
+import scanpti
+from scanpti import iter_pti_files, scan_library
+
+
+@pytest.fixture
+def library(tmp_path: pathlib.Path) -> pathlib.Path:
+    shutil.copytree(fixture_path("test"), tmp_path / "test")
+    shutil.copytree(fixture_path("sample-test"), tmp_path / "nested" / "sample-test")
+    (tmp_path / "nested" / "notes.txt").write_text("Not an instrument")
+    (tmp_path / "nested" / "._test.pti").write_bytes(b"\x00" * 4096)  # AppleDouble file
+    return tmp_path
+
+
+def test_iter_pti_files(library: pathlib.Path) -> None:
+    paths = {pathlib.Path(path).relative_to(library).as_posix() for path in iter_pti_files(library)}
+    assert len(paths) == 42 + 5 + 1
+    assert "nested/sample-test/5 test-10000ms.pti" in paths
+    assert "nested/notes.txt" not in paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan_library(library: pathlib.Path, workers: int) -> None:
+    results = {result.path: result for result in scan_library(library, workers=workers, chunksize=4)}
+    assert len(results) == 48
+
+    invalid = results.pop(str(library / "nested" / "._test.pti"))
+    assert invalid.header is None
+    assert invalid.error is not None
+
+    for path, result in results.items():
+        assert result.error is None
+        assert result.header == decode_header(get_header(path))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan_library_metrics(library: pathlib.Path, workers: int) -> None:
+    metrics = enable_metrics()
+    try:
+        assert len(list(scan_library(library, workers=workers, chunksize=4))) == 48
+    finally:
+        disable_metrics()
+    values = metrics.snapshot()
+    assert (values["scan_files"], values["scan_errors"]) == (48, 1)
+    assert values["scan_files_per_second"] == 48 / values["scan_seconds"]
+    # Counted by the worker processes (or this process, with one worker)
+    assert values["get_header_bytes"] == 48 * PTI_HEADER_LENGTH
+    assert values["is_pti_calls"] == 48
+    assert values["decode_seconds.sample_playback"] > 0
+
+
+def test_scan_library_small(library: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pools = []
+
+    class Executor(concurrent.futures.ThreadPoolExecutor):
+        def __init__(self, max_workers: int) -> None:
+            pools.append(max_workers)
+            super().__init__(max_workers)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", Executor)
+    # Small libraries are scanned in this process
+    assert len(list(scan_library(library, chunksize=4))) == 48
+    assert pools == []
+    monkeypatch.setattr(scanpti, "SERIAL_SCAN_FILES", 48)
+    assert len(list(scan_library(library, chunksize=4))) == 48
+    assert len(pools) == 1